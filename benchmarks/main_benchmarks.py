@@ -0,0 +1,209 @@
+"""
+Benchmark suite for the hot paths of ecpn_src.
+
+Measures wall-clock time and peak memory (as traced by tracemalloc) versus
+system size N, number of samples T and number of bootstrap samples M. Each
+run appends its results to a machine-readable history (JSON lines), and is
+compared against a stored baseline, flagging regressions.
+
+Usage:
+    python3 main_benchmarks.py [--quick] [--only NAME ...] [--save-baseline]
+                               [--tolerance 1.5]
+
+Exit status is 1 if any benchmark is slower than tolerance times its
+baseline. Runs offline on a plain CPU box; for reproducible timings, limit
+BLAS threads, e.g. OMP_NUM_THREADS=1.
+
+author: OM
+date: 2022-03-XX
+"""
+import sys; sys.path.append("../")
+import os
+import json
+import time
+import socket
+import argparse
+import platform
+import datetime
+import tracemalloc
+import numpy as np
+from ecpn_src.coupling_matrix import set_connectivity_matrix, set_connectivity_matrix_ECPN_1DLR, analyze_spectral_properties
+from ecpn_src.thermodynamic_quantities import energy
+from ecpn_src.initial_state_heuristic import get_initial_state_ecpn
+from ecpn_src.solver import evolve_DOP853
+from ecpn_src.data_analysis import basic_stats, bootstrap, bootstrap_vectorized, analyze_run
+from ecpn_src.measurement import OBSERVER
+
+
+# -- SYSTEM SIZES
+N_LIST = (8, 32, 128, 512, 2048, 8192)
+N_LIST_QUICK = (8, 32, 128, 512)
+
+
+def _J(N):
+    return set_connectivity_matrix(J0=1.2, sigma=0.5, N=N, rng=np.random.default_rng(0))
+
+
+def _psi(N, T=None):
+    rng = np.random.default_rng(1)
+    shape = N if T is None else (T, N)
+    return rng.normal(size=shape) + 1j*rng.normal(size=shape)
+
+
+def _run_file(N, T, path='./bench_tmp/'):
+    """Write synthetic run file with T snapshots of N spins."""
+    os.makedirs(path, exist_ok=True)
+    f_name = path + 'bench_N%d_T%d.npz' % (N, T)
+    if not os.path.exists(f_name):
+        rng = np.random.default_rng(2)
+        cfgs = np.exp(1j*rng.uniform(-np.pi, np.pi, size=(T, N)))
+        np.savez_compressed(f_name, N=N, J=_J(N), par_chi=1., t=np.arange(T, dtype=float),
+                            h=np.zeros(T), m_cplx=np.mean(cfgs, axis=-1), cfgs=cfgs)
+    return f_name
+
+
+def _evolve(J, rtol=None):
+    obs = OBSERVER(J.shape[0], J, 1., 11, 0., every=10)
+    evolve_DOP853(J, 1., _psi(J.shape[0]), 0, 1., 11, obs.callback, rtol=rtol)
+    obs.f.close()
+
+
+# -- BENCHMARKS: NAME -> (PARAMETER NAME, VALUES, QUICK VALUES, SETUP, RUN)
+BENCHMARKS = {
+    'set_connectivity_matrix': ('N', N_LIST, N_LIST_QUICK,
+        lambda N: N, _J),
+    'set_connectivity_matrix_ECPN_1DLR': ('N', N_LIST[:4], N_LIST_QUICK[:3],
+        lambda N: N, lambda N: set_connectivity_matrix_ECPN_1DLR(N=N, r=0.2)),
+    'analyze_spectral_properties': ('N', N_LIST[:5], N_LIST_QUICK,
+        _J, analyze_spectral_properties),
+    'energy': ('N', N_LIST, N_LIST_QUICK,
+        lambda N: (_J(N), _psi(N)), lambda a: energy(a[0], 1., a[1])),
+    'energy_batch_T1024': ('N', N_LIST[:5], N_LIST_QUICK,
+        lambda N: (_J(N), _psi(N, 1024)), lambda a: energy(a[0], 1., a[1])),
+    'get_initial_state_ecpn': ('N', N_LIST[:5], N_LIST_QUICK,
+        lambda N: (N, _J(N)),
+        lambda a: get_initial_state_ecpn(a[0], lambda x: energy(a[1], 1., x)/a[0], 0.7,
+                                         dh=1e-12, m_max=1000, rng=np.random.default_rng(3))),
+    'evolve_DOP853': ('N', N_LIST[:5], N_LIST_QUICK,
+        _J, _evolve),
+    # ... SINGLE PRECISION RUNS AT rtol=1e-7, COMPARE WITH DOUBLE AT EQUAL rtol FOR THE GAIN OF PRECISION ALONE
+    'evolve_DOP853_rtol1e-7': ('N', N_LIST[:5], N_LIST_QUICK,
+        _J, lambda J: _evolve(J, rtol=1e-7)),
+    'evolve_DOP853_single': ('N', N_LIST[:5], N_LIST_QUICK,
+        lambda N: _J(N).astype(np.float32), _evolve),
+    'basic_stats': ('T', (10**3, 10**4, 10**5, 10**6), (10**3, 10**4, 10**5),
+        lambda T: np.random.default_rng(4).normal(size=T), basic_stats),
+    'bootstrap': ('M', (16, 64, 256), (16, 64),
+        lambda M: (np.random.default_rng(5).normal(size=10**4), M),
+        lambda a: bootstrap(a[0], np.var, M=a[1], rng=np.random.default_rng(6))),
+    'bootstrap_vectorized': ('M', (16, 64, 256), (16, 64),
+        lambda M: (np.random.default_rng(5).normal(size=10**4), M),
+        lambda a: bootstrap_vectorized(a[0], lambda x: np.var(x, axis=-1), M=a[1], rng=6)),
+    'analyze_run_N64': ('T', (10**3, 10**4, 5*10**4), (10**3, 10**4),
+        lambda T: _run_file(64, T), lambda f: analyze_run(f, t_eq=0)),
+}
+
+
+def measure(run, arg, repeat=5, max_time=10.):
+    r"""Minimum wall-clock time and peak traced memory of run(arg).
+
+    Repetitions stop early once their accumulated time exceeds max_time.
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    t0 = time.perf_counter()
+    run(arg)
+    times = [time.perf_counter() - t0]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    while len(times) < repeat and sum(times) < max_time:
+        t0 = time.perf_counter()
+        run(arg)
+        times.append(time.perf_counter() - t0)
+    return min(times), peak
+
+
+def run_benchmarks(names, quick=False, log=sys.stdout):
+    r"""Run benchmarks.
+
+    Returns: (res)
+        res (dict): time (s) and peak memory (bytes), keyed by
+            'name[parameter=value]'.
+    """
+    res = {}
+    for name in names:
+        par, vals, vals_quick, setup, run = BENCHMARKS[name]
+        for v in (vals_quick if quick else vals):
+            arg = setup(v)
+            t, mem = measure(run, arg)
+            key = '%s[%s=%d]' % (name, par, v)
+            res[key] = {'time': t, 'peak_mem': mem}
+            print('%-48s %12.6f s %12.3f MB' % (key, t, mem/2**20), file=log, flush=True)
+    return res
+
+
+def compare(res, baseline, tolerance=1.5, min_diff=1e-4):
+    r"""Benchmarks slower than tolerance times their baseline.
+
+    Slowdowns by less than min_diff seconds are considered timing noise.
+
+    Returns: (reg)
+        reg (list): (key, time, baseline time) of each regression.
+    """
+    reg = []
+    for key, r in res.items():
+        t0 = baseline.get(key, {}).get('time')
+        if t0 is not None and r['time'] > tolerance*t0 and r['time'] - t0 > min_diff:
+            reg.append((key, r['time'], t0))
+    return reg
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ecpn_src benchmark suite')
+    parser.add_argument('--quick', action='store_true', help='small sizes only')
+    parser.add_argument('--only', nargs='*', default=None, help='benchmarks to run')
+    parser.add_argument('--save-baseline', action='store_true', help='store results as new baseline')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='allowed slowdown factor')
+    parser.add_argument('--history', default='bench_history.jsonl', help='history file')
+    parser.add_argument('--baseline', default='bench_baseline.json', help='baseline file')
+    args = parser.parse_args()
+
+    names = args.only or list(BENCHMARKS)
+    res = run_benchmarks(names, quick=args.quick)
+
+    # -- APPEND RESULTS TO HISTORY
+    record = {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'host': socket.gethostname(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'results': res,
+    }
+    with open(args.history, 'a') as f:
+        print(json.dumps(record), file=f)
+
+    # -- COMPARE AGAINST BASELINE
+    if args.save_baseline or not os.path.exists(args.baseline):
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(res)
+        tmp = args.baseline + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(baseline, f, indent=1)
+        os.replace(tmp, args.baseline)
+        print('# BASELINE SAVED: %s' % args.baseline)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    reg = compare(res, baseline, args.tolerance)
+    for key, t, t0 in reg:
+        print('# REGRESSION %s: %.6f s vs. baseline %.6f s (x%.2f)' % (key, t, t0, t/t0))
+    return 1 if reg else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Validation of the single-precision mode against the double-precision baseline.
+
+For each system size, the same disorder realization and initial state are
+evolved with a double-precision (np.float64) coupling matrix at the default
+tolerance rtol=1e-10 (baseline), and with a double- and a single-precision
+(np.float32) coupling matrix at the tolerance rtol=1e-7 of the single-precision
+mode, see function evolve_DOP853 in module solver. Run times are reported
+relative to both double-precision runs: relative to the baseline, the
+speedup includes the lower tolerance, relative to the double-precision run at
+equal tolerance it is due to precision alone. Further reported are the drift
+of the conserved energy and power densities, and the equilibrium observables
+of all runs, together with their difference from the baseline in units of the
+combined statistical error (blocking analysis).
+Individual trajectories decorrelate quickly in the chaotic regime, so that only
+time-averaged observables are compared.
+
+Usage:
+    python3 main_precision.py [--N 64 256 1024] [--h0 0.7] [--t_max 1000]
+                              [--Nt 1001] [--t_eq 200] [--z_max 3]
+
+Exit status is 1 if any observable differs by more than z_max combined
+standard errors.
+
+author: OM
+date: 2022-03-XX
+"""
+import sys; sys.path.append("../")
+import time
+import argparse
+import numpy as np
+from ecpn_src.coupling_matrix import set_connectivity_matrix
+from ecpn_src.thermodynamic_quantities import energy
+from ecpn_src.initial_state_heuristic import get_initial_state_ecpn
+from ecpn_src.solver import evolve_DOP853, default_rtol
+from ecpn_src.measurement import OBSERVER
+from ecpn_src.data_analysis import basic_stats, blocking_analysis, angular_statistics
+
+
+def run(J, chi, psi0, h0, t_max, Nt, dtype_cfg, rtol=None):
+    N = J.shape[0]
+    obs = OBSERVER(N, J, chi, Nt, h0, every=1, dtype=dtype_cfg)
+    t0 = time.perf_counter()
+    evolve_DOP853(J, chi, psi0, 0, t_max, Nt, obs.callback, rtol=rtol)
+    t_run = time.perf_counter() - t0
+    obs.f.close()
+    return obs, t_run
+
+
+def observables(obs, t_eq):
+    r"""Drifts and equilibrium observables with errors of a run.
+
+    Returns: (drift, res)
+        drift (tuple): maximum deviation of energy and power density from
+            their initial values.
+        res (dict): (value, error) keyed by observable.
+    """
+    t = np.asarray(obs.t)
+    h = np.asarray(obs.h)
+    a = np.asarray(obs.a)
+    drift = (np.max(np.abs(h - h[0])), np.max(np.abs(a - a[0])))
+    sel = t > t_eq
+    m_cplx = np.asarray(obs.m_cplx)[sel]
+    cfgs = np.asarray(obs.cfgs)[sel]
+    msd, theta = angular_statistics(obs.J, obs.chi, cfgs, m_cplx)
+    m = np.abs(m_cplx)
+    th2 = np.mean(theta.astype(np.float64)**2, axis=-1)
+    res = {}
+    for key, x in (('m', m), ('N*m^2', obs.N*m**2), ('Ts', msd), ('theta^2', th2)):
+        res[key] = (basic_stats(x)[0], blocking_analysis(x)[-1])
+    return drift, res
+
+
+def main():
+    parser = argparse.ArgumentParser(description='single vs. double precision')
+    parser.add_argument('--N', type=int, nargs='*', default=[64, 256, 1024], help='system sizes')
+    parser.add_argument('--h0', type=float, default=0.7, help='energy density')
+    parser.add_argument('--t_max', type=float, default=1000., help='final time')
+    parser.add_argument('--Nt', type=int, default=1001, help='number of time steps')
+    parser.add_argument('--t_eq', type=float, default=200., help='equilibration time')
+    parser.add_argument('--z_max', type=float, default=3., help='tolerated difference in units of the error')
+    args = parser.parse_args()
+
+    chi = 1.
+    n_fail = 0
+    for N in args.N:
+        J64 = set_connectivity_matrix(J0=1.2, sigma=0.5, N=N, rng=np.random.default_rng(0))
+        J32 = J64.astype(np.float32)
+        psi0, _ = get_initial_state_ecpn(N, lambda x: energy(J64, chi, x)/N, args.h0, dh=1e-3,
+                                         rng=np.random.default_rng(1))
+
+        # -- BASELINE, DOUBLE PRECISION AT EQUAL TOLERANCE, SINGLE PRECISION
+        rtol = default_rtol(J32)
+        runs = [('double', J64, None, None), ('double', J64, None, rtol), ('single', J32, np.complex64, rtol)]
+        heads, res = [], []
+        for precision, J, dtype_cfg, r in runs:
+            obs, t_run = run(J, chi, psi0, args.h0, args.t_max, args.Nt, dtype_cfg, rtol=r)
+            heads.append('(%s %.0e)' % (precision, default_rtol(J) if r is None else r))
+            res.append((t_run, J.nbytes) + observables(obs, args.t_eq))
+        (t_64, _, _, res_64), (t_lo, _, _, _), (t_32, _, _, _) = res
+
+        print('# N = %d' % N)
+        print('  %-10s %24s %24s %24s' % ('(quantity)', *heads))
+        print('  %-10s %24.4f %24.4f %24.4f' % ('time (s)', *(r[0] for r in res)))
+        print('  %-10s %24d %24d %24d' % ('J (bytes)', *(r[1] for r in res)))
+        print('  %-10s %24.3e %24.3e %24.3e' % ('drift h', *(r[2][0] for r in res)))
+        print('  %-10s %24.3e %24.3e %24.3e' % ('drift a', *(r[2][1] for r in res)))
+        print('  %-10s %8.2f (precision and tolerance) %8.2f (precision alone)' % (
+            'speedup', t_64/t_32, t_lo/t_32))
+        print('  %-10s %24s %24s %24s  (z vs. baseline)' % ('(observ.)', *heads))
+        for key in res_64:
+            x, dx = res_64[key]
+            vals, zs = [], []
+            for r in res:
+                y, dy = r[3][key]
+                vals.append('%12.6f(%9.6f)' % (y, dy))
+                zs.append((y - x)/np.sqrt(dx**2 + dy**2) if dx + dy > 0 else 0.)
+            flag = '' if np.all(np.abs(zs) <= args.z_max) else '  <- DIFFERS'
+            n_fail += flag != ''
+            print('  %-10s %24s %24s %24s  %8.2f %8.2f%s' % (key, *vals, *zs[1:], flag))
+    return 1 if n_fail else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
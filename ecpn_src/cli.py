@@ -0,0 +1,189 @@
+"""
+Command-line interface for running many simulation points in one process.
+
+Usage:
+    python -m ecpn_src run spec.json      # run sweep specified in file
+    python -m ecpn_src list spec.json     # list tasks and their status
+
+The sweep specification is a JSON file of the form
+
+    {
+        "grid": {
+            "N": [8, 16], "h0": {"linspace": [0.6, 0.9, 13]},
+            "J0": 1.2, "chi": 1.0, "sigma": 0.0, "seed": [0],
+            "dh": 0.001, "t_min": 0, "t_max": 1e6, "Nt": 100001,
+            "log_every_n": 100
+        },
+        "n_proc": 1,
+        "retries": 2,
+        "blas_threads": 1,
+        "catalog": "./run_catalog.sqlite",
+        "background": true,
+        "spectrum": false
+    }
+
+where each grid entry is a scalar, a list, or {"linspace": [start, stop,
+num]}, see function expand_grid in module sweep. With n_proc=1 all points
+run in the current, long-lived process, reusing coupling matrices; with
+n_proc>1 they are distributed over a pool of long-lived worker processes,
+spawned with blas_threads BLAS threads each (default: 1), see module sweep.
+With "background": true, outputs are written by a background thread while the
+next point is simulated, see module writer. With "spectrum": true, the
+eigenvalues of the coupling matrix are kept in each output as eig_J,
+diagonalizing each disorder realization once per process. Other options
+raise ValueError.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import json
+import inspect
+import argparse
+import multiprocessing as mp
+import numpy as np
+from .coupling_matrix import set_connectivity_matrix, analyze_spectral_properties
+from .solver import PRECISION
+from .rng import stage_rng, task_key
+from .sweep import expand_grid, run_sweep, default_cost
+from .simulation import simulate_point
+
+
+# -- COUPLING MATRICES OF THE CURRENT PROCESS, KEYED BY (N, J0, sigma, seed, dtype)
+_J_CACHE = {}
+# -- EIGENVALUES OF COUPLING MATRICES OF THE CURRENT PROCESS, KEYED BY (N, J0, sigma, seed)
+_E_CACHE = {}
+
+# -- OPTIONS OF A SWEEP SPECIFICATION, SEE MODULE DOCSTRING
+SPEC_OPTIONS = ('grid', 'n_proc', 'retries', 'blas_threads', 'catalog', 'background', 'spectrum')
+
+
+def coupling_matrix(N, J0, sigma, seed, dtype=np.float64):
+    r"""Coupling matrix of disorder realization, cached per process."""
+    key = (N, J0, sigma, seed, np.dtype(dtype).str)
+    if key not in _J_CACHE:
+        _J_CACHE[key] = set_connectivity_matrix(J0=J0, sigma=sigma, N=N, rng=stage_rng(seed, 'disorder'),
+                                                dtype=dtype)
+    return _J_CACHE[key]
+
+
+def coupling_spectrum(N, J0, sigma, seed):
+    r"""Eigenvalues of coupling matrix of disorder realization, cached per process."""
+    key = (N, J0, sigma, seed)
+    if key not in _E_CACHE:
+        _E_CACHE[key] = analyze_spectral_properties(coupling_matrix(N, J0, sigma, seed))[0]
+    return _E_CACHE[key]
+
+
+# -- TASK OPTIONS THAT DO NOT AFFECT THE OUTPUT, AND THUS NOT ITS FILE NAME
+_OUTPUT_OPTIONS = ('catalog', 'background', 'spectrum')
+
+# -- PARAMETERS TAGGED IN THE FILE NAME, UNLESS AT THEIR DEFAULT, AS (KEY, FORMAT)
+_NAME_TAGS = (('dh', '_dh%lf'), ('t_min', '_tmin%lf'), ('log_every_n', '_every%d'), ('rtol', '_rtol%g'))
+
+
+def _run_defaults():
+    """Default parameters of function run_point."""
+    return {k: p.default for k, p in inspect.signature(run_point).parameters.items()
+            if k not in _OUTPUT_OPTIONS}
+
+
+def task_file_name(task):
+    r"""Output file of task, unique for all varied parameters.
+
+    Notes:
+        - Parameters missing in task take the defaults of function run_point.
+        - The file name ends in _h0<h0>, as expected by function
+          get_file_dict in module data_analysis. dh, t_min, log_every_n,
+          rtol and a precision other than double are tagged before, unless
+          at their defaults, so that names of earlier runs are unchanged.
+        - Other parameters (e.g. schedule) raise ValueError, since runs
+          differing in them would share their output file.
+    """
+    defaults = _run_defaults()
+    unknown = sorted(set(task) - set(defaults) - set(_OUTPUT_OPTIONS))
+    if unknown:
+        raise ValueError('task parameters not part of the output file name: %s' % ', '.join(unknown))
+    task = dict(defaults, **task)
+    tags = ''.join(fmt % task[k] for k, fmt in _NAME_TAGS if task[k] != defaults[k])
+    if task['precision'] != 'double':
+        tags += '_' + task['precision']
+    return './data_N%d/obs_DOP853_ECPN_CONT_N%d_J0%lf_chi%lf_sigma%lf_seed%d_tmax%lf_Nt%d%s_h0%lf.npz'%(
+        task['N'], task['N'], task['J0'], task['chi'], task['sigma'], task['seed'],
+        task['t_max'], task['Nt']-1, tags, task['h0'])
+
+
+def run_point(N=12, h0=0.5, J0=1.2, sigma=0., chi=1., dh=0.001, t_min=0, t_max=1e6,
+              Nt=10001, log_every_n=10, seed=0, catalog=None, precision='double', rtol=None,
+              background=False, spectrum=False):
+    r"""Simulate single point of a sweep.
+
+    Same as helper_sim in results/numExp01_small_systems, with the coupling
+    matrix taken from the per-process cache, see function coupling_matrix,
+    and the run performed by function simulate_point in module simulation.
+    With spectrum, the eigenvalues of the coupling matrix, see function
+    coupling_spectrum, are kept in the output.
+    """
+    task = dict(N=N, h0=h0, J0=J0, sigma=sigma, chi=chi, dh=dh, t_min=t_min,
+                t_max=t_max, Nt=Nt, log_every_n=log_every_n, seed=seed)
+    # ... KEEP TASK KEYS (AND THUS RANDOM STREAMS) OF DOUBLE PRECISION RUNS AT DEFAULT TOLERANCE
+    if precision != 'double':
+        task['precision'] = precision
+    if rtol is not None:
+        task['rtol'] = rtol
+    path, f_name = os.path.split(task_file_name(task))
+    J = coupling_matrix(N, J0, sigma, seed, PRECISION[precision][0])
+    simulate_point(J, N=N, h0=h0, J0=J0, sigma=sigma, chi=chi, dh=dh, t_min=t_min, t_max=t_max,
+                   Nt=Nt, log_every_n=log_every_n, seed=seed, key=task_key(task), path=path + '/',
+                   f_name=f_name[:-4], catalog=catalog, precision=precision, rtol=rtol,
+                   background=background, eig_J=coupling_spectrum(N, J0, sigma, seed) if spectrum else None)
+
+
+def read_spec(f_name):
+    r"""Read sweep specification, see module docstring.
+
+    Returns: (tasks, opts)
+        tasks (list): dict of keyword arguments for each task.
+        opts (dict): remaining options of the specification.
+    """
+    with open(f_name) as f:
+        spec = json.load(f)
+    unknown = sorted(set(spec) - set(SPEC_OPTIONS))
+    if unknown:
+        raise ValueError('unknown options in %s: %s' % (f_name, ', '.join(unknown)))
+    grid = {}
+    for key, val in spec.pop('grid').items():
+        if isinstance(val, dict):
+            val = np.linspace(*val['linspace']).tolist()
+        grid[key] = val
+    tasks = expand_grid(**grid)
+    for key in _OUTPUT_OPTIONS:
+        if spec.get(key):
+            for t in tasks:
+                t[key] = spec[key]
+    return tasks, spec
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ecpn_src',
+        description='Run sweeps of photonic network simulations.')
+    parser.add_argument('cmd', choices=('run', 'list'), help='command')
+    parser.add_argument('spec', help='sweep specification (JSON)')
+    parser.add_argument('--n_proc', type=int, default=None, help='number of processes')
+    args = parser.parse_args(argv)
+
+    tasks, opts = read_spec(args.spec)
+    if args.cmd == 'list':
+        for t in sorted(tasks, key=default_cost, reverse=True):
+            f_name = task_file_name(t)
+            print('done' if os.path.exists(f_name) else 'todo', f_name)
+        return 0
+
+    n_proc = args.n_proc or opts.get('n_proc', 1)
+    _, failed = run_sweep(run_point, tasks, task_file_name, n_proc=n_proc, retries=opts.get('retries', 2),
+                          mp_context=mp.get_context('spawn'), blas_threads=opts.get('blas_threads', 1))
+    return 1 if failed else 0
+
+
+# EOF: cli.py
@@ -34,7 +34,7 @@ def set_connectivity_matrix_ECPN_1DLR(J0=1., N=12, r=0.2):
     return J/2/L
 
 
-def set_connectivity_matrix(J0=1., sigma=1., N=8, seed=0):
+def set_connectivity_matrix(J0=1., sigma=1., N=8, seed=0, rng=None, dtype=np.float64):
     r"""Set up connectivity matrix.
 
     Sets up connectivity matrix as specified in Eq. (15) of Ref. [RFK2020].
@@ -43,6 +43,13 @@ def set_connectivity_matrix(J0=1., sigma=1., N=8, seed=0):
     Notes:
         - Special case sigma = 0: Equal coupling photonic network.
         - Special case J0 = 0: Extreme disorder case with frustration.
+        - If rng is given, disorder is drawn from it and the global numpy
+          random state is left untouched; otherwise the global state is
+          reseeded with seed.
+        - For dtype=np.float32, the disorder is drawn in double precision and
+          rounded, so that both precisions yield the same realization; a
+          single-precision J selects the single-precision matrix-vector
+          product in function evolve_DOP853 of module solver.
 
     References:
         [RFK2020] A. Ramos, L. Fernandez-Alcazar, T. Kottos, Optical Phase
@@ -54,16 +61,21 @@ def set_connectivity_matrix(J0=1., sigma=1., N=8, seed=0):
         sigma (float): disorder strength parameter (default: 1.0).
         N (int): number of nodes (default: 8).
         seed (int): disorder seedd (default: 0).
+        rng (np.random.Generator): random number generator, see module rng
+            (default: None).
+        dtype (np.dtype): floating point type of J (default: np.float64).
 
     Returns: (J)
         J (np.ndarray, 2-dim): symmetric connectivity matrix.
     """
-    np.random.seed(seed)
+    if rng is None:
+        np.random.seed(seed)
+        rng = np.random
     # ... GET UPPER TRIANGULAR MATRIX (WITH ZEROS ALONG DIAGONAL) 
-    tmp = np.triu(J0/N + sigma/np.sqrt(N)*np.random.normal(size=(N,N)), k=1)
+    tmp = np.triu(J0/N + sigma/np.sqrt(N)*rng.normal(size=(N,N)), k=1)
     # ... COMPOSE SYMMETRIC CONNECTIVITY MATRIX WITH J_KL = J_LK, J_KK = 0
     J = tmp + tmp.T
-    return J
+    return J.astype(dtype, copy=False)
 
 
 def analyze_spectral_properties(J):
@@ -6,17 +6,39 @@ date: 2022-01-XX
 """
 import sys
 import os
+import zipfile
+import hashlib
+import concurrent.futures as cf
 import numpy as np
+from .profiling import timed
+from .rng import stage_seed_sequence
+
+
+def h0_from_file_name(f_name):
+    """Energy density h0 from file name ending in _h0<h0>.<ext>."""
+    return float(os.path.splitext(os.path.basename(f_name))[0].split('_')[-1][2:])
 
 
 def get_file_dict(path, ext='npz'):
+    """Map energy densities to file names.
+
+    Notes:
+        -# h0 is recovered from the file name; runs with equal h0 but
+        different parameters overwrite each other. Use RUN_CATALOG in module
+        run_catalog for a collision-free, indexed selection of runs.
 
-    h0_val = lambda f: float(os.path.splitext(f)[0].split('_')[-1][2:])
+    Arguments:
+        path (str): directory holding run files
+        ext (str): file extension (default: 'npz')
+
+    Returns: (f_dict)
+        f_dict (dict): file names keyed by h0
+    """
 
     f_dict = {}
     for f in os.listdir(path):
         if f.endswith(ext):
-            f_dict[h0_val(f)]=path+f
+            f_dict[h0_from_file_name(f)]=path+f
 
     return f_dict
 
@@ -36,6 +58,146 @@ def fetch_data_npz(f_name, key=None):
     return data[key]
 
 
+class RUN_FILE():
+    """Lazy reader for npz-files written by OBSERVER.save.
+
+    Opens the archive once and decodes entries on first access only, keeping
+    them in a cache. Entries stored without compression (np.savez) are
+    memory-mapped instead of read. The configuration trajectory can be
+    iterated in chunks, optionally restricted to a time window, without
+    materializing the full array.
+
+    Example:
+        with RUN_FILE(f_name) as rf:
+            t, m_cplx = rf['t'], rf['m_cplx']
+            for i0, cfg in rf.iter_chunks('cfgs', t_min=t_eq):
+                ...
+
+    Arguments:
+        f_name (str): file name
+        mmap (bool): memory-map uncompressed entries (default: True)
+        allow_pickle (bool): allow object arrays, e.g. proc_start (default:
+            False)
+    """
+    def __init__(self, f_name, mmap=True, allow_pickle=False):
+        self.f_name = f_name
+        self.mmap = mmap
+        self.allow_pickle = allow_pickle
+        self._zf = zipfile.ZipFile(f_name)
+        self._info = {os.path.splitext(zi.filename)[0]: zi
+                      for zi in self._zf.infolist() if zi.filename.endswith('.npy')}
+        self._cache = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, key):
+        return key in self._info
+
+    def __getitem__(self, key):
+        if key not in self._cache:
+            self._cache[key] = self._read(key)
+        return self._cache[key]
+
+    def keys(self):
+        return list(self._info)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def close(self):
+        self._cache = {}
+        self._zf.close()
+
+    def _header(self, fp):
+        version = np.lib.format.read_magic(fp)
+        if version == (1, 0):
+            return np.lib.format.read_array_header_1_0(fp)
+        return np.lib.format.read_array_header_2_0(fp)
+
+    def _read(self, key):
+        zi = self._info[key]
+        if self.mmap and zi.compress_type == zipfile.ZIP_STORED:
+            with open(self.f_name, 'rb') as fp:
+                # -- SKIP LOCAL FILE HEADER (30 BYTES + NAME + EXTRA FIELD)
+                fp.seek(zi.header_offset + 26)
+                n_name, n_extra = np.frombuffer(fp.read(4), dtype='<u2')
+                fp.seek(zi.header_offset + 30 + int(n_name) + int(n_extra))
+                shape, fortran_order, dtype = self._header(fp)
+                offset = fp.tell()
+            if not dtype.hasobject and np.prod(shape) > 0:
+                order = 'F' if fortran_order else 'C'
+                return np.memmap(self.f_name, dtype=dtype, mode='r', shape=shape, order=order, offset=offset)
+        with self._zf.open(zi) as fp:
+            return np.lib.format.read_array(fp, allow_pickle=self.allow_pickle)
+
+    def window(self, t_min=None, t_max=None, key='t'):
+        """Index range of time window.
+
+        Arguments:
+            t_min (float): retain times t > t_min (default: None)
+            t_max (float): retain times t <= t_max (default: None)
+            key (str): name of the entry holding the times (default: 't')
+
+        Returns: (i0, i1)
+            i0 (int): first index within time window
+            i1 (int): index past last index within time window
+        """
+        t = self[key]
+        i0 = 0 if t_min is None else int(np.searchsorted(t, t_min, side='right'))
+        i1 = t.size if t_max is None else int(np.searchsorted(t, t_max, side='right'))
+        return i0, i1
+
+    def iter_chunks(self, key='cfgs', chunk_size=1024, t_min=None, t_max=None):
+        """Iterate over entry in chunks along its first axis.
+
+        Notes:
+            -# for compressed entries, rows are decompressed on the fly so that
+            at most chunk_size rows are kept in memory
+            -# t_min, t_max restrict the iteration to a time window, see
+            method window
+
+        Arguments:
+            key (str): name of the entry (default: 'cfgs')
+            chunk_size (int): number of rows per chunk (default: 1024)
+            t_min (float): retain times t > t_min (default: None)
+            t_max (float): retain times t <= t_max (default: None)
+
+        Yields: (i0, x)
+            i0 (int): index of first row of chunk
+            x (np.ndarray): chunk of rows
+        """
+        i0, i1 = self.window(t_min, t_max)
+        zi = self._info[key]
+        if key in self._cache or (self.mmap and zi.compress_type == zipfile.ZIP_STORED):
+            x = self[key]
+            for i in range(i0, i1, chunk_size):
+                yield i, np.asarray(x[i:min(i+chunk_size, i1)])
+            return
+        with self._zf.open(zi) as fp:
+            shape, fortran_order, dtype = self._header(fp)
+            if fortran_order or dtype.hasobject:
+                x = self[key]
+                for i in range(i0, i1, chunk_size):
+                    yield i, x[i:min(i+chunk_size, i1)]
+                return
+            row_shape = shape[1:]
+            row_bytes = dtype.itemsize*int(np.prod(row_shape))
+            # -- SKIP ROWS BEFORE TIME WINDOW
+            n_skip = i0
+            while n_skip > 0:
+                n = min(n_skip, chunk_size)
+                fp.read(n*row_bytes)
+                n_skip -= n
+            for i in range(i0, i1, chunk_size):
+                n = min(chunk_size, i1-i)
+                buf = fp.read(n*row_bytes)
+                yield i, np.frombuffer(buf, dtype=dtype).reshape((n,) + row_shape)
+
+
 def autocorrelation(t, m, dt):
     """autocorrelation function.
 
@@ -74,6 +236,263 @@ def autocorrelation(t, m, dt):
     return n_t0*dt_, C/C0
 
 
+@timed
+def autocorrelation_fft(t, m):
+    """full autocorrelation function via FFT.
+
+    Compute the normalized time-displaced autocorrelation function for all
+    displacements dt = 0, t[1]-t[0], ..., t[-1]-t[0] at once. The lagged
+    products are obtained from the Wiener-Khinchin theorem, using a
+    zero-padded fast Fourier transform, at cost O(T log T) instead of the
+    O(T^2) required when calling function autocorrelation for each lag.
+
+    Notes:
+        -# Autocorrelation function is normalized so that C(dt=0) = 1
+        -# For complex-valued model properties, such as the complex-valued
+        magnetization m_cplx, the real part of <conj(m(t)) m(t+dt)> is used
+        -# Different from function autocorrelation, the estimator subtracts
+        the overall mean of m and normalizes each lag by the number of
+        contributing pairs (standard estimator, see Ref. [S1997])
+        -# For a constant series (zero variance up to round-off), e.g. a
+        frozen magnetization, C is undefined; C(0) = 1 and C(dt>0) = 0 is
+        returned, i.e. the series is treated as uncorrelated
+
+    References:
+        [S1997] A.D. Sokal, Monte Carlo Methods in Statistical Mechanics:
+        Foundations and New Algorithms, in: Functional Integration (Springer,
+        1997), https://doi.org/10.1007/978-1-4899-0319-8_6.
+
+    Arguments:
+        t (np.ndarray,1-dim): evenly-spaced measurememt times.
+        m (np.ndarray,1-dim): real or complex-valued model property.
+
+    Returns: (dt, C)
+        dt (np.ndarray,1-dim): time displacements.
+        C (np.ndarray,1-dim): normalized time-displaced autocorrelation.
+    """
+    m = np.asarray(m)
+    T = m.size
+    x = m - np.mean(m)
+    # -- ZERO-PADDING TO NEXT POWER OF TWO >= 2T AVOIDS CIRCULAR WRAP-AROUND
+    n_fft = 1 << int(2*T-1).bit_length()
+    if np.iscomplexobj(x):
+        X = np.fft.fft(x, n=n_fft)
+        acf = np.real(np.fft.ifft(np.abs(X)**2)[:T])
+    else:
+        X = np.fft.rfft(x, n=n_fft)
+        acf = np.fft.irfft(np.abs(X)**2, n=n_fft)[:T]
+    # -- NORMALIZE BY NUMBER OF PAIRS CONTRIBUTING TO EACH LAG
+    acf /= np.arange(T, 0, -1)
+    # -- ZERO VARIANCE, UP TO ROUND-OFF OF THE MEAN
+    if acf[0] <= (16*np.finfo(float).eps*np.max(np.abs(m), initial=0.))**2:
+        C = np.zeros(T)
+        C[0] = 1.
+    else:
+        C = acf/acf[0]
+    dt_ = t[1]-t[0]
+    return np.arange(T)*dt_, C
+
+
+@timed
+def integrated_autocorrelation_time(t, m, c=5.):
+    """integrated autocorrelation time.
+
+    Estimate the integrated autocorrelation time
+
+        tau_int = 1/2 + sum_{k=1}^{W} C(k)
+
+    with automatic windowing according to Ref. [S1997], i.e. the summation
+    window W is the smallest lag satisfying W >= c*tau_int(W). The full
+    autocorrelation function is obtained via function autocorrelation_fft.
+
+    Notes:
+        -# tau_int is returned in units of the time increment t[1]-t[0] as
+        well as in units of time
+        -# the effective number of independent samples is given by
+        n_eff = T/(2*tau_int)
+        -# if no window satisfies the criterion, W is set to the largest lag
+        and the estimate should be regarded as unreliable
+        -# a constant series yields tau_int = 1/2, see function
+        autocorrelation_fft
+
+    References:
+        [S1997] A.D. Sokal, Monte Carlo Methods in Statistical Mechanics:
+        Foundations and New Algorithms, in: Functional Integration (Springer,
+        1997), https://doi.org/10.1007/978-1-4899-0319-8_6.
+
+    Arguments:
+        t (np.ndarray,1-dim): evenly-spaced measurememt times.
+        m (np.ndarray,1-dim): real or complex-valued model property.
+        c (float): windowing parameter (default: 5).
+
+    Returns: (tau_int, tau_int_t, n_eff, W)
+        tau_int (float): integrated autocorrelation time in units of samples.
+        tau_int_t (float): integrated autocorrelation time in units of time.
+        n_eff (float): effective number of independent samples.
+        W (int): summation window in units of samples.
+    """
+    _, C = autocorrelation_fft(t, m)
+    tau = np.cumsum(C) - 0.5
+    # -- SMALLEST WINDOW W WITH W >= c*tau_int(W)
+    ok = np.arange(C.size) >= c*tau
+    W = int(np.argmax(ok)) if np.any(ok) else C.size-1
+    tau_int = max(tau[W], 0.5)
+    dt_ = t[1]-t[0]
+    return tau_int, tau_int*dt_, C.size/(2*tau_int), W
+
+
+class WELCH_SPECTRUM():
+    """Streaming power spectral density (Welch's method).
+
+    Evenly spaced samples are passed in chunks of arbitrary length via add.
+    Complete segments of n_seg samples, overlapping by overlap*n_seg samples,
+    are detrended (segment mean removed), windowed and Fourier transformed;
+    their periodograms are accumulated, see Ref. [W1967]. Only the samples of
+    an incomplete segment are kept between calls, so that memory is O(chunk +
+    n_seg) instead of O(trajectory). Feeding a series at once or in chunks
+    gives the same estimate.
+
+    Notes:
+        -# a sample is either a scalar, e.g. the complex-valued magnetization
+        m_cplx, or an array of shape shape, e.g. the mode amplitudes psi
+        (shape=(N,)), for which a spectrum per site is accumulated, or, if
+        mean_channels is True, the site-averaged spectrum
+        -# for complex-valued samples, the spectrum is two-sided, with
+        frequencies sorted from -1/(2 dt) to 1/(2 dt); for real-valued
+        samples, it is one-sided
+        -# normalization as scaling='density' of scipy.signal.welch, i.e.
+        the spectrum integrates to the variance of the samples
+        -# frequencies are ordinary frequencies, i.e. angular frequencies
+        are 2*pi*f
+        -# if dt is None, it is taken from the times passed to add
+
+    References:
+        [W1967] P. Welch, The use of fast Fourier transform for the estimation
+        of power spectra, IEEE Trans. Audio Electroacoust. 15 (1967) 70,
+        https://doi.org/10.1109/TAU.1967.1161901.
+
+    Arguments:
+        dt (float): sampling interval (default: None).
+        n_seg (int): number of samples per segment (default: 256).
+        overlap (float): overlap of consecutive segments as fraction of
+            n_seg (default: 0.5).
+        window (str or np.ndarray): 'hann', 'boxcar', or array of n_seg
+            weights (default: 'hann').
+        shape (tuple): shape of a single sample (default: (), i.e. scalar).
+        mean_channels (bool): average spectra over sample entries (default:
+            False).
+    """
+    def __init__(self, dt=None, n_seg=256, overlap=0.5, window='hann', shape=(), mean_channels=False):
+        self.dt = dt
+        self.n_seg = n_seg
+        self.step = max(n_seg - int(round(overlap*n_seg)), 1)
+        self.shape = tuple(shape)
+        self.mean_channels = mean_channels
+        if isinstance(window, str):
+            if window == 'hann':
+                # ... PERIODIC HANN WINDOW, AS USED BY scipy.signal.welch
+                window = 0.5 - 0.5*np.cos(2*np.pi*np.arange(n_seg)/n_seg)
+            elif window == 'boxcar':
+                window = np.ones(n_seg)
+            else:
+                raise ValueError('unknown window: %s' % window)
+        self.window = np.asarray(window, dtype=np.float64)
+        if self.window.shape != (n_seg,):
+            raise ValueError('window needs %d weights' % n_seg)
+        self.n_avg = 0
+        self.cplx = None
+        self._acc = None
+        self._buf = []
+        self._n_buf = 0
+        self._t_prev = None
+
+    def add(self, x, t=None):
+        """Add chunk of samples.
+
+        Arguments:
+            x (np.ndarray): samples of shape (T,) + shape, or a single sample
+                of shape shape.
+            t (np.ndarray,1-dim): times of samples, used to infer dt
+                (default: None).
+        """
+        x = np.asarray(x)
+        x = x.reshape((-1,) + self.shape)
+        if self.dt is None and t is not None:
+            t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+            if self._t_prev is not None:
+                t = np.concatenate(([self._t_prev], t))
+            if t.size > 1:
+                self.dt = float(t[1] - t[0])
+            else:
+                self._t_prev = t[0]
+        if self.cplx is None:
+            self.cplx = np.iscomplexobj(x)
+        self._buf.append(x)
+        self._n_buf += x.shape[0]
+        if self._n_buf < self.n_seg:
+            return
+        x = np.concatenate(self._buf, axis=0)
+        # -- ALL COMPLETE SEGMENTS AT ONCE, SEGMENT AXIS FIRST, SAMPLE AXIS LAST
+        n_full = (x.shape[0] - self.n_seg)//self.step + 1
+        seg = np.lib.stride_tricks.sliding_window_view(x, self.n_seg, axis=0)[::self.step][:n_full]
+        seg = seg - np.mean(seg, axis=-1, keepdims=True)
+        seg = seg*self.window
+        if self.cplx:
+            P = np.abs(np.fft.fft(seg, axis=-1))**2
+        else:
+            P = np.abs(np.fft.rfft(seg, axis=-1))**2
+        P = np.sum(P, axis=0)
+        if self.mean_channels and P.ndim > 1:
+            P = np.sum(P.reshape(-1, P.shape[-1]), axis=0)
+        self._acc = P if self._acc is None else self._acc + P
+        self.n_avg += n_full
+        # -- KEEP SAMPLES NOT YET PART OF A COMPLETE SEGMENT
+        rest = x[n_full*self.step:]
+        self._buf = [rest]
+        self._n_buf = rest.shape[0]
+
+    def merge(self, other):
+        """Combine with estimator of an independent series, e.g. another run.
+
+        Incomplete segments of other are discarded.
+        """
+        if other.n_avg == 0:
+            return
+        self._acc = other._acc.copy() if self._acc is None else self._acc + other._acc
+        self.n_avg += other.n_avg
+        self.cplx = other.cplx if self.cplx is None else self.cplx
+        self.dt = other.dt if self.dt is None else self.dt
+
+    def spectrum(self):
+        """Averaged power spectral density.
+
+        Returns: (f, S)
+            f (np.ndarray,1-dim): frequencies.
+            S (np.ndarray): power spectral density of shape (n_f,) + shape,
+                or (n_f,) if mean_channels is True; zero if no segment is
+                complete.
+        """
+        if self.dt is None:
+            raise ValueError('sampling interval dt unknown')
+        n_ch = int(np.prod(self.shape)) if self.mean_channels else 1
+        if self._acc is None:
+            n_f = self.n_seg if self.cplx else self.n_seg//2 + 1
+            s = () if self.mean_channels else self.shape
+            S = np.zeros(s + (n_f,))
+        else:
+            S = self._acc*self.dt/(np.sum(self.window**2)*self.n_avg*n_ch)
+        if self.cplx:
+            f = np.fft.fftshift(np.fft.fftfreq(self.n_seg, self.dt))
+            S = np.fft.fftshift(S, axes=-1)
+        else:
+            f = np.fft.rfftfreq(self.n_seg, self.dt)
+            # ... ONE-SIDED: ADD NEGATIVE FREQUENCIES, EXCEPT FOR ZERO AND NYQUIST FREQUENCY
+            S = S.copy()
+            S[..., 1:(self.n_seg+1)//2] *= 2
+        # -- FREQUENCY AXIS FIRST
+        return f, np.moveaxis(S, -1, 0)
+
+
 def Binder_parameter(m):
     r"""Binder parameter.
 
@@ -115,22 +534,74 @@ def basic_stats(x):
         s_err (float): standard error of the mean
     """
     x = np.asarray(x)
-    av=var=tiny=0.
-    N=x.size
-    for xi in x:
-        av += xi
-    av /= N
-    for xi in x:
-        dum   = xi - av
-        tiny += dum
-        var  += dum*dum
-    var = (var - tiny*tiny/N)/(N-1)
+    N = x.size
+    av = np.sum(x)/N
+    dum = x - av
+    tiny = np.sum(dum)
+    var = (np.sum(dum*dum) - tiny*tiny/N)/(N-1)
     s_dev = np.sqrt(var)
     s_err = s_dev/np.sqrt(N)
     return av, s_dev, s_err
 
 
-def bootstrap(x,fun,M=128):
+@timed
+def blocking_analysis(x):
+    """Blocking analysis of the standard error of the mean.
+
+    Estimates the standard error of the mean for correlated data via the
+    blocking (binning) transformation of Ref. [FP1989]: at each blocking level,
+    neighboring pairs of values are averaged, halving the number of samples.
+    For blocks larger than the correlation time the resulting error estimate
+    saturates at a plateau value, which is the proper error bar of the mean.
+
+    Notes:
+        -# the whole transformation requires a single O(T) pass through the
+        data
+        -# the estimated error at level k carries the uncertainty
+        err_k/sqrt(2(n_k-1)), where n_k is the number of blocks
+        -# the plateau is identified as the first level beyond which the
+        error does not increase by more than its uncertainty; if no such
+        level exists, the last level with at least two blocks is used
+        -# for fewer than two values, no level exists and the plateau
+        estimate is np.nan, as the standard error of basic_stats
+
+    References:
+        [FP1989] H. Flyvbjerg, H.G. Petersen, Error estimates on averages of
+        correlated data, J. Chem. Phys. 91 (1989) 461,
+        https://doi.org/10.1063/1.457480.
+
+    Arguments:
+        x (np.ndarray, 1-dim): array data containing numerical values
+
+    Returns: (b_size, err, err_err, err_plateau)
+        b_size (np.ndarray, 1-dim): block size at each blocking level
+        err (np.ndarray, 1-dim): standard error of the mean at each level
+        err_err (np.ndarray, 1-dim): uncertainty of the error estimates
+        err_plateau (float): plateau estimate of the standard error
+    """
+    x = np.asarray(x, dtype=float)
+    b_size, err, err_err = [], [], []
+    b = 1
+    while x.size >= 2:
+        n = x.size
+        s_err = basic_stats(x)[2]
+        b_size.append(b)
+        err.append(s_err)
+        err_err.append(s_err/np.sqrt(2*(n-1)))
+        # -- BLOCKING TRANSFORMATION (DISCARDS LAST ELEMENT FOR ODD SIZES)
+        x = 0.5*(x[0:n-1:2] + x[1:n:2])
+        b *= 2
+    b_size, err, err_err = np.asarray(b_size), np.asarray(err), np.asarray(err_err)
+    if err.size == 0:
+        return b_size, err, err_err, np.nan
+    # -- FIRST LEVEL AT WHICH THE ERROR ESTIMATE STOPS INCREASING
+    ok = err[1:] <= err[:-1] + err_err[:-1]
+    k = int(np.argmax(ok)) if np.any(ok) else err.size-1
+    return b_size, err, err_err, err[k]
+
+
+@timed
+def bootstrap(x,fun,M=128,rng=None):
     """Empirical bootstrap resampling of data.
 
     Estimates value of function 'fun' from original data
@@ -142,6 +613,8 @@ def bootstrap(x,fun,M=128):
         x (np.ndarray, 1-dim): original data
         fun (object): estimator function for resampling procedure
         M (int): number of bootstrap samples (default: 128)
+        rng (np.random.Generator): random number generator (default: None,
+            i.e. global numpy random state)
 
     Returns: (origEstim, resError)
         o_est (float): value of estimator function for original data
@@ -151,9 +624,435 @@ def bootstrap(x,fun,M=128):
     # -- ESTIMATE MEAN VALUE FROM ORIGINAL ARRAY
     o_est = fun(x)
     # -- RESAMPLE DATA FROM ORIGINAL ARRAY (WITH REPLACEMENT)
-    h = np.asarray([fun(np.random.choice(x,x.size)) for m in range(M)])
+    choice = np.random.choice if rng is None else rng.choice
+    h = np.asarray([fun(choice(x,x.size)) for m in range(M)])
     # -- ESTIMATE ERROR AS STD DEVIATION OF RESAMPLED VALUES
     err = basic_stats(h)[1]
     return o_est, err
 
 
+
+
+def _bootstrap_block(x, fun, n_res, seed):
+    """Evaluate estimator on a block of bootstrap resamples.
+
+    Arguments:
+        x (np.ndarray, 1-dim): original data
+        fun (object): vectorized estimator, reducing along the last axis
+        n_res (int): number of resamples in block
+        seed (int): seed for the random number generator of the block
+
+    Returns: (h)
+        h (np.ndarray, 1-dim): estimates for the resampled data sets
+    """
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, x.size, size=(n_res, x.size))
+    return np.asarray(fun(x[idx]))
+
+
+@timed
+def bootstrap_vectorized(x, fun, M=128, rng=None, n_workers=1,
+                         parallel='thread', max_elements=2**20):
+    """Vectorized empirical bootstrap resampling of data.
+
+    Same as function bootstrap, but the resampled data sets are generated as
+    index matrices of shape (n_res, x.size) in blocks, and the estimator is
+    applied to all resamples of a block at once.
+
+    Notes:
+        -# the estimator has to reduce along the last axis, e.g.
+        fun = lambda x: np.var(x, axis=-1)
+        -# each block of resamples is drawn from its own generator, seeded
+        from rng, so that results do not depend on n_workers
+        -# the number of resamples per block is chosen so that an index matrix
+        has at most max_elements entries
+        -# with parallel='process', fun needs to be picklable, i.e. a module
+        level function instead of a lambda
+
+    Arguments:
+        x (np.ndarray, 1-dim): original data
+        fun (object): vectorized estimator function for resampling procedure
+        M (int): number of bootstrap samples (default: 128)
+        rng (np.random.Generator or int): random number generator or seed
+            (default: None)
+        n_workers (int): number of workers evaluating blocks (default: 1)
+        parallel (str): type of workers, 'thread' or 'process' (default:
+            'thread')
+        max_elements (int): maximal size of an index matrix (default: 2**20)
+
+    Returns: (o_est, err)
+        o_est (float): value of estimator function for original data
+        err (float): corresponding error estimated via resampling
+    """
+    x = np.asarray(x)
+    rng = np.random.default_rng(rng)
+    # -- ESTIMATE VALUE FROM ORIGINAL ARRAY
+    o_est = fun(x)
+    # -- SPLIT RESAMPLES INTO BLOCKS OF BOUNDED SIZE
+    n_res = max(1, min(M, max_elements//max(x.size, 1)))
+    sizes = [n_res]*(M//n_res) + ([M % n_res] if M % n_res else [])
+    seeds = rng.integers(2**63, size=len(sizes))
+    # -- RESAMPLE DATA FROM ORIGINAL ARRAY (WITH REPLACEMENT)
+    if n_workers > 1:
+        Executor = cf.ProcessPoolExecutor if parallel == 'process' else cf.ThreadPoolExecutor
+        with Executor(max_workers=n_workers) as ex:
+            h = list(ex.map(_bootstrap_block, [x]*len(sizes), [fun]*len(sizes), sizes, seeds))
+    else:
+        h = [_bootstrap_block(x, fun, n, s) for n, s in zip(sizes, seeds)]
+    h = np.concatenate(h)
+    # -- ESTIMATE ERROR AS STD DEVIATION OF RESAMPLED VALUES
+    err = basic_stats(h)[1]
+    return o_est, err
+
+
+@timed
+def jackknife_blocked(x, fun, n_blocks=32):
+    """Block jackknife estimate of the error of an estimator.
+
+    Splits the data into n_blocks contiguous blocks and evaluates the
+    estimator on the data with one block left out, see Ref. [BH2010]. For
+    blocks larger than the autocorrelation time, the leave-one-block-out
+    estimates are approximately independent, so that, different from
+    functions bootstrap and bootstrap_vectorized, the error is not
+    underestimated for correlated data, such as consecutive snapshots.
+
+    Notes:
+        -# trailing x.size % n_blocks values are discarded so that all blocks
+        have equal size
+        -# raises ValueError unless 2 <= n_blocks <= x.size
+
+    References:
+        [BH2010]  K. Binder, D.W. Heermann, Monte Carlo Simulation in
+        Statistical Physics (Springer, 2010).
+
+    Arguments:
+        x (np.ndarray, 1-dim): original data
+        fun (object): estimator function
+        n_blocks (int): number of blocks (default: 32)
+
+    Returns: (o_est, err)
+        o_est (float): value of estimator function for original data
+        err (float): corresponding error estimated via block jackknife
+    """
+    x = np.asarray(x)
+    if n_blocks < 2 or x.size < n_blocks:
+        raise ValueError('need 2 <= n_blocks <= x.size, got n_blocks=%d, x.size=%d' % (n_blocks, x.size))
+    o_est = fun(x)
+    b = x.size//n_blocks
+    x = x[:b*n_blocks]
+    h = np.asarray([fun(np.concatenate((x[:i*b], x[(i+1)*b:]))) for i in range(n_blocks)])
+    err = np.sqrt((n_blocks-1)*np.mean(np.abs(h - np.mean(h))**2))
+    return o_est, err
+
+
+def angular_statistics(J, chi, cfg, m_cplx):
+    """Angular velocities and angles of a block of spin configurations.
+
+    For each configuration psi of the block, the rate of change of the spins
+    is decomposed into its radial and angular components, and the mean squared
+    deviation of the individual angular velocities from the total angular
+    velocity is computed. Further, the spin angles are measured relative to
+    the angle of the complex-valued magnetization.
+
+    Notes:
+        -# the linear part of the equations of motion for the whole block is
+        obtained by a single matrix-matrix product
+        -# single-precision configurations (np.complex64) are processed in
+        single precision, with sums accumulated in double precision
+
+    Arguments:
+        J (np.ndarray, 2-dim): coupling matrix.
+        chi (float): nonlinear parameter.
+        cfg (np.ndarray, 2-dim): block of T configurations of N spins.
+        m_cplx (np.ndarray, 1-dim): complex-valued magnetization of the
+            configurations.
+
+    Returns: (msd_phi, theta)
+        msd_phi (np.ndarray, 1-dim): mean squared deviation of angular
+            velocities.
+        theta (np.ndarray, 2-dim): spin angles relative to magnetization.
+    """
+    cfg = np.asarray(cfg)
+    N = cfg.shape[-1]
+    a_k = np.angle(cfg)
+    # -- RATE OF CHANGE OF SPIN POSITION, CF. _NMPN_RHS IN MODULE SOLVER
+    ds = -1j*(-np.dot(cfg, J.T) + chi*np.abs(cfg)**2*cfg)
+    # -- COMPONENT IN ANGULAR DIRECTION
+    ds_phi = np.imag(ds*np.exp(-1j*a_k))
+    # -- TOTAL ANGULAR VELOCITY
+    dphi = np.sum(ds_phi, axis=-1, keepdims=True, dtype=np.float64)/N
+    # -- MEAN SQUARED DEVIATION OF INDIVIDUAL SPIN ANGULAR VELOCITIES
+    msd_phi = np.sum((ds_phi - dphi)**2, axis=-1, dtype=np.float64)/N
+    theta = (a_k - np.angle(m_cplx)[:, np.newaxis] + np.pi) % (2*np.pi) - np.pi
+    return msd_phi, theta
+
+
+def _bootstrap_rngs(seed, key):
+    """Random number generators for the bootstrap of chi and theta_var.
+
+    Both are children of stage 'bootstrap' of the run's recorded seed and
+    task key, see module rng. Runs without recorded seed (seed < 0) fall back
+    to fixed seeds 0 and 1.
+    """
+    if seed < 0:
+        return 0, 1
+    ss = stage_seed_sequence(int(seed), 'bootstrap', tuple(int(k) for k in key))
+    return tuple(np.random.default_rng(s) for s in ss.spawn(2))
+
+
+def _seed_of_run(rf):
+    """Recorded seed entropy and task key of a run, seed -1 if absent."""
+    if "seed_entropy" not in rf:
+        return -1, np.zeros(0, dtype=np.int64)
+    return int(rf["seed_entropy"]), np.asarray(rf.get("seed_task_key", np.zeros(0, dtype=np.int64)))
+
+
+# -- SUMMARY STATISTICS RETURNED BY FUNCTION analyze_run, IN ORDER; ERRORS SUFFIXED BY
+# -- THEIR METHOD: _blk BLOCKING ANALYSIS, _bs BOOTSTRAP SEEDED BY THE RUN'S seed_entropy
+SUMMARY_KEYS = ('h', 'Ts', 'Ts_err_blk', 'm_av', 'm_err_blk', 'chi', 'chi_err_bs', 'theta_av', 'theta_var',
+                'theta_var_err_bs')
+# -- HEADER LINES OF TEXT TABLES OF SUMMARY STATISTICS, E.G. res_N*.dat
+SUMMARY_HEADER = (
+    "# ERRORS: _blk STANDARD ERROR OF THE MEAN FROM BLOCKING ANALYSIS, _bs BOOTSTRAP ERROR"
+    " (RESAMPLES FROM STAGE 'bootstrap' OF THE RUN'S SEED)",
+    "# " + " ".join("(%s)" % key for key in SUMMARY_KEYS))
+
+
+def _angle_moments(theta):
+    """Per-snapshot means of spin angles and of their squares."""
+    theta = theta.astype(np.float64, copy=False)
+    return np.mean(theta, axis=-1), np.mean(theta*theta, axis=-1)
+
+
+def _summary(h0, N, m, msd, th_1, th_2, M, rng_chi, rng_theta):
+    """Summary statistics from per-snapshot quantities, see function analyze_run."""
+    # -- TIME-AVERAGED MAGNETIZATION
+    m_av = basic_stats(m)[0]
+    m_err = blocking_analysis(m)[-1]
+    # -- FINITE SIZE SUSCEPTIBILITY
+    chi, chi_err = bootstrap_vectorized(m, lambda x: N*np.var(x, axis=-1), M=M, rng=rng_chi)
+    # -- TIME AVERAGED MSE OF ANGULAR VELOCITIES
+    Ts = basic_stats(msd)[0]
+    Ts_err = blocking_analysis(msd)[-1]
+    # -- SUMMARY OF ANGULAR DISTRIBUTION, RESAMPLING SNAPSHOTS AS FOR chi
+    theta_av = np.mean(th_1)
+    var_fun = lambda i: np.mean(th_2[i], axis=-1) - np.mean(th_1[i], axis=-1)**2
+    theta_var, theta_var_err = bootstrap_vectorized(np.arange(th_1.size), var_fun, M=M, rng=rng_theta)
+    return h0, Ts, Ts_err, m_av, m_err, chi, chi_err, theta_av, theta_var, theta_var_err
+
+
+@timed
+def analyze_run(f_name, t_eq=0, M=32, chunk_size=4096):
+    """Equilibrium summary statistics of a run.
+
+    Analyzes the configurations measured at times t > t_eq in chunks of
+    chunk_size snapshots, see function angular_statistics; errors of a window
+    of a single snapshot are np.nan (blocking) or 0 (bootstrap), an empty
+    window raises ValueError. Bootstrap
+    resamples are drawn from stage 'bootstrap' of the run's recorded seed,
+    see module rng, so that errors are reproducible per run.
+
+    Notes:
+        -# Names of the results, as columns of tables and stores, are
+        SUMMARY_KEYS; tables written before blocking analysis was used
+        labelled m_err_blk as m_serr, the naive standard error.
+        -# Spin angles enter via their per-snapshot means and mean squares
+        only, see function run_reductions.
+
+    Arguments:
+        f_name (str): file name of the run.
+        t_eq (float): equilibration time (default: 0).
+        M (int): number of bootstrap samples (default: 32).
+        chunk_size (int): number of snapshots per chunk (default: 4096).
+
+    Returns: (h, Ts, Ts_err_blk, m_av, m_err_blk, chi, chi_err_bs, theta_av, theta_var, theta_var_err_bs)
+        h (float): initial energy density.
+        Ts (float): time-averaged spread of angular velocities.
+        Ts_err_blk (float): standard error of Ts from blocking analysis,
+            accounting for autocorrelation.
+        m_av (float): time-averaged magnetization.
+        m_err_blk (float): standard error of m_av from blocking analysis.
+        chi (float): finite-size susceptibility.
+        chi_err_bs (float): bootstrap error of chi, from M resamples of the
+            snapshots (not accounting for autocorrelation).
+        theta_av (float): average spin angle relative to magnetization.
+        theta_var (float): variance of spin angles.
+        theta_var_err_bs (float): bootstrap error of theta_var, as for chi.
+    """
+    with RUN_FILE(f_name) as rf:
+        N = rf["N"]
+        J = np.asarray(rf["J"])
+        chi = rf["par_chi"]
+        h = rf["h"]
+        rng_chi, rng_theta = _bootstrap_rngs(*_seed_of_run(rf))
+        i0, i1 = rf.window(t_min=t_eq)
+        if i1 <= i0:
+            raise ValueError('no snapshots at t > t_eq = %g in %s' % (t_eq, f_name))
+        m_cplx = np.asarray(rf["m_cplx"][i0:i1])
+        msd_list, th_list = [], []
+        for j0, cfg in rf.iter_chunks("cfgs", chunk_size=chunk_size, t_min=t_eq):
+            msd_phi, theta = angular_statistics(J, chi, cfg, m_cplx[j0-i0:j0-i0+cfg.shape[0]])
+            msd_list.append(msd_phi)
+            th_list.append(_angle_moments(theta))
+    th_1, th_2 = (np.concatenate(x) for x in zip(*th_list))
+    return _summary(h[0], N, np.abs(m_cplx), np.concatenate(msd_list), th_1, th_2, M, rng_chi, rng_theta)
+
+
+@timed
+def run_reductions(f_name, chunk_size=4096):
+    """Per-snapshot reductions of a run.
+
+    Reduces each snapshot of a run to the numbers needed by function
+    summary_from_reductions, so that the statistics for any equilibration
+    time can be obtained without rereading configurations. Of the N spin
+    angles of a snapshot, only their mean and mean square are kept, which
+    determine the variance of the angles, as well as its bootstrap over
+    snapshots, exactly as in function analyze_run.
+
+    Arguments:
+        f_name (str): file name of the run.
+        chunk_size (int): number of snapshots per chunk (default: 4096).
+
+    Returns: (red)
+        red (dict): N, chi, h0, seed_entropy, seed_task_key and, per snapshot, times t, complex-valued
+            magnetization m_cplx, angular velocity spread msd, and mean
+            th_1 and mean square th_2 of spin angles relative to m_cplx.
+    """
+    with RUN_FILE(f_name) as rf:
+        N = rf["N"]
+        J = np.asarray(rf["J"])
+        chi = rf["par_chi"]
+        m_cplx = np.asarray(rf["m_cplx"])
+        seed, key = _seed_of_run(rf)
+        red = {'N': N, 'chi': chi, 'h0': rf["h"][0], 't': np.asarray(rf["t"]), 'm_cplx': m_cplx,
+               'seed_entropy': seed, 'seed_task_key': key}
+        msd_list, th_list = [], []
+        for j0, cfg in rf.iter_chunks("cfgs", chunk_size=chunk_size):
+            msd_phi, theta = angular_statistics(J, chi, cfg, m_cplx[j0:j0+cfg.shape[0]])
+            msd_list.append(msd_phi)
+            th_list.append(_angle_moments(theta))
+    red['msd'] = np.concatenate(msd_list)
+    red['th_1'], red['th_2'] = (np.concatenate(x) for x in zip(*th_list))
+    return red
+
+
+@timed
+def summary_from_reductions(red, t_eq=0, M=32):
+    """Equilibrium summary statistics from per-snapshot reductions.
+
+    Same as function analyze_run, with identical results.
+
+    Arguments:
+        red (dict): per-snapshot reductions, see function run_reductions.
+        t_eq (float): equilibration time (default: 0).
+        M (int): number of bootstrap samples (default: 32).
+
+    Returns: (h, Ts, Ts_err_blk, m_av, m_err_blk, chi, chi_err_bs, theta_av, theta_var, theta_var_err_bs)
+        see function analyze_run.
+    """
+    mask = red['t'] > t_eq
+    if not np.any(mask):
+        raise ValueError('no snapshots at t > t_eq = %g' % t_eq)
+    rng_chi, rng_theta = _bootstrap_rngs(red['seed_entropy'], red['seed_task_key'])
+    return _summary(red['h0'], red['N'], np.abs(red['m_cplx'][mask]), red['msd'][mask], red['th_1'][mask],
+                    red['th_2'][mask], M, rng_chi, rng_theta)
+
+
+# -- VERSION OF THE FORMAT OF CACHED REDUCTIONS, PART OF THE CACHE KEY
+_CACHE_FORMAT = 'red3'
+
+
+@timed
+def analyze_run_cached(f_name, t_eq=0, M=32, cache_dir='./pp_cache/', use_hash=False):
+    """Equilibrium summary statistics of a run, using a cache.
+
+    The per-snapshot reductions of a run, see function run_reductions, are
+    computed once and stored in cache_dir. They are reused as long as the
+    run file is unchanged, identified by its size and modification time, or,
+    if use_hash is True, by the SHA-1 digest of its content. Changing t_eq or
+    M thus does not require to reread configurations. Entries hold O(T)
+    numbers of a run of T snapshots, stored compressed, and entries of an
+    older format are recomputed.
+
+    Arguments:
+        f_name (str): file name of the run.
+        t_eq (float): equilibration time (default: 0).
+        M (int): number of bootstrap samples (default: 32).
+        cache_dir (str): directory holding cached reductions (default:
+            './pp_cache/').
+        use_hash (bool): identify file by content (default: False).
+
+    Returns: (h, Ts, Ts_err_blk, m_av, m_err_blk, chi, chi_err_bs, theta_av, theta_var, theta_var_err_bs)
+        see function summary_from_reductions.
+    """
+    f_name = os.path.abspath(f_name)
+    st = os.stat(f_name)
+    if use_hash:
+        sha = hashlib.sha1()
+        with open(f_name, 'rb') as f:
+            for buf in iter(lambda: f.read(1 << 20), b''):
+                sha.update(buf)
+        key = sha.hexdigest()
+    else:
+        key = '%d_%d' % (st.st_size, st.st_mtime_ns)
+    # ... ENTRIES OF AN OLDER FORMAT OF THE REDUCTIONS DO NOT MATCH
+    key = '%s_%s' % (_CACHE_FORMAT, key)
+    c_name = os.path.join(cache_dir, hashlib.sha1(f_name.encode()).hexdigest() + '.npz')
+
+    red = None
+    if os.path.exists(c_name):
+        with np.load(c_name) as c:
+            if str(c['key']) == key:
+                red = {k: c[k][()] for k in c.files if k != 'key'}
+    if red is None:
+        red = run_reductions(f_name)
+        # -- WRITE CACHE ENTRY ATOMICALLY
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = c_name[:-4] + '.tmp%d.npz' % os.getpid()
+        np.savez_compressed(tmp, key=key, **red)
+        os.replace(tmp, c_name)
+    return summary_from_reductions(red, t_eq=t_eq, M=M)
+
+
+@timed
+def spectrum_run(f_name, key='m_cplx', n_seg=256, overlap=0.5, window='hann', t_min=None,
+                 t_max=None, mean_channels=False, chunk_size=4096):
+    """Power spectral density of a saved time series.
+
+    Streams entry key of a run through WELCH_SPECTRUM in chunks of
+    chunk_size snapshots, so that, e.g., spectra of the mode amplitudes
+    (key='cfgs') never hold the full trajectory in memory.
+
+    Notes:
+        -# the snapshots within the time window need to be evenly spaced,
+        e.g. t > sched_t_eq for EQUILIBRATION_SCHEDULE in module schedule
+
+    Arguments:
+        f_name (str): file name of the run.
+        key (str): entry holding the time series, e.g. 'm_cplx' or 'cfgs'
+            (default: 'm_cplx').
+        n_seg (int): number of samples per segment (default: 256).
+        overlap (float): overlap of segments (default: 0.5).
+        window (str or np.ndarray): window function (default: 'hann').
+        t_min (float): retain times t > t_min (default: None).
+        t_max (float): retain times t <= t_max (default: None).
+        mean_channels (bool): average over sites (default: False).
+        chunk_size (int): number of snapshots per chunk (default: 4096).
+
+    Returns: (f, S, n_avg)
+        f (np.ndarray,1-dim): frequencies.
+        S (np.ndarray): power spectral density, see WELCH_SPECTRUM.
+        n_avg (int): number of averaged segments.
+    """
+    with RUN_FILE(f_name) as rf:
+        t = np.asarray(rf["t"])
+        i0, i1 = rf.window(t_min, t_max)
+        sp = None
+        for j0, x in rf.iter_chunks(key, chunk_size=chunk_size, t_min=t_min, t_max=t_max):
+            if sp is None:
+                sp = WELCH_SPECTRUM(dt=t[i0+1]-t[i0], n_seg=n_seg, overlap=overlap, window=window,
+                                    shape=x.shape[1:], mean_channels=mean_channels)
+            sp.add(x)
+    if sp is None or i1 - i0 < 2:
+        raise ValueError('%s: too few snapshots in time window' % f_name)
+    return sp.spectrum() + (sp.n_avg,)
@@ -0,0 +1,236 @@
+"""
+Disorder-ensemble driver with online disorder averaging.
+
+For sigma > 0, observables are averaged over disorder realizations, i.e.
+coupling matrices drawn with different seeds. Function run_ensemble runs
+realizations on a pool of worker processes and streams the summary statistics
+of each finished run into a DISORDER_AVERAGE accumulator, which keeps running
+means and variances over realizations (Welford's algorithm). No per-realization
+output needs to be kept. Realizations are added until the error of each
+disorder average is below its target.
+
+Error propagation: the realization-to-realization variance s^2 of an
+observable includes both its thermal (within-run) noise and the genuine
+sample-to-sample fluctuations, so that the standard error of the disorder
+average is sqrt(s^2/R) for R realizations. The thermal contribution
+sqrt(sum_r err_r^2)/R is kept alongside, and the difference of both
+estimates the disorder variance.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import json
+import itertools
+import traceback
+import numpy as np
+import concurrent.futures as cf
+from .data_analysis import SUMMARY_KEYS
+
+
+# -- ERROR ESTIMATE OF EACH QUANTITY, IF ANY
+_ERR_KEYS = {'Ts': 'Ts_err_blk', 'm_av': 'm_err_blk', 'chi': 'chi_err_bs', 'theta_var': 'theta_var_err_bs'}
+
+
+def summary_dict(res):
+    r"""Summary statistics of analyze_run as dict of (value, error).
+
+    Quantities without error estimate (h, theta_av) get error 0.
+    """
+    d = dict(zip(SUMMARY_KEYS, map(float, res)))
+    return {k: (d[k], d[_ERR_KEYS[k]] if k in _ERR_KEYS else 0.) for k in SUMMARY_KEYS
+            if k not in _ERR_KEYS.values()}
+
+
+class DISORDER_AVERAGE():
+    r"""Online disorder average of summary statistics.
+
+    Each realization contributes a dict of (value, error) per observable, see
+    function summary_dict. Accumulators of different processes can be combined
+    via merge.
+    """
+    def __init__(self):
+        self.n = 0
+        self.mean = {}
+        self.M2 = {}
+        self.err2 = {}
+
+    def add(self, res):
+        r"""Add summary statistics of one realization."""
+        self.n += 1
+        for key, (x, dx) in res.items():
+            mu = self.mean.get(key, 0.)
+            delta = x - mu
+            mu += delta/self.n
+            self.M2[key] = self.M2.get(key, 0.) + delta*(x - mu)
+            self.mean[key] = mu
+            self.err2[key] = self.err2.get(key, 0.) + dx*dx
+
+    def merge(self, other):
+        r"""Combine with accumulator of disjoint realizations."""
+        n = self.n + other.n
+        if other.n == 0:
+            return
+        for key in other.mean:
+            mu_a, mu_b = self.mean.get(key, 0.), other.mean[key]
+            delta = mu_b - mu_a
+            self.mean[key] = mu_a + delta*other.n/n
+            self.M2[key] = self.M2.get(key, 0.) + other.M2[key] + delta*delta*self.n*other.n/n
+            self.err2[key] = self.err2.get(key, 0.) + other.err2[key]
+        self.n = n
+
+    def error(self, key):
+        r"""Standard error of disorder average (thermal error if n < 2)."""
+        if self.n < 2:
+            return np.sqrt(self.err2[key])/max(self.n, 1)
+        return np.sqrt(self.M2[key]/(self.n - 1)/self.n)
+
+    def summary(self):
+        r"""Disorder averages.
+
+        Returns: (res)
+            res (dict): (mean, error, thermal error, disorder standard
+                deviation) keyed by observable.
+        """
+        res = {}
+        for key in self.mean:
+            err_th = np.sqrt(self.err2[key])/self.n
+            var = self.M2[key]/(self.n - 1) if self.n > 1 else 0.
+            sd_dis = np.sqrt(max(var - self.err2[key]/self.n, 0.))
+            res[key] = (self.mean[key], self.error(key), err_th, sd_dis)
+        return res
+
+    def converged(self, target_err):
+        r"""Whether all errors are below their targets, given as dict."""
+        return all(key in self.mean and self.error(key) <= err for key, err in target_err.items())
+
+    def to_dict(self):
+        return {'n': self.n, 'mean': self.mean, 'M2': self.M2, 'err2': self.err2}
+
+    @classmethod
+    def from_dict(cls, d):
+        acc = cls()
+        acc.n, acc.mean, acc.M2, acc.err2 = d['n'], d['mean'], d['M2'], d['err2']
+        return acc
+
+
+def _run_realization(run_fun, task):
+    try:
+        return run_fun(**task), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+def _save_state(f_name, acc, seeds_done):
+    tmp = f_name + '.tmp%d' % os.getpid()
+    with open(tmp, 'w') as f:
+        json.dump({'acc': acc.to_dict(), 'seeds_done': sorted(seeds_done)}, f, indent=1)
+    os.replace(tmp, f_name)
+
+
+def run_ensemble(run_fun, task, target_err, n_min=8, n_max=1000, seeds=None, n_proc=1,
+                 state_file=None, log=sys.stderr, initializer=None, initargs=(), mp_context=None):
+    r"""Average summary statistics over disorder realizations.
+
+    Notes:
+        - run_fun(**task, seed=seed) runs a single realization and returns its
+          summary statistics as dict of (value, error), see function
+          summary_dict. It needs to be picklable for n_proc > 1.
+        - At most n_proc realizations are in flight. Once all targets are met
+          (and n_min realizations are done), no further realizations are
+          started; those still running are completed and added.
+        - With state_file, the accumulator and finished seeds are saved
+          (atomically) after each realization, and an interrupted ensemble is
+          resumed from it.
+        - A failing realization is logged and skipped; its seed is not
+          retried, as that would bias the average toward well-behaved
+          realizations only in the presence of systematic failures.
+
+    Args:
+        run_fun (object): function running a single realization.
+        task (dict): keyword arguments of run_fun, except seed.
+        target_err (dict): target error of disorder averages, keyed by
+            observable, e.g. {'m_av': 1e-3, 'chi': 1e-2}.
+        n_min (int): minimum number of realizations (default: 8).
+        n_max (int): maximum number of realizations (default: 1000).
+        seeds (iterable): disorder seeds (default: None, i.e. 0, 1, 2, ...).
+        n_proc (int): number of worker processes (default: 1).
+        state_file (str): JSON file for resuming (default: None).
+        log (file): stream for progress messages (default: sys.stderr).
+        initializer (object): function called by each worker at startup
+            (default: None).
+        initargs (tuple): arguments of initializer (default: ()).
+        mp_context (object): multiprocessing context (default: None).
+
+    Returns: (acc)
+        acc (DISORDER_AVERAGE): disorder averages.
+    """
+    acc, seeds_done = DISORDER_AVERAGE(), set()
+    if state_file is not None and os.path.exists(state_file):
+        with open(state_file) as f:
+            state = json.load(f)
+        acc = DISORDER_AVERAGE.from_dict(state['acc'])
+        seeds_done = set(state['seeds_done'])
+    seeds = itertools.count() if seeds is None else iter(seeds)
+    seeds = (s for s in seeds if s not in seeds_done)
+    n_started = [len(seeds_done)]
+
+    def _done():
+        return acc.n >= n_max or (acc.n >= n_min and acc.converged(target_err))
+
+    def _next_task():
+        if _done() or n_started[0] >= n_max:
+            return None
+        seed = next(seeds, None)
+        if seed is None:
+            return None
+        n_started[0] += 1
+        return dict(task, seed=seed)
+
+    def _book(t, res, err):
+        seeds_done.add(t['seed'])
+        if err is not None:
+            print('# FAILED seed %d\n%s' % (t['seed'], err), file=log, flush=True)
+        else:
+            acc.add(res)
+            print('# REALIZATION %d (seed %d): %s' % (acc.n, t['seed'], ' '.join(
+                '%s=%.6g(%.2g)' % (k, acc.mean[k], acc.error(k)) for k in target_err if k in acc.mean)),
+                file=log, flush=True)
+        if state_file is not None:
+            _save_state(state_file, acc, seeds_done)
+
+    if n_proc == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        t = _next_task()
+        while t is not None:
+            _book(t, *_run_realization(run_fun, t))
+            t = _next_task()
+        return acc
+
+    with cf.ProcessPoolExecutor(max_workers=n_proc, mp_context=mp_context,
+                                initializer=initializer, initargs=initargs) as ex:
+        futures = {}
+        for _ in range(n_proc):
+            t = _next_task()
+            if t is None:
+                break
+            futures[ex.submit(_run_realization, run_fun, t)] = t
+        while futures:
+            finished, _ = cf.wait(futures, return_when=cf.FIRST_COMPLETED)
+            for fut in finished:
+                t = futures.pop(fut)
+                try:
+                    res, err = fut.result()
+                except Exception:
+                    # ... WORKER PROCESS DIED, E.G. OUT OF MEMORY
+                    res, err = None, traceback.format_exc()
+                _book(t, res, err)
+                t = _next_task()
+                if t is not None:
+                    futures[ex.submit(_run_realization, run_fun, t)] = t
+    return acc
+
+
+# EOF: ensemble.py
@@ -6,6 +6,7 @@ author: OM
 date: 2022-01-XX
 """
 import numpy as np
+from .profiling import wrap
 
 
 # --  NORMAL DISTRIBUTED RANDOM VARIABLES
@@ -16,9 +17,14 @@ _CN = lambda mu, sigma: (_N(mu, sigma) + 1j * _N(mu, sigma)) / np.sqrt(2)
 _U = lambda N: np.random.randint(N)
 
 
-def get_initial_state_ecpn(N, h_fun, h0, a=1, dh=1e-4, seed=0, m_max=1000000):
+def get_initial_state_ecpn(N, h_fun, h0, a=1, dh=1e-4, seed=0, m_max=1000000, rng=None):
     """prepare initial mode configuration
 
+    Note:
+        - If rng is given, all random numbers are drawn from it and the global
+          numpy random state is left untouched; otherwise the global state is
+          reseeded with seed.
+
     Arguments:
         N (int): number of modes.
         h_fun (object): function returning the energy density.
@@ -27,21 +33,25 @@ def get_initial_state_ecpn(N, h_fun, h0, a=1, dh=1e-4, seed=0, m_max=1000000):
         dh (float): control parameter (default: 1e-4).
         seed (int): seed for random number generators (default: 0).
         m_max (int): maximum number of iterations (default:1e6).
+        rng (np.random.Generator): random number generator, see module rng
+            (default: None).
 
     Returns: (Psi)
         Psi (np.ndarray, 1-dim): mode configuration.
     """
-    np.random.seed(seed)
-    cost_fun = lambda x: np.abs(h_fun(x) - h0)
+    if rng is None:
+        np.random.seed(seed)
+    cost_fun = wrap('heuristic.cost_fun', lambda x: np.abs(h_fun(x) - h0))
+    modify = wrap('heuristic.modify_locally', modify_locally)
     h_curr_list = []
 
-    psi0 = sample_random_state(N, a=a, seed=seed)
+    psi0 = sample_random_state(N, a=a, seed=seed, rng=rng)
     fit_curr = cost_fun(psi0)
 
     m = 0
     while m < m_max and fit_curr > dh:
 
-        tmp = modify_locally(np.copy(psi0), N)
+        tmp = modify(np.copy(psi0), N, rng=rng)
         fit_tmp = cost_fun(tmp)
 
         if fit_tmp < fit_curr:
@@ -55,21 +65,28 @@ def get_initial_state_ecpn(N, h_fun, h0, a=1, dh=1e-4, seed=0, m_max=1000000):
     return psi0, np.asarray(h_curr_list)
 
 
-def modify_locally(tmp, N):
+def modify_locally(tmp, N, rng=None):
     """propose local modification
 
     Arguments:
         N (int): number of modes.
         tmp (np.ndarray, 1-dim): current mode configuration.
+        rng (np.random.Generator): random number generator (default: None,
+            i.e. global numpy random state).
 
     Returns: (tmp)
         tmp (np.ndarray, 1-dim): modified mode configuration.
     """
-    j = k = _U(N)
+    if rng is None:
+        U, CN = _U, _CN
+    else:
+        U = lambda N: rng.integers(N)
+        CN = lambda mu, sigma: (rng.normal(mu, sigma) + 1j * rng.normal(mu, sigma)) / np.sqrt(2)
+    j = k = U(N)
     while k == j:
-        k = _U(N)
-    chi_1 = _CN(0, 1)
-    chi_2 = _CN(0, 1)
+        k = U(N)
+    chi_1 = CN(0, 1)
+    chi_2 = CN(0, 1)
     xi = (np.abs(tmp[j]) ** 2 + np.abs(tmp[k]) ** 2) / (
         np.abs(chi_1) ** 2 + np.abs(chi_2) ** 2
     )
@@ -78,19 +95,23 @@ def modify_locally(tmp, N):
     return tmp
 
 
-def sample_random_state(N, a=1, seed=0):
+def sample_random_state(N, a=1, seed=0, rng=None):
     """sample random mode configuration
 
     Arguments:
         N (int): number of modes.
         a (float): optica power per mode (default: 1).
         seed (int): seed for random number generators (default: 0).
+        rng (np.random.Generator): random number generator (default: None,
+            i.e. global numpy random state reseeded with seed).
 
     Returns: (Psi)
         Psi (np.ndarray, 1-dim): random mode configuration.
     """
-    np.random.seed(seed)
-    psi = np.random.normal(size=N) + 1j * np.random.normal(size=N)
+    if rng is None:
+        np.random.seed(seed)
+        rng = np.random
+    psi = rng.normal(size=N) + 1j * rng.normal(size=N)
     return np.sqrt(N) * psi / np.sqrt(np.sum(np.abs(psi) ** 2))
 
 
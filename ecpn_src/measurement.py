@@ -3,16 +3,29 @@ import os
 import time
 import datetime
 import numpy as np
-from .thermodynamic_quantities import *
+from .thermodynamic_quantities import energy, power, magnetization_cplx
+from .run_catalog import RUN_CATALOG, run_summary
+from .profiling import timed
+from .schedule import reached
+
+
+def log_file_name(N, h0, f_name=None):
+    r"""Log file of run; named after its output file f_name, if given, so that
+    concurrent runs with equal N and h0 (e.g. different seeds) do not share
+    a log."""
+    return './logs_N%d/'%(N) + ('N%d_h0%lf'%(N,h0) if f_name is None else f_name) + '.log'
 
 
 class OBSERVER():
-    def __init__(self, N, J, chi, Nt, h0, every=10):
+    def __init__(self, N, J, chi, Nt, h0, every=10, schedule=None, dtype=None, spectra=None, f_name=None):
         # -- INITIALIZE CONTAINERS FOR QUANTITIES OF INTEREST
         self.start = datetime.datetime.now()
         self.Nt = Nt
         self.N = N
+        self.h0 = h0
         self.J = J
+        # -- ENERGIES ARE EVALUATED IN DOUBLE PRECISION, SINGLE-PRECISION J IS UPCAST ONCE PER RUN
+        self.J_64 = J.astype(np.float64, copy=False)
         self.chi = chi
         self.t = []
         self.a = []
@@ -20,19 +33,30 @@ class OBSERVER():
         self.m_cplx = []
         self.cfgs = []
         self.every = every
+        # -- SNAPSHOT SCHEDULE, SEE MODULE SCHEDULE; IF NONE, EVERY every-TH CALLBACK
+        self.schedule = schedule
+        self.t_next = None if schedule is None else schedule.next_time(-np.inf)
+        # -- STORAGE TYPE OF CONFIGURATIONS, E.G. np.complex64; IF NONE, AS GIVEN
+        self.dtype = dtype
+        # -- STREAMING SPECTRA OF 'm_cplx' AND/OR 'cfgs', SEE WELCH_SPECTRUM IN MODULE data_analysis;
+        # -- THEY REQUIRE EVENLY SPACED SNAPSHOTS
+        self.spectra = {} if spectra is None else spectra
+        for key in self.spectra:
+            if key not in ('m_cplx', 'cfgs'):
+                raise ValueError('no spectrum of %s' % key)
 
         # -- PREPARE LOGFILE
-        path = './logs_N%d/'%(N)
-        os.makedirs(path,exist_ok=True)
-        self.f = open(path+'N%d_h0%lf.log'%(N,h0),'w')
+        self.log_name = log_file_name(N, h0, f_name)
+        os.makedirs(os.path.dirname(self.log_name),exist_ok=True)
+        self.f = open(self.log_name,'w')
         print('# PID: %d'%(os.getpid()), file=self.f, flush=True)
         print('# (%) (t) (h) (m)', file=self.f, flush=True)
 
 
     def callback(self, it, t, y):
-        N, J, chi, Nt, every = self.N, self.J, self.chi, self.Nt, self.every
+        N, J, chi, Nt, every = self.N, self.J_64, self.chi, self.Nt, self.every
 
-        if it%every==0:
+        if (it%every==0) if self.schedule is None else reached(t, self.t_next):
 
             # -- CURRENT VALUES OF QUANTITIES OF INTEREST
             a_curr = power(y)/N
@@ -44,31 +68,95 @@ class OBSERVER():
             self.a.append(a_curr)
             self.h.append(h_curr)
             self.m_cplx.append(m_cplx_curr)
-            self.cfgs.append(y)
+            self.cfgs.append(y if self.dtype is None else y.astype(self.dtype))
+            for key, sp in self.spectra.items():
+                sp.add(m_cplx_curr if key == 'm_cplx' else y, t=t)
 
             # -- WRITE DATA TO LOG-FILE
             print('%4.3lf %5.2lf %10.9lf %4.3lf'%(it/Nt, t, h_curr, np.abs(m_cplx_curr)), file=self.f, flush=True)
 
+            # -- ADVANCE SCHEDULE, POSSIBLY ADAPTING IT TO THE DATA RECORDED SO FAR
+            if self.schedule is not None:
+                self.schedule.update(self)
+                self.t_next = self.schedule.next_time(t)
+
+
+    @timed
+    def save(self, f_name='test', path='./data/', catalog=None, writer=None, **kwargs):
+        """Save run, optionally in the background.
+
+        With a writer (see module writer), the recorded data are handed over
+        to the writer thread, which compresses and writes them while the
+        caller proceeds, e.g. with the next run of a sweep. The observer must
+        not be used afterwards.
+        """
+
+        # -- CLOSE LOG-FILE
+        self.f.close()
 
-    def save(self, f_name='test', path='./data/',**kwargs):
+        # -- KEEP PARAMETERS OF SNAPSHOT SCHEDULE
+        if self.schedule is not None:
+            kwargs = {**self.schedule.info(), **kwargs}
 
         try:
             os.makedirs(path)
         except OSError:
             pass
 
-        np.savez_compressed(path + f_name,
-           N=self.N,
-           chi=self.chi,
-           J=self.J,
-           t=np.asarray( self.t),
-           a=np.asarray( self.a),
-           h=np.asarray( self.h),
-           m_cplx=np.asarray(self.m_cplx),
-           cfgs=np.asarray(self.cfgs),
-           proc_start=self.start,
-           proc_end=datetime.datetime.now(),
-           **kwargs
-           )
+        f_path = path + f_name
+        if not f_path.endswith('.npz'):
+            f_path += '.npz'
 
+        data = dict(
+               N=self.N,
+               h0=self.h0,
+               chi=self.chi,
+               J=self.J,
+               t=np.asarray( self.t),
+               a=np.asarray( self.a),
+               h=np.asarray( self.h),
+               m_cplx=np.asarray(self.m_cplx),
+               cfgs=np.asarray(self.cfgs),
+               proc_start=self.start,
+               proc_end=datetime.datetime.now(),
+               **kwargs
+               )
+        for key, sp in self.spectra.items():
+            if sp.dt is None:
+                continue
+            data['psd_%s_f' % key], data['psd_%s' % key] = sp.spectrum()
+            data['psd_%s_n_avg' % key] = sp.n_avg
+        entry = None
+        if catalog is not None:
+            entry = dict(N=self.N, h0=self.h0, proc_start=self.start,
+                proc_end=data['proc_end'],
+                **run_summary(self.t, self.a, self.h, self.m_cplx), **kwargs)
+
+        if writer is None:
+            _write_run(f_path, data, catalog, entry)
+            return
+        # -- HAND OVER DATA TO WRITER THREAD, RELEASING THE OBSERVER'S REFERENCES
+        self.t, self.a, self.h, self.m_cplx, self.cfgs = [], [], [], [], []
+        writer.submit(os.path.abspath(f_path), _write_run, f_path, data, catalog, entry)
+
+
+def _write_run(f_path, data, catalog=None, entry=None):
+    # -- WRITE TO TEMPORARY FILE AND RENAME, SO THAT AN EXISTING OUTPUT
+    # -- FILE IS ALWAYS COMPLETE
+    tmp = f_path + '.tmp%d' % os.getpid()
+    try:
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, **data)
+        os.replace(tmp, f_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
 
+    # -- REGISTER RUN IN CATALOG
+    if catalog is not None:
+        if not isinstance(catalog, RUN_CATALOG):
+            catalog = RUN_CATALOG(catalog)
+        catalog.add(f_path, **entry)
@@ -0,0 +1,138 @@
+"""
+Microcanonical Monte Carlo sampling of mode configurations.
+
+Samples configurations at fixed optical power and (approximately) fixed energy
+density, as an alternative to long-time integration of the equations of motion
+when only static equilibrium quantities are of interest.
+
+Moves are the power-conserving two-site moves of function modify_locally in
+module initial_state_heuristic: the amplitudes of two randomly chosen modes j
+and k are redrawn uniformly on the sphere |psi_j|^2 + |psi_k|^2 = const. The
+proposal is symmetric, so that accepting moves by one of the following rules
+samples the microcanonical measure:
+
+    'window': accept if the energy density of the proposed configuration lies
+        within [h0-dh, h0+dh]; starting outside the window, moves reducing the
+        distance to h0 are also accepted.
+    'demon': a demon [C1983] exchanges energy with the system; a move is
+        accepted if the demon energy E_d - dE stays within [0, E_d_max]. For
+        E_d_max >> T, the mean demon energy estimates the temperature T.
+
+The energy change of a move is obtained in O(1) from the local fields f = J psi,
+which are updated in O(N) per accepted move. Energy and fields are recomputed
+from scratch once per sweep (N/2 proposed moves) to avoid accumulation of
+round-off errors.
+
+Samples are passed to a callback with the signature of the one used by
+function evolve_DOP853 in module solver, so that OBSERVER records them in its
+usual format, the sweep number taking the role of time.
+
+References:
+    [C1983] M. Creutz, Microcanonical Monte Carlo Simulation, Phys. Rev. Lett.
+    50 (1983) 1411, https://doi.org/10.1103/PhysRevLett.50.1411.
+
+author: OM
+date: 2022-03-XX
+"""
+import numpy as np
+from .thermodynamic_quantities import energy
+from .profiling import wrap
+
+
+def _sweep(J, chi, psi, f, E, n_moves, accept, rng):
+    N = psi.size
+    # -- RANDOM NUMBERS OF THE SWEEP, DRAWN AT ONCE
+    j_list = rng.integers(N, size=n_moves)
+    k_list = (j_list + rng.integers(1, N, size=n_moves)) % N
+    z_list = (rng.normal(size=(n_moves, 2)) + 1j*rng.normal(size=(n_moves, 2)))/np.sqrt(2)
+    n_acc = 0
+    for j, k, (z1, z2) in zip(j_list, k_list, z_list):
+        o1, o2 = psi[j], psi[k]
+        p1, p2 = abs(o1)**2, abs(o2)**2
+        s = np.sqrt((p1 + p2)/(abs(z1)**2 + abs(z2)**2))
+        n1, n2 = s*z1, s*z2
+        d1, d2 = n1 - o1, n2 - o2
+        # ... dE_L = -2 Re[d^* f] - d^* J_sub d, J SYMMETRIC AND REAL
+        dE_L = -2.*(np.conj(d1)*f[j] + np.conj(d2)*f[k]).real - (
+            J[j, j]*abs(d1)**2 + J[k, k]*abs(d2)**2 + 2.*J[j, k]*(np.conj(d1)*d2).real)
+        q1, q2 = abs(n1)**2, abs(n2)**2
+        dE_N = 0.5*chi*(q1*q1 + q2*q2 - p1*p1 - p2*p2)
+        dE = dE_L + dE_N
+        if accept(E, dE):
+            psi[j], psi[k] = n1, n2
+            f += J[:, j]*d1 + J[:, k]*d2
+            E += dE
+            n_acc += 1
+    return E, n_acc
+
+
+def sample_microcanonical(J, chi, psi, n_sweeps, callback_fun, h0=None, dh=1e-3,
+                          method='window', E_d=0., E_d_max=np.inf, rng=None):
+    r"""Microcanonical Monte Carlo sampling, see module docstring.
+
+    Args:
+        J (np.ndarray, 2-dim): symmetric, real-valued coupling matrix.
+        chi (float): nonlinear parameter.
+        psi (np.ndarray, 1-dim): initial mode configuration, e.g. prepared by
+            function get_initial_state_ecpn in module initial_state_heuristic.
+        n_sweeps (int): number of sweeps, each of N/2 proposed moves.
+        callback_fun (object): function called as callback_fun(it, t, psi)
+            after each sweep, with it = t = sweep number, e.g.
+            OBSERVER.callback.
+        h0 (float): target energy density for method 'window' (default: None,
+            i.e. energy density of initial configuration).
+        dh (float): half width of energy-density window (default: 1e-3).
+        method (str): acceptance rule, 'window' or 'demon' (default: 'window').
+        E_d (float): initial demon energy (default: 0).
+        E_d_max (float): capacity of demon (default: np.inf).
+        rng (np.random.Generator): random number generator, e.g. stage
+            'dynamics' of module rng (default: None, i.e. fresh generator).
+
+    Returns: (psi, acc, E_d)
+        psi (np.ndarray, 1-dim): final mode configuration.
+        acc (float): fraction of accepted moves.
+        E_d (np.ndarray, 1-dim): demon energy after each sweep (empty for
+            method 'window').
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    N = psi.size
+    psi = np.array(psi, dtype=complex)
+    n_moves = max(N//2, 1)
+    h0 = energy(J, chi, psi)/N if h0 is None else h0
+    demon = [E_d]
+    E_d_list = []
+
+    if method == 'window':
+        E_lo, E_hi, E0 = N*(h0 - dh), N*(h0 + dh), N*h0
+        def accept(E, dE):
+            E_new = E + dE
+            return (E_lo <= E_new <= E_hi) or abs(E_new - E0) < abs(E - E0)
+    elif method == 'demon':
+        def accept(E, dE):
+            E_new = demon[0] - dE
+            if 0. <= E_new <= E_d_max:
+                demon[0] = E_new
+                return True
+            return False
+    else:
+        raise ValueError('unknown acceptance rule: %s' % method)
+
+    # -- TIMERS ONLY IF PROFILING IS ENABLED, SEE MODULE PROFILING
+    sweep = wrap('microcanonical.sweep', _sweep)
+    callback_fun = wrap('microcanonical.callback', callback_fun)
+
+    n_acc = 0
+    for it in range(n_sweeps):
+        f = np.dot(J, psi)
+        E = energy(J, chi, psi)
+        _, n = sweep(J, chi, psi, f, E, n_moves, accept, rng)
+        n_acc += n
+        if method == 'demon':
+            E_d_list.append(demon[0])
+        callback_fun(it, float(it), psi.copy())
+
+    return psi, n_acc/max(n_sweeps*n_moves, 1), np.asarray(E_d_list)
+
+
+# EOF: microcanonical.py
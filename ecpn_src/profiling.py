@@ -0,0 +1,147 @@
+"""
+Opt-in profiling layer with low-overhead timers and call counters.
+
+Profiling is disabled by default. It is enabled by setting the environment
+variable ECPN_PROFILE=1 before the package is imported, or by calling
+enable(). If, in addition, ECPN_PROFILE_DIR is set (or a directory is passed
+to enable), each run wrapped in run_profile dumps a cProfile/pstats file and
+a report of the timers to that directory.
+
+Notes:
+    - Hot callables, such as the right-hand side of the equations of motion
+      and the observer callback, are wrapped by wrap() only if profiling is
+      enabled at the time they are set up, so that they carry no overhead at
+      all when profiling is disabled.
+    - Less frequently called functions are decorated with timed, which costs
+      a single flag check per call when profiling is disabled.
+
+Example:
+    ECPN_PROFILE=1 ECPN_PROFILE_DIR=./prof python3 main_single_run.py 16 0.7
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import time
+import cProfile
+import functools
+import contextlib
+
+
+_ENABLED = os.environ.get('ECPN_PROFILE', '0') not in ('', '0')
+_DIR = os.environ.get('ECPN_PROFILE_DIR') or None
+# -- ACCUMULATED NUMBER OF CALLS AND TIME, KEYED BY NAME
+_TIMERS = {}
+
+
+def enable(path=None):
+    r"""Enable profiling; optionally set directory for per-run dumps."""
+    global _ENABLED, _DIR
+    _ENABLED = True
+    if path is not None:
+        _DIR = path
+
+
+def disable():
+    r"""Disable profiling."""
+    global _ENABLED
+    _ENABLED = False
+
+
+def enabled():
+    r"""Whether profiling is enabled."""
+    return _ENABLED
+
+
+def reset():
+    r"""Zero timers and call counters."""
+    # ... IN PLACE, AS WRAPPED CALLABLES HOLD REFERENCES TO THEIR RECORDS
+    for rec in _TIMERS.values():
+        rec[:] = [0, 0.]
+
+
+def stats():
+    r"""Timers and call counters.
+
+    Returns: (res)
+        res (dict): (number of calls, total time in s) keyed by name.
+    """
+    return {k: tuple(v) for k, v in _TIMERS.items() if v[0]}
+
+
+def report(file=sys.stderr):
+    r"""Print timers and call counters, sorted by total time."""
+    print('# %-48s %12s %14s %14s' % ('(name)', '(calls)', '(total s)', '(per call s)'), file=file)
+    for name, (n, t) in sorted(stats().items(), key=lambda x: -x[1][1]):
+        print('  %-48s %12d %14.6f %14.3e' % (name, n, t, t/n), file=file)
+
+
+def _timer(name, fun):
+    rec = _TIMERS.setdefault(name, [0, 0.])
+    clock = time.perf_counter
+
+    @functools.wraps(fun)
+    def _wrapped(*args, **kwargs):
+        t0 = clock()
+        try:
+            return fun(*args, **kwargs)
+        finally:
+            rec[0] += 1
+            rec[1] += clock() - t0
+    return _wrapped
+
+
+def wrap(name, fun):
+    r"""Wrap callable with timer if profiling is enabled, else return it as is.
+
+    Args:
+        name (str): name of the timer.
+        fun (object): callable.
+
+    Returns: (fun)
+        fun (object): possibly wrapped callable.
+    """
+    return _timer(name, fun) if _ENABLED else fun
+
+
+def timed(fun):
+    r"""Decorator adding a timer, active while profiling is enabled."""
+    name = fun.__module__.split('.')[-1] + '.' + fun.__qualname__
+    wrapped = _timer(name, fun)
+
+    @functools.wraps(fun)
+    def _dispatch(*args, **kwargs):
+        if _ENABLED:
+            return wrapped(*args, **kwargs)
+        return fun(*args, **kwargs)
+    return _dispatch
+
+
+@contextlib.contextmanager
+def run_profile(tag):
+    r"""Profile a run with cProfile, if enabled and a dump directory is set.
+
+    On exit, writes <dir>/<tag>.pstats (readable via pstats.Stats) and
+    <dir>/<tag>.timers.txt, holding the report of timers and call counters.
+
+    Args:
+        tag (str): name of the run, used for the output files.
+    """
+    if not (_ENABLED and _DIR):
+        yield
+        return
+    os.makedirs(_DIR, exist_ok=True)
+    reset()
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(os.path.join(_DIR, tag + '.pstats'))
+        with open(os.path.join(_DIR, tag + '.timers.txt'), 'w') as f:
+            report(file=f)
+
+
+# EOF: profiling.py
@@ -0,0 +1,282 @@
+"""
+Store of postprocessed summary statistics, backed by a SQLite database.
+
+Replaces the per-N text tables (res_N*.dat) written by the postprocessing
+scripts. Summary statistics of function analyze_run in module data_analysis
+are kept as typed columns at full double precision, one row per key (N, h0,
+params), where params is a dict of further parameters the statistics depend
+on, e.g. {'t_eq': 5e5}. Each parameter is in addition kept as a column of its
+own, so that rows can be selected by it. Function run_key reads N, h0 and the
+parameters of a run (RUN_PARAMS) from its file, so that runs differing in,
+e.g., disorder strength or seed do not overwrite each other's rows. The seed
+is part of the key only for disordered networks (sigma > 0), where it selects
+the disorder realization. Without disorder it only selects the initial
+state, so that a rerun with a fresh seed (default of helper_sim, e.g. in
+main_single_run.py) replaces the row of the earlier run rather than adding
+one, and the store does not grow with reruns.
+
+Rows are written in a single transaction, so that a batch is either stored
+completely or not at all, and several postprocessing workers may write
+concurrently; sqlite serializes the writes. Selections are returned
+column-wise as numpy arrays, ready for plotting, e.g.
+
+    store = RESULTS_STORE('./results.sqlite')
+    N, h0, params = run_key(f_name, t_eq=5e5)
+    store.put(N, h0, analyze_run(f_name, t_eq=5e5), params=params)
+    res = store.query(N=32, t_eq=5e5, par_sigma=0., h0=('>=', 0.6))
+    plt.plot(res['h'], res['m_av'])
+
+For backward compatibility, method export_txt writes selections as text
+tables in the format of res_N*.dat.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import json
+import sqlite3
+import datetime
+import numpy as np
+from .run_catalog import _OPS, _to_sql
+from .data_analysis import RUN_FILE, SUMMARY_KEYS, h0_from_file_name
+
+
+# -- COLUMNS PRESENT IN EVERY STORE
+_BASE_COLUMNS = (
+    ('N', 'INTEGER NOT NULL'),
+    ('h0', 'REAL NOT NULL'),
+    ('params', 'TEXT NOT NULL'),
+    ('path', 'TEXT'),
+    ('timestamp', 'TEXT'),
+) + tuple((key, 'REAL') for key in SUMMARY_KEYS)
+
+# -- PARAMETERS OF A RUN FILE THAT ARE PART OF THE ROW KEY, IF PRESENT IN THE FILE
+RUN_PARAMS = ('par_J0', 'par_chi', 'par_sigma', 'seed', 'par_dh', 'par_t_max', 'par_Nt', 'par_precision',
+              'par_rtol', 'par_n_sweeps', 'par_method')
+
+
+def run_key(f_name, t_eq=0):
+    r"""Row key of a run file, see method put.
+
+    Arguments:
+        f_name (str): file name of the run.
+        t_eq (float): equilibration time of the analysis (default: 0).
+
+    Returns: (N, h0, params)
+        N (int): number of modes.
+        h0 (float): nominal energy density, from the file name if not
+            stored in the file (older runs).
+        params (dict): t_eq and the parameters RUN_PARAMS stored in the file,
+            without seed unless par_sigma > 0.
+    """
+    with RUN_FILE(f_name) as rf:
+        N = int(rf['N'])
+        h0 = float(rf['h0']) if 'h0' in rf else h0_from_file_name(f_name)
+        params = {key: _to_sql(rf[key]) for key in RUN_PARAMS if key in rf}
+    # ... WITHOUT DISORDER, RUNS OF DIFFERENT SEEDS SAMPLE THE SAME ENSEMBLE
+    if not params.get('par_sigma', 0.) > 0.:
+        params.pop('seed', None)
+    params['t_eq'] = t_eq
+    return N, h0, params
+
+
+def _params_key(params):
+    """Canonical text form of parameter dict, part of the row key."""
+    return json.dumps({k: _to_sql(v) for k, v in params.items()}, sort_keys=True)
+
+
+def _sql_type(x):
+    """Column type of parameter value."""
+    if isinstance(x, int):
+        return 'INTEGER'
+    if isinstance(x, float):
+        return 'REAL'
+    return 'TEXT'
+
+
+class RESULTS_STORE():
+    """SQLite-backed table of summary statistics keyed by (N, h0, params).
+
+    Notes:
+        - The database is created on first use. Columns for new parameters
+          are added on the fly.
+        - Writing a row whose key is already present replaces it (upsert), or,
+          with replace=False, leaves it unchanged (append).
+
+    Arguments:
+        db_name (str): file name of the database (default:
+            './results.sqlite').
+        timeout (float): seconds to wait for a locked database (default: 60).
+    """
+    def __init__(self, db_name='./results.sqlite', timeout=60.):
+        self.db_name = db_name
+        self.timeout = timeout
+        con = self._connect()
+        with con:
+            cols = ', '.join('"%s" %s' % c for c in _BASE_COLUMNS)
+            con.execute('CREATE TABLE IF NOT EXISTS results (%s, PRIMARY KEY (N, h0, params))' % cols)
+        con.close()
+
+    def _connect(self):
+        # ... AUTOCOMMIT MODE, TRANSACTIONS ARE OPENED EXPLICITLY
+        return sqlite3.connect(self.db_name, timeout=self.timeout, isolation_level=None)
+
+    def _columns(self, con):
+        return [r[1] for r in con.execute('PRAGMA table_info(results)')]
+
+    def _row(self, N, h0, res, params=None, path=None):
+        params = {} if params is None else dict(params)
+        for key in params:
+            if not key.isidentifier() or key in dict(_BASE_COLUMNS):
+                raise ValueError('invalid parameter name: %s' % key)
+        if not isinstance(res, dict):
+            res = dict(zip(SUMMARY_KEYS, res))
+        row = {'N': int(N), 'h0': float(h0), 'params': _params_key(params),
+               'path': None if path is None else os.path.abspath(path),
+               'timestamp': str(datetime.datetime.now())}
+        row.update({key: float(res[key]) for key in SUMMARY_KEYS if key in res})
+        row.update({key: _to_sql(val) for key, val in params.items()})
+        return row
+
+    def put(self, N, h0, res, params=None, path=None, replace=True):
+        """Store summary statistics of a run.
+
+        Arguments:
+            N (int): number of modes.
+            h0 (float): nominal energy density of the run.
+            res (tuple or dict): summary statistics, as returned by function
+                analyze_run in module data_analysis, or keyed by name.
+            params (dict): further parameters, part of the key (default:
+                None).
+            path (str): file name of the run (default: None).
+            replace (bool): replace row with same key (default: True).
+
+        Returns: (n)
+            n (int): number of written rows (0 or 1).
+        """
+        return self.put_many([dict(N=N, h0=h0, res=res, params=params, path=path)], replace=replace)
+
+    def put_many(self, rows, replace=True):
+        """Store several rows in a single transaction.
+
+        Arguments:
+            rows (list): dict of keyword arguments of method put for each row,
+                except replace.
+            replace (bool): replace rows with same key (default: True).
+
+        Returns: (n)
+            n (int): number of written rows.
+        """
+        rows = [self._row(**r) for r in rows]
+        if not rows:
+            return 0
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT OR IGNORE'
+        con = self._connect()
+        # ... WRITE LOCK FROM THE START, SO THAT NO COLUMN IS ADDED CONCURRENTLY
+        con.execute('BEGIN IMMEDIATE')
+        try:
+            cols = self._columns(con)
+            for row in rows:
+                for key, val in row.items():
+                    if key not in cols:
+                        con.execute('ALTER TABLE results ADD COLUMN "%s" %s' % (key, _sql_type(val)))
+                        cols.append(key)
+            n = 0
+            for row in rows:
+                keys = list(row)
+                n += con.execute('%s INTO results (%s) VALUES (%s)' % (verb,
+                    ', '.join('"%s"' % k for k in keys), ', '.join('?'*len(keys))),
+                    [row[k] for k in keys]).rowcount
+            con.execute('COMMIT')
+        except BaseException:
+            con.execute('ROLLBACK')
+            raise
+        finally:
+            con.close()
+        return n
+
+    def query(self, columns=None, order_by=('N', 'h0'), **conditions):
+        """Select rows, returned column-wise.
+
+        Conditions are given as column=value for equality, or as
+        column=(op, value) with op one of =, !=, <, <=, >, >=. A condition on
+        a parameter that was never stored selects no rows.
+
+        Arguments:
+            columns (tuple): columns to return (default: None, i.e. all).
+            order_by (tuple): columns to sort by (default: ('N', 'h0')).
+            **conditions: selection criteria, combined by logical and.
+
+        Returns: (res)
+            res (dict): np.ndarray of values of each column; REAL columns
+                are of type np.float64, with missing values as np.nan, as
+                are INTEGER columns with missing values.
+        """
+        con = self._connect()
+        try:
+            types = {r[1]: r[2] for r in con.execute('PRAGMA table_info(results)')}
+            columns = list(types) if columns is None else list(columns)
+            for key in columns:
+                if key not in types:
+                    raise ValueError('unknown column: %s' % key)
+            clauses, args, empty = [], [], False
+            for key, val in conditions.items():
+                op, val = val if isinstance(val, tuple) else ('=', val)
+                if op not in _OPS:
+                    raise ValueError('unsupported operator %s' % op)
+                empty |= key not in types
+                clauses.append('"%s" %s ?' % (key, op))
+                args.append(_to_sql(val))
+            rows = []
+            if not empty:
+                sql = 'SELECT %s FROM results' % ', '.join('"%s"' % k for k in columns)
+                if clauses:
+                    sql += ' WHERE ' + ' AND '.join(clauses)
+                if order_by:
+                    sql += ' ORDER BY ' + ', '.join('"%s"' % k for k in order_by)
+                rows = con.execute(sql, args).fetchall()
+        finally:
+            con.close()
+        res = {}
+        for j, key in enumerate(columns):
+            x = [r[j] for r in rows]
+            if types[key].startswith('REAL'):
+                res[key] = np.array([np.nan if v is None else v for v in x], dtype=np.float64)
+            elif types[key].startswith('INTEGER') and None not in x:
+                res[key] = np.array(x, dtype=np.int64)
+            elif types[key].startswith('INTEGER'):
+                # ... E.G. seed OF RUNS WITHOUT DISORDER, SEE FUNCTION run_key
+                res[key] = np.array([np.nan if v is None else v for v in x], dtype=np.float64)
+            else:
+                res[key] = np.array(x, dtype=object)
+        return res
+
+    def export_txt(self, f_out, columns=SUMMARY_KEYS, header=(), **conditions):
+        """Write selected rows as text table, atomically.
+
+        With default columns, the table has the format of res_N*.dat, as
+        read by results/fig_02/main_fig02.py.
+
+        Arguments:
+            f_out (str): output file name.
+            columns (tuple): columns of the table (default: SUMMARY_KEYS).
+            header (list): comment lines preceding the column names
+                (default: ()).
+            **conditions: selection criteria, see method query.
+
+        Returns: (n)
+            n (int): number of rows written.
+        """
+        res = self.query(columns=columns, **conditions)
+        tmp = f_out + '.tmp%d' % os.getpid()
+        with open(tmp, 'w') as f:
+            for line in header:
+                print(line, file=f)
+            print('# ' + ' '.join('(%s)' % k for k in columns), file=f)
+            for row in zip(*(res[k] for k in columns)):
+                print(*row, file=f)
+        os.replace(tmp, f_out)
+        return len(res[columns[0]]) if columns else 0
+
+
+# EOF: results_store.py
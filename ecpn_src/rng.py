@@ -0,0 +1,103 @@
+"""
+Reproducible, collision-free random number streams.
+
+All random numbers of a run are derived from a single seed (the entropy of a
+numpy.random.SeedSequence). Independent child streams are obtained for each
+stage of the pipeline (disorder, preparation, dynamics, bootstrap) and,
+optionally, for each sweep task, by means of the spawn key of the
+SeedSequence. Streams of different stages or tasks are statistically
+independent, and each stream is exactly reproducible from the recorded seed
+and key.
+
+Example:
+    seed = new_seed()
+    rng_J = stage_rng(seed, 'disorder')
+    rng_psi = stage_rng(seed, 'preparation', task_key(task))
+
+author: OM
+date: 2022-03-XX
+"""
+import json
+import zlib
+import secrets
+import numpy as np
+
+
+# -- STAGES OF THE PIPELINE, EACH WITH ITS OWN CHILD STREAM
+STAGES = {
+    'disorder': 0,
+    'preparation': 1,
+    'dynamics': 2,
+    'bootstrap': 3,
+}
+
+
+def new_seed():
+    r"""Fresh seed from the operating system's entropy source.
+
+    Other than int(time.time()), seeds drawn by concurrently started processes
+    do not collide. The seed is restricted to 63 bits so that it can be stored
+    as a signed 64-bit integer.
+
+    Returns: (seed)
+        seed (int): random seed.
+    """
+    return secrets.randbits(63)
+
+
+def task_key(task):
+    r"""Spawn key of sweep task.
+
+    Stable hash of the task parameters, independent of the position of the
+    task within the sweep.
+
+    Args:
+        task (dict): keyword arguments of task.
+
+    Returns: (key)
+        key (tuple): spawn key identifying the task.
+    """
+    s = json.dumps(task, sort_keys=True, default=str)
+    return (zlib.crc32(s.encode()),)
+
+
+def stage_seed_sequence(seed, stage, key=()):
+    r"""Seed sequence of child stream.
+
+    Args:
+        seed (int): seed of the run.
+        stage (str): stage of the pipeline, one of STAGES.
+        key (tuple): spawn key of the task, see function task_key (default:
+            ()).
+
+    Returns: (ss)
+        ss (np.random.SeedSequence): seed sequence of child stream.
+    """
+    return np.random.SeedSequence(seed, spawn_key=(STAGES[stage],) + tuple(key))
+
+
+def stage_rng(seed, stage, key=()):
+    r"""Random number generator of child stream.
+
+    Args:
+        seed (int): seed of the run.
+        stage (str): stage of the pipeline, one of STAGES.
+        key (tuple): spawn key of the task, see function task_key (default:
+            ()).
+
+    Returns: (rng)
+        rng (np.random.Generator): random number generator.
+    """
+    return np.random.default_rng(stage_seed_sequence(seed, stage, key))
+
+
+def seed_record(seed, key=()):
+    r"""Seed information to be stored along with the results of a run.
+
+    Returns: (res)
+        res (dict): seed entropy and spawn key of the task.
+    """
+    return {'seed_entropy': seed, 'seed_task_key': np.asarray(key, dtype=np.int64)}
+
+
+# EOF: rng.py
@@ -0,0 +1,205 @@
+"""
+Indexed catalog of simulation runs, stored in a local SQLite database.
+
+Each run file written by OBSERVER.save can be registered in the catalog
+together with its simulation parameters (all par_* entries), seed, process
+timestamps, file path and summary statistics. Runs can then be selected via
+queries instead of parsing file names and reopening archives, e.g.
+
+    cat = RUN_CATALOG('./run_catalog.sqlite')
+    runs = cat.query(N=32, par_t_max=('>=', 5e5))
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sqlite3
+import numpy as np
+
+
+# -- COLUMNS PRESENT IN EVERY CATALOG
+_BASE_COLUMNS = (
+    ('path', 'TEXT PRIMARY KEY'),
+    ('N', 'INTEGER'),
+    ('h0', 'REAL'),
+    ('seed', 'INTEGER'),
+    ('proc_start', 'TEXT'),
+    ('proc_end', 'TEXT'),
+    ('n_samples', 'INTEGER'),
+    ('t_last', 'REAL'),
+    ('a_av', 'REAL'),
+    ('h_av', 'REAL'),
+    ('m_av', 'REAL'),
+)
+
+# -- COMPARISON OPERATORS ALLOWED IN QUERIES
+_OPS = ('=', '!=', '<', '<=', '>', '>=')
+
+
+def _to_sql(x):
+    """Convert scalar to type storable by sqlite3."""
+    x = np.asarray(x)
+    if x.ndim != 0:
+        return None
+    x = x.item()
+    if isinstance(x, (bool, int, float, str)):
+        return x
+    return str(x)
+
+
+def run_summary(t, a, h, m_cplx):
+    """Summary statistics of a run.
+
+    Arguments:
+        t (np.ndarray, 1-dim): measurement times.
+        a (np.ndarray, 1-dim): power per mode.
+        h (np.ndarray, 1-dim): energy density.
+        m_cplx (np.ndarray, 1-dim): complex-valued magnetization.
+
+    Returns: (res)
+        res (dict): number of samples, last time, and averages of a, h and |m|.
+    """
+    t = np.asarray(t)
+    if t.size == 0:
+        return {'n_samples': 0}
+    return {
+        'n_samples': t.size,
+        't_last': float(t[-1]),
+        'a_av': float(np.mean(a)),
+        'h_av': float(np.mean(h)),
+        'm_av': float(np.mean(np.abs(m_cplx))),
+    }
+
+
+class RUN_CATALOG():
+    """SQLite-backed index of run files.
+
+    Notes:
+        - The database is created on first use. Columns for new par_*
+          parameters are added on the fly.
+        - Registering a path that is already present replaces the old entry.
+        - Several processes may register runs concurrently; sqlite serializes
+          the writes.
+
+    Arguments:
+        db_name (str): file name of the database (default:
+            './run_catalog.sqlite').
+        timeout (float): seconds to wait for a locked database (default: 60).
+    """
+    def __init__(self, db_name='./run_catalog.sqlite', timeout=60.):
+        self.db_name = db_name
+        self.timeout = timeout
+        with self._connect() as con:
+            cols = ', '.join('%s %s' % c for c in _BASE_COLUMNS)
+            con.execute('CREATE TABLE IF NOT EXISTS runs (%s)' % cols)
+            con.execute('CREATE INDEX IF NOT EXISTS runs_N_h0 ON runs (N, h0)')
+        con.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_name, timeout=self.timeout)
+
+    def _columns(self, con):
+        return [r[1] for r in con.execute('PRAGMA table_info(runs)')]
+
+    def add(self, path, **kwargs):
+        """Register run file.
+
+        Arguments:
+            path (str): file name of the run.
+            **kwargs: parameters and summary statistics; non-scalar values
+                (e.g. cfg_ini) are ignored.
+        """
+        row = {'path': os.path.abspath(path)}
+        for key, val in kwargs.items():
+            if key.isidentifier():
+                val = _to_sql(val)
+                if val is not None:
+                    row[key] = val
+        con = self._connect()
+        with con:
+            cols = self._columns(con)
+            for key in row:
+                if key not in cols:
+                    try:
+                        con.execute('ALTER TABLE runs ADD COLUMN "%s"' % key)
+                    except sqlite3.OperationalError:
+                        # ... COLUMN ADDED CONCURRENTLY BY ANOTHER PROCESS
+                        pass
+            keys = list(row)
+            con.execute('INSERT OR REPLACE INTO runs (%s) VALUES (%s)' % (
+                ', '.join('"%s"' % k for k in keys), ', '.join('?'*len(keys))),
+                [row[k] for k in keys])
+        con.close()
+
+    def add_file(self, path):
+        """Register existing run file by reading its contents.
+
+        Arguments:
+            path (str): file name of the run.
+        """
+        from .data_analysis import RUN_FILE, h0_from_file_name
+        with RUN_FILE(path, allow_pickle=True) as rf:
+            kwargs = {k: rf[k] for k in rf.keys()
+                      if k.startswith('par_') or k in ('N', 'seed', 'log_every_n', 'h0', 'proc_start', 'proc_end')}
+            if 'h0' not in kwargs:
+                kwargs['h0'] = h0_from_file_name(path)
+            kwargs.update(run_summary(rf['t'], rf['a'], rf['h'], rf['m_cplx']))
+        self.add(path, **kwargs)
+
+    def scan(self, path, ext='npz'):
+        """Register all run files in a directory that are not yet cataloged.
+
+        Arguments:
+            path (str): directory holding run files.
+            ext (str): file extension (default: 'npz').
+
+        Returns: (n)
+            n (int): number of newly registered files.
+        """
+        known = set(r['path'] for r in self.query())
+        n = 0
+        for f in sorted(os.listdir(path)):
+            f_name = os.path.abspath(os.path.join(path, f))
+            if f.endswith(ext) and f_name not in known:
+                self.add_file(f_name)
+                n += 1
+        return n
+
+    def query(self, order_by=('N', 'h0'), **conditions):
+        """Select runs.
+
+        Conditions are given as column=value for equality, or as
+        column=(op, value) with op one of =, !=, <, <=, >, >=.
+
+        Arguments:
+            order_by (tuple): columns to sort by (default: ('N', 'h0')).
+            **conditions: selection criteria, combined by logical and.
+
+        Returns: (runs)
+            runs (list): dict of column values for each selected run.
+        """
+        clauses, args = [], []
+        for key, val in conditions.items():
+            op, val = val if isinstance(val, tuple) else ('=', val)
+            if op not in _OPS:
+                raise ValueError('unsupported operator %s' % op)
+            clauses.append('"%s" %s ?' % (key, op))
+            args.append(_to_sql(val))
+        sql = 'SELECT * FROM runs'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        if order_by:
+            sql += ' ORDER BY ' + ', '.join('"%s"' % k for k in order_by)
+        con = self._connect()
+        con.row_factory = sqlite3.Row
+        with con:
+            res = [dict(r) for r in con.execute(sql, args)]
+        con.close()
+        return res
+
+    def paths(self, **conditions):
+        """File names of selected runs, see method query."""
+        return [r['path'] for r in self.query(**conditions)]
+
+
+# EOF: run_catalog.py
@@ -0,0 +1,197 @@
+"""
+Snapshot schedules, deciding at which times OBSERVER records the state.
+
+A schedule provides the next output time after a given time via next_time(t).
+OBSERVER records a snapshot whenever the current time has reached the next
+output time, and then calls update(obs), allowing adaptive schedules to adjust
+their spacing to the data recorded so far. If the same schedule is passed to
+function evolve_DOP853 in module solver, the integrator steps exactly to the
+output times, so that no callbacks are spent in between.
+
+Available schedules:
+    UNIFORM_SCHEDULE: evenly spaced times.
+    LOG_SCHEDULE: logarithmically spaced times, resolving early relaxation.
+    EQUILIBRATION_SCHEDULE: logarithmic spacing until equilibration of |m| is
+        detected, evenly spaced times afterwards.
+    AUTOCORRELATION_SCHEDULE: spacing tied to the integrated autocorrelation
+        time of the complex-valued magnetization, measured on the fly.
+
+Example:
+    sched = EQUILIBRATION_SCHEDULE(t_first=1., dt=100.)
+    obs = OBSERVER(N, J, chi, Nt, h0, schedule=sched)
+    evolve_DOP853(J, chi, psi0, t_min, t_max, Nt, obs.callback, schedule=sched)
+
+Notes:
+    - Analyses assuming evenly spaced samples, e.g. autocorrelation_fft in
+      module data_analysis, apply to the evenly spaced part of a run only,
+      i.e. for times beyond sched_t_eq for EQUILIBRATION_SCHEDULE.
+
+author: OM
+date: 2022-03-XX
+"""
+import numpy as np
+from .data_analysis import integrated_autocorrelation_time
+
+
+# -- RELATIVE TOLERANCE FOR COMPARING TIMES
+_RTOL = 1e-9
+
+
+def reached(t, t_next):
+    r"""Whether time t has reached output time t_next, up to round-off."""
+    return t >= t_next - _RTOL*max(1., abs(t_next))
+
+
+class UNIFORM_SCHEDULE():
+    r"""Evenly spaced output times t0, t0+dt, t0+2*dt, ..."""
+    def __init__(self, dt, t0=0.):
+        self.dt = dt
+        self.t0 = t0
+
+    def next_time(self, t):
+        if t < self.t0 - _RTOL*max(1., abs(self.t0)):
+            return self.t0
+        k = np.floor((t - self.t0)/self.dt + _RTOL) + 1
+        return self.t0 + k*self.dt
+
+    def update(self, obs):
+        pass
+
+    def info(self):
+        return {'sched_name': type(self).__name__, 'sched_dt': self.dt}
+
+
+class LOG_SCHEDULE():
+    r"""Output times t0 and t0 + t_first*r**k, with n_per_decade times per
+    decade, up to t_max."""
+    def __init__(self, t_first=1., t_max=1e6, n_per_decade=20, t0=0.):
+        n = int(np.ceil(n_per_decade*np.log10(t_max/t_first))) + 1
+        self.times = t0 + np.concatenate(([0.], np.geomspace(t_first, t_max, n)))
+        self.n_per_decade = n_per_decade
+
+    def next_time(self, t):
+        i = np.searchsorted(self.times, t + _RTOL*max(1., abs(self.times[-1])), side='right')
+        return self.times[i] if i < self.times.size else np.inf
+
+    def update(self, obs):
+        pass
+
+    def info(self):
+        return {'sched_name': type(self).__name__, 'sched_n_per_decade': self.n_per_decade}
+
+
+class EQUILIBRATION_SCHEDULE():
+    r"""Logarithmic spacing until equilibration, evenly spaced times afterwards.
+
+    Equilibration is detected at time t once the mean values of |m| recorded
+    in [t/4, t/2) and [t/2, t] agree within n_sigma combined standard errors,
+    each interval holding at least n_min samples, and t >= t_eq_min. The
+    latter guards against the initial stage, where |m| barely changes over
+    short times. The time t is kept as the equilibration time t_eq, after which
+    snapshots are taken every dt.
+
+    Args:
+        t_first (float): first output time after t0 (default: 1).
+        dt (float): spacing after equilibration (default: 100).
+        n_per_decade (int): number of output times per decade before
+            equilibration (default: 20).
+        n_sigma (float): tolerance in units of the standard error (default: 1).
+        n_min (int): minimum number of samples per interval (default: 5).
+        t_eq_min (float): minimum equilibration time (default: None, i.e.
+            10*dt).
+        t0 (float): initial time (default: 0).
+    """
+    def __init__(self, t_first=1., dt=100., n_per_decade=20, n_sigma=1., n_min=5, t_eq_min=None, t0=0.):
+        self.t_first = t_first
+        self.dt = dt
+        self.r = 10.**(1./n_per_decade)
+        self.n_sigma = n_sigma
+        self.n_min = n_min
+        self.t_eq_min = 10*dt if t_eq_min is None else t_eq_min
+        self.t0 = t0
+        self.t_eq = None
+
+    def next_time(self, t):
+        if self.t_eq is not None:
+            k = np.floor((t - self.t_eq)/self.dt + _RTOL) + 1
+            return self.t_eq + k*self.dt
+        s = t - self.t0
+        if s < self.t_first*(1. - _RTOL):
+            return self.t0 if s < -_RTOL*max(1., abs(self.t0)) else self.t0 + self.t_first
+        k = np.floor(np.log(s/self.t_first)/np.log(self.r) + _RTOL) + 1
+        return self.t0 + self.t_first*self.r**k
+
+    def update(self, obs):
+        if self.t_eq is not None:
+            return
+        t = np.asarray(obs.t) - self.t0
+        m = np.abs(np.asarray(obs.m_cplx))
+        s = t[-1]
+        if s < self.t_eq_min:
+            return
+        m1 = m[(t >= s/4) & (t < s/2)]
+        m2 = m[t >= s/2]
+        if m1.size < self.n_min or m2.size < self.n_min:
+            return
+        err = np.sqrt(np.var(m1)/m1.size + np.var(m2)/m2.size)
+        if np.abs(np.mean(m1) - np.mean(m2)) <= self.n_sigma*err:
+            self.t_eq = obs.t[-1]
+
+    def info(self):
+        return {'sched_name': type(self).__name__, 'sched_dt': self.dt,
+                'sched_t_eq': np.nan if self.t_eq is None else self.t_eq}
+
+
+class AUTOCORRELATION_SCHEDULE():
+    r"""Spacing tied to the integrated autocorrelation time of m_cplx.
+
+    Starting from spacing dt_min, every n_update snapshots the integrated
+    autocorrelation time tau_int of the complex-valued magnetization is
+    estimated from the last n_update (evenly spaced) snapshots, see function
+    integrated_autocorrelation_time in module data_analysis. If tau_int is
+    resolved, i.e. exceeds one sample, the spacing is set to c*tau_int (in
+    units of time); otherwise the snapshots are already uncorrelated and the
+    spacing is multiplied by growth. The spacing is kept within [dt_min,
+    dt_max].
+
+    Args:
+        dt_min (float): minimum (and initial) spacing (default: 1).
+        dt_max (float): maximum spacing (default: np.inf).
+        c (float): spacing in units of tau_int (default: 1).
+        n_update (int): number of snapshots between updates (default: 64).
+        growth (float): growth factor of spacing (default: 2).
+        t0 (float): initial time (default: 0).
+    """
+    def __init__(self, dt_min=1., dt_max=np.inf, c=1., n_update=64, growth=2., t0=0.):
+        self.dt_min = dt_min
+        self.dt_max = dt_max
+        self.c = c
+        self.n_update = n_update
+        self.growth = growth
+        self.dt = dt_min
+        self.t_ref = t0
+        self.n_ref = 0
+
+    def next_time(self, t):
+        if t < self.t_ref - _RTOL*max(1., abs(self.t_ref)):
+            return self.t_ref
+        k = np.floor((t - self.t_ref)/self.dt + _RTOL) + 1
+        return self.t_ref + k*self.dt
+
+    def update(self, obs):
+        n = len(obs.t)
+        if n - self.n_ref < self.n_update:
+            return
+        t = np.asarray(obs.t[-self.n_update:])
+        m = np.asarray(obs.m_cplx[-self.n_update:])
+        tau_int, tau_int_t, _, _ = integrated_autocorrelation_time(t, m)
+        dt = self.c*tau_int_t if tau_int > 1. else self.growth*self.dt
+        self.dt = min(max(dt, self.dt_min), self.dt_max)
+        self.t_ref = obs.t[-1]
+        self.n_ref = n
+
+    def info(self):
+        return {'sched_name': type(self).__name__, 'sched_dt': self.dt}
+
+
+# EOF: schedule.py
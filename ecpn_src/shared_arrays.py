@@ -0,0 +1,150 @@
+"""
+Sharing large read-only arrays, such as the coupling matrix J, among worker
+processes.
+
+Arrays are published once, either in shared memory (multiprocessing.
+shared_memory) or as memory-mapped .npy files, and workers attach to them
+read-only and without copying. Together with a limit on the number of BLAS
+threads per worker, set in the parent before the workers are spawned, this
+allows to run one process per core on large networks.
+
+Example:
+    desc, handles = publish_arrays({'J': J})
+    with blas_thread_limit(1), cf.ProcessPoolExecutor(n_proc,
+            mp_context=mp.get_context('spawn'), initializer=init_worker,
+            initargs=(desc,)) as ex:
+        ...  # workers access SHARED['J']
+    release_arrays(handles)
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import contextlib
+import numpy as np
+from multiprocessing import shared_memory
+
+
+# -- ARRAYS ATTACHED IN THE CURRENT (WORKER) PROCESS
+SHARED = {}
+# -- SHARED MEMORY SEGMENTS KEPT OPEN BY THE CURRENT PROCESS
+_SEGMENTS = []
+
+# -- ENVIRONMENT VARIABLES LIMITING THREADS OF BLAS/OPENMP BACKENDS
+BLAS_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+             'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+def _shm(name=None, create=False, size=0):
+    # ... ATTACHING PROCESSES MUST NOT UNLINK THE SEGMENT (track ADDED IN 3.13)
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=create)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name, create=create, size=size)
+
+
+def publish_arrays(arrays, path=None):
+    r"""Publish arrays for read-only access by other processes.
+
+    Args:
+        arrays (dict): arrays keyed by name.
+        path (str): directory for memory-mapped .npy files; if None, arrays
+            are placed in shared memory (default: None).
+
+    Returns: (desc, handles)
+        desc (dict): picklable description of the published arrays, to be
+            passed to function attach_arrays.
+        handles (list): shared memory segments, to be released by function
+            release_arrays once all workers are done.
+    """
+    desc, handles = {}, []
+    for key, x in arrays.items():
+        x = np.ascontiguousarray(x)
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            f_name = os.path.join(path, key + '.npy')
+            np.save(f_name, x)
+            desc[key] = ('mmap', f_name, x.shape, x.dtype.str)
+        else:
+            shm = _shm(create=True, size=max(x.nbytes, 1))
+            np.ndarray(x.shape, dtype=x.dtype, buffer=shm.buf)[...] = x
+            handles.append(shm)
+            desc[key] = ('shm', shm.name, x.shape, x.dtype.str)
+    return desc, handles
+
+
+def attach_arrays(desc):
+    r"""Attach to published arrays.
+
+    Args:
+        desc (dict): description of published arrays, see function
+            publish_arrays.
+
+    Returns: (arrays)
+        arrays (dict): read-only, zero-copy views of the arrays.
+    """
+    arrays = {}
+    for key, (kind, name, shape, dtype) in desc.items():
+        if kind == 'mmap':
+            x = np.load(name, mmap_mode='r')
+        else:
+            shm = _shm(name=name)
+            _SEGMENTS.append(shm)
+            x = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            x.flags.writeable = False
+        arrays[key] = x
+    return arrays
+
+
+def release_arrays(handles):
+    r"""Free shared memory segments created by function publish_arrays."""
+    for shm in handles:
+        shm.close()
+        shm.unlink()
+
+
+@contextlib.contextmanager
+def blas_thread_limit(n=1):
+    r"""Limit number of BLAS/OpenMP threads of processes started within.
+
+    Sets the environment variables BLAS_VARS for the duration of the with
+    block, and restores them afterwards.
+
+    Notes:
+        - BLAS libraries read these variables when they are loaded, i.e.
+          when numpy is imported. The limit thus applies to worker processes
+          started with the 'spawn' (or 'forkserver') method within the with
+          block, but neither to the current process nor to forked workers.
+
+    Args:
+        n (int): number of threads; None leaves the environment unchanged
+            (default: 1).
+    """
+    if n is None:
+        yield
+        return
+    env = {k: os.environ.get(k) for k in BLAS_VARS}
+    os.environ.update({k: str(n) for k in BLAS_VARS})
+    try:
+        yield
+    finally:
+        for k, v in env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def init_worker(desc):
+    r"""Initializer for pool workers.
+
+    Attaches to published arrays, which are then accessible via the module
+    level dict SHARED.
+
+    Args:
+        desc (dict): description of published arrays.
+    """
+    SHARED.update(attach_arrays(desc))
+
+
+# EOF: shared_arrays.py
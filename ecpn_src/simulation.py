@@ -0,0 +1,111 @@
+"""
+Single simulation run of a photonic network for a given coupling matrix.
+
+Function simulate_point prepares the initial state, integrates the equations
+of motion, and saves the observables of the run. It is shared by the scripts
+in results/numExp01_small_systems (helper_sim, run_task) and the command-line
+interface (run_point in module cli), which differ only in where the coupling
+matrix comes from: drawn for the run, published in shared memory (module
+shared_arrays), or cached per process.
+
+author: OM
+date: 2022-03-XX
+"""
+import numpy as np
+from .thermodynamic_quantities import energy
+from .initial_state_heuristic import get_initial_state_ecpn
+from .measurement import OBSERVER
+from .solver import evolve_DOP853, default_rtol, PRECISION
+from .rng import stage_rng, seed_record
+from .profiling import run_profile
+from .writer import get_writer
+
+
+def simulate_point(J, N=12, h0=0.5, J0=1.2, sigma=0., chi=1., dh=0.001, t_min=0, t_max=1e6,
+                   Nt=10001, log_every_n=10, seed=0, key=(), path='./', f_name='obs',
+                   catalog=None, schedule=None, precision='double', rtol=None, background=False, eig_J=None):
+    r"""Simulate single point and save its observables.
+
+    Notes:
+        - J0 and sigma only label the output file, J has to be the coupling
+          matrix of the corresponding disorder realization.
+        - The initial state is drawn from the 'preparation' stream of seed
+          and key, see module rng.
+
+    Args:
+        J (np.ndarray, 2-dim): symmetric coupling matrix, cast to the
+            precision of the run.
+        N (int): number of modes (default: 12).
+        h0 (float): energy density of the initial state (default: 0.5).
+        J0 (float): mean coupling strength (default: 1.2).
+        sigma (float): disorder strength (default: 0).
+        chi (float): nonlinearity (default: 1).
+        dh (float): tolerance of the energy density (default: 0.001).
+        t_min (float): initial time (default: 0).
+        t_max (float): final time (default: 1e6).
+        Nt (int): number of output times (default: 10001).
+        log_every_n (int): log interval in output times (default: 10).
+        seed (int): seed of the run (default: 0).
+        key (tuple): spawn key of the task, see function task_key in module
+            rng (default: ()).
+        path (str): output directory, with trailing slash (default: './').
+        f_name (str): output file name, without extension, also naming the
+            log file (default: 'obs').
+        catalog (str): file name of RUN_CATALOG database, or None (default:
+            None).
+        schedule (object): protocol of time-dependent parameters, see module
+            schedule (default: None).
+        precision (str): 'double' or 'single', see PRECISION in module
+            solver (default: 'double').
+        rtol (float): relative tolerance of the integrator, kept in the output
+            file as par_rtol; None selects the default of the precision, see
+            function evolve_DOP853 in module solver (default: None).
+        background (bool): write output in a background thread, see module
+            writer (default: False).
+        eig_J (np.ndarray, 1-dim): eigenvalues of J, kept in the output if
+            given (default: None).
+    """
+    with run_profile(f_name):
+
+        # -- MODE-MODE COUPLING MATRIX, SINGLE PRECISION J SELECTS SINGLE PRECISION MATRIX-VECTOR PRODUCT
+        dtype_J, dtype_cfg = PRECISION[precision]
+        J = np.asarray(J, dtype=dtype_J)
+        if rtol is None:
+            rtol = default_rtol(J)
+
+        # -- PREPARE INITIAL MODE CONFIGURATION, ENERGIES IN DOUBLE PRECISION AS IN OBSERVER
+        J_64 = J.astype(np.float64, copy=False)
+        h_fun = lambda x: energy(J_64,chi,x)/N
+        psi0, _ = get_initial_state_ecpn(N, h_fun, h0, dh=dh, rng=stage_rng(seed, 'preparation', key))
+
+        # -- RUN SIMULATION AND MEAURE QUANTITIES OF INTEREST
+        obs = OBSERVER(N, J, chi, Nt, h0, every=log_every_n, schedule=schedule, dtype=dtype_cfg,
+                       f_name=f_name)
+        _, cfg = evolve_DOP853(J, chi, psi0, t_min, t_max, Nt, obs.callback, schedule=schedule, rtol=rtol)
+
+        # -- ADDITIONAL QUANTITIES OF INTEREST TO KEEP
+        res_dict = {
+            'par_J0': J0,
+            'par_chi': chi,
+            'par_sigma': sigma,
+            'par_dh': dh,
+            'par_t_min' : t_min,
+            'par_t_max' : t_max,
+            'par_Nt': Nt,
+            'log_every_n': log_every_n,
+            'seed':seed,
+            'par_precision': precision,
+            'par_rtol': rtol,
+            'cfg_ini': psi0,
+            'cfg_fin': cfg,
+            **seed_record(seed, key)
+            }
+        if eig_J is not None:
+            res_dict['eig_J'] = eig_J
+
+        # -- SAVE RESULTS, IN THE BACKGROUND IF REQUESTED
+        obs.save(path=path, f_name=f_name, catalog=catalog,
+                 writer=get_writer() if background else None, **res_dict)
+
+
+# EOF: simulation.py
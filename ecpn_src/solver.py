@@ -6,10 +6,39 @@ DATE: 2020-01-17
 """
 import sys
 import numpy as np
-from scipy.integrate import complex_ode
+from .profiling import wrap
 
 
-def evolve_DOP853(J, chi, psi, t_min, t_max, Nt, callback_fun):
+# -- PRECISION MODES: (TYPE OF COUPLING MATRIX, STORAGE TYPE OF CONFIGURATIONS)
+PRECISION = {
+    'double': (np.float64, None),
+    'single': (np.float32, np.complex64),
+}
+
+
+def default_rtol(J):
+    r"""Default relative tolerance of function evolve_DOP853 for coupling matrix J."""
+    return 1e-7 if J.dtype == np.float32 else 1e-10
+
+
+def evolve_DOP853(J, chi, psi, t_min, t_max, Nt, callback_fun, schedule=None, rtol=None):
+    r"""Integrate equations of motion by DOP853.
+
+    The callback is called as callback_fun(it, t, psi) at the Nt-1 evenly
+    spaced times t_min+dt, ..., t_max or, if a snapshot schedule (see module
+    schedule) is given, at the output times of the schedule up to t_max.
+
+    Mixed precision: if J is single precision (np.float32), the matrix-vector
+    product, which dominates the cost for large N, is carried out in single
+    precision, as a real matrix product of J with the real and imaginary
+    parts of the state. The state, the nonlinear term and the integrator
+    remain in double precision (DOP853 of scipy is double precision only).
+    As the round-off of the single-precision product (~1e-7) exceeds the
+    default tolerance rtol=1e-10, the step size control would stall; the
+    default tolerance for single-precision J is therefore rtol=1e-7.
+    """
+    # -- IMPORTED ON FIRST USE TO KEEP PACKAGE IMPORT LIGHTWEIGHT
+    from scipy.integrate import complex_ode
     t, dt = np.linspace(t_min, t_max, Nt, endpoint=True, retstep=True)
 
     #J0 = J[1,2]
@@ -20,13 +49,31 @@ def evolve_DOP853(J, chi, psi, t_min, t_max, Nt, callback_fun):
     # -- EQUATIONS OF MOTION FOR NONLINEAR MULTIMODE PHOTONIC NETWORK (NMPN) 
     _NMPN_RHS = lambda dt, x: -1j*(-np.dot(J,x) + chi*np.abs(x)**2*x)
 
+    if rtol is None:
+        rtol = default_rtol(J)
+    if J.dtype == np.float32:
+        N = J.shape[0]
+        _Jx = lambda x: np.dot(J, x.astype(np.complex64).view(np.float32).reshape(N, 2)).view(np.complex64).ravel()
+        _NMPN_RHS = lambda dt, x: -1j*(-_Jx(x) + chi*np.abs(x)**2*x)
+
+    # -- TIMERS ONLY IF PROFILING IS ENABLED, SEE MODULE PROFILING
+    _NMPN_RHS = wrap('solver.rhs', _NMPN_RHS)
+    callback_fun = wrap('solver.callback', callback_fun)
+
     solver = complex_ode(_NMPN_RHS)
-    solver.set_integrator('dop853', rtol=1e-10)
+    if schedule is None:
+        solver.set_integrator('dop853', rtol=rtol)
+    else:
+        # ... OUTPUT TIMES MAY BE FAR APART
+        solver.set_integrator('dop853', rtol=rtol, nsteps=2**31-1)
     solver.set_initial_value(psi, t.min())
 
     it=0
     while solver.successful() and solver.t < t.max():
-        solver.integrate(solver.t+dt)
+        if schedule is None:
+            solver.integrate(solver.t+dt)
+        else:
+            solver.integrate(min(schedule.next_time(solver.t), t.max()))
         callback_fun(it, solver.t, solver.y)
         it += 1
 
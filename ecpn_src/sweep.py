@@ -0,0 +1,200 @@
+"""
+Resumable scheduler for parameter sweeps.
+
+A sweep is a list of tasks, each a dict of keyword arguments for a run
+function. Tasks whose output file already exists are skipped, so that an
+interrupted sweep can simply be restarted. Remaining tasks are ordered by
+estimated cost, largest first, and executed on a pool of worker processes,
+retrying failed tasks.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import itertools
+import traceback
+import concurrent.futures as cf
+from .writer import flush_writer, pop_write_errors
+from .shared_arrays import blas_thread_limit
+
+
+def expand_grid(**axes):
+    r"""Expand parameter grid into list of tasks.
+
+    Each keyword is either a scalar, kept fixed for all tasks, or a list
+    (tuple, np.ndarray) of values, spanning one axis of the grid.
+
+    Example:
+        tasks = expand_grid(N=[8, 16], h0=np.linspace(0.6, 0.9, 13), seed=[0,
+        1], t_max=1e6)
+
+    Returns: (tasks)
+        tasks (list): dict of keyword arguments for each grid point.
+    """
+    keys = list(axes)
+    vals = [list(v) if hasattr(v, '__len__') and not isinstance(v, str) else [v]
+            for v in axes.values()]
+    return [dict(zip(keys, p)) for p in itertools.product(*vals)]
+
+
+def default_cost(task, c_snap=0.03):
+    r"""Estimated cost of simulation task.
+
+    Dense matrix-vector products dominate, so that the cost of a run scales as
+    N^2 times the number of integration steps, which is proportional to t_max.
+    Each of the Nt output times adds an O(N^2) overhead (observer and restart
+    of the integrator), worth about c_snap units of integration time.
+    """
+    return task.get('N', 1)**2*(task.get('t_max', 1) + c_snap*task.get('Nt', 1))
+
+
+def _run_task(run_fun, task):
+    try:
+        run_fun(**task)
+        err = None
+    except Exception:
+        err = traceback.format_exc()
+    # ... ALSO REPORT FAILED BACKGROUND WRITES OF EARLIER TASKS, SEE MODULE WRITER
+    return err, pop_write_errors()
+
+
+def run_sweep(run_fun, tasks, out_name, n_proc=1, retries=2, cost_fun=default_cost, log=sys.stderr,
+              initializer=None, initargs=(), mp_context=None, blas_threads=None):
+    r"""Run parameter sweep, skipping tasks with existing output.
+
+    Notes:
+        - run_fun needs to be picklable, i.e. defined at module level.
+        - out_name(task) has to return the file name written by
+          run_fun(**task). Outputs should be written atomically, as done by
+          OBSERVER.save, so that existing files indicate finished tasks.
+        - A task raising an exception, or killing its worker process, is
+          resubmitted at most retries times. If a worker dies, all tasks in
+          flight on the pool fail; these are rerun one at a time, each on a
+          pool of its own, and only a task breaking its own pool is charged
+          an attempt.
+        - For n_proc=1, tasks are run in the current process, so that caches
+          (e.g. coupling matrices) persist from one task to the next.
+        - Outputs may be written in the background (see module writer), so
+          that a task can return before its output exists. Failed background
+          writes are logged as they are reported, and, at the end of each
+          round, tasks without output are treated as failed. A task is
+          logged as DONE only once its output exists.
+        - blas_threads only limits workers started with the 'spawn' method,
+          see function blas_thread_limit in module shared_arrays.
+
+    Args:
+        run_fun (object): function performing a single task.
+        tasks (list): dict of keyword arguments for each task.
+        out_name (object): function returning output file name of task.
+        n_proc (int): number of worker processes (default: 1).
+        retries (int): number of retries of failed tasks (default: 2).
+        cost_fun (object): function estimating cost of task, used to run
+            expensive tasks first (default: default_cost).
+        log (file): stream for progress messages (default: sys.stderr).
+        initializer (object): function called by each worker at startup,
+            e.g. init_worker in module shared_arrays (default: None).
+        initargs (tuple): arguments of initializer (default: ()).
+        mp_context (object): multiprocessing context (default: None).
+        blas_threads (int): BLAS threads per worker process; None leaves
+            the environment unchanged (default: None).
+
+    Returns: (done, failed)
+        done (list): tasks completed in this sweep.
+        failed (list): tasks failing after all retries.
+    """
+    todo = [t for t in tasks if not os.path.exists(out_name(t))]
+    todo.sort(key=cost_fun, reverse=True)
+    print('# SWEEP: %d TASKS, %d DONE, %d TO RUN' % (
+        len(tasks), len(tasks)-len(todo), len(todo)), file=log, flush=True)
+
+    done, failed = [], []
+    attempts = {}
+    # -- DONE TASKS WHOSE OUTPUT IS STILL BEING WRITTEN, LOGGED ONCE IT EXISTS
+    unconfirmed = set()
+
+    def _book(task, err, write_err, retry):
+        _book_writes(write_err)
+        key = out_name(task)
+        if err is None:
+            done.append(task)
+            if os.path.exists(key):
+                print('# DONE %s' % key, file=log, flush=True)
+            else:
+                unconfirmed.add(key)
+            return
+        attempts[key] = attempts.get(key, 0) + 1
+        print('# FAILED (%d) %s\n%s' % (attempts[key], key, err), file=log, flush=True)
+        if attempts[key] <= retries:
+            retry.append(task)
+        else:
+            failed.append(task)
+
+    def _book_writes(write_err):
+        for path, tb in write_err:
+            print('# WRITE FAILED %s\n%s' % (path, tb), file=log, flush=True)
+
+    def _run_pool(batch, n_workers, retry):
+        # ... AT MOST n_workers TASKS IN FLIGHT, SO THAT A BROKEN POOL ONLY AFFECTS RUNNING TASKS
+        pending, broken = list(batch), []
+        while pending:
+            # ... WORKERS COMPLETE PENDING BACKGROUND WRITES BEFORE THEY EXIT
+            with cf.ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context,
+                                        initializer=initializer, initargs=initargs) as ex:
+                futures, is_broken = {}, False
+                while pending or futures:
+                    while pending and len(futures) < n_workers and not is_broken:
+                        t = pending.pop(0)
+                        futures[ex.submit(_run_task, run_fun, t)] = t
+                    if not futures:
+                        break
+                    finished, _ = cf.wait(futures, return_when=cf.FIRST_COMPLETED)
+                    for fut in finished:
+                        t = futures.pop(fut)
+                        try:
+                            err, write_err = fut.result()
+                        except cf.process.BrokenProcessPool:
+                            # ... SOME WORKER DIED, E.G. OUT OF MEMORY
+                            is_broken = True
+                            broken.append(t)
+                            continue
+                        except Exception:
+                            err, write_err = traceback.format_exc(), []
+                        _book(t, err, write_err, retry)
+        return broken
+
+    if n_proc == 1 and todo and initializer is not None:
+        initializer(*initargs)
+    # -- TASKS OF A BROKEN POOL, RERUN ALONE TO FIND THE ONE BREAKING IT
+    alone = []
+    with blas_thread_limit(blas_threads if n_proc > 1 else None):
+        while todo or alone:
+            retry, suspects = [], []
+            n_done = len(done)
+            if n_proc == 1:
+                for task in todo:
+                    _book(task, *_run_task(run_fun, task), retry)
+                _book_writes(flush_writer())
+            else:
+                for task in _run_pool(todo, n_proc, retry):
+                    print('# POOL BROKEN, RERUN ALONE %s' % out_name(task), file=log, flush=True)
+                    suspects.append(task)
+                for task in alone:
+                    for t in _run_pool([task], 1, retry):
+                        # ... RETRIED ALONE AS WELL, SO AS NOT TO BREAK THE POOL AGAIN
+                        _book(t, 'worker process died, e.g. out of memory\n', [], suspects)
+            # -- TASKS WHOSE OUTPUT WAS NOT WRITTEN
+            for task in done[n_done:]:
+                key = out_name(task)
+                if os.path.exists(key):
+                    if key in unconfirmed:
+                        print('# DONE %s' % key, file=log, flush=True)
+                    continue
+                done.remove(task)
+                _book(task, 'output missing, e.g. failed background write\n', [], retry)
+            unconfirmed.clear()
+            todo, alone = retry, suspects
+    return done, failed
+
+
+# EOF: sweep.py
@@ -0,0 +1,255 @@
+"""
+Task queue for sweeps across several nodes, backed by a SQLite database on a
+shared filesystem.
+
+Tasks are claimed atomically by worker processes, which hold a lease on the
+claimed task and renew it via heartbeats while working. If a worker, or its
+node, crashes, the lease expires and the task is reclaimed by another worker.
+No job broker or other external service is needed.
+
+Notes:
+    - SQLite relies on file locking. Most shared filesystems (e.g. NFSv4,
+      Lustre, BeeGFS) support it; on filesystems without working locks, the
+      database should live on a single node's local disk instead.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import json
+import time
+import socket
+import _thread
+import sqlite3
+import threading
+import traceback
+from .writer import flush_writer
+
+
+class TASK_QUEUE():
+    """SQLite-backed queue of sweep tasks with leases.
+
+    Each task is a dict of keyword arguments, identified by a unique key (e.g.
+    its output file name). Status transitions are
+    pending -> running -> done, or, on failure, back to pending until
+    max_attempts is reached, and then to failed. A task whose lease expires,
+    e.g. because it killed its node, counts as failed attempt as well.
+
+    Arguments:
+        db_name (str): file name of the database.
+        lease (float): seconds a claim stays valid without heartbeat
+            (default: 600).
+        timeout (float): seconds to wait for a locked database (default: 60).
+        max_attempts (int): number of attempts per task (default: 3).
+    """
+    def __init__(self, db_name, lease=600., timeout=60., max_attempts=3):
+        self.db_name = db_name
+        self.lease = lease
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        con = self._connect()
+        with con:
+            con.execute('''CREATE TABLE IF NOT EXISTS tasks (
+                key TEXT PRIMARY KEY,
+                task TEXT,
+                priority REAL DEFAULT 0,
+                status TEXT DEFAULT 'pending',
+                worker TEXT,
+                lease_expires REAL DEFAULT 0,
+                attempts INTEGER DEFAULT 0,
+                error TEXT)''')
+            con.execute('CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, priority)')
+        con.close()
+
+    def _connect(self):
+        # ... AUTOCOMMIT MODE, TRANSACTIONS ARE OPENED EXPLICITLY
+        return sqlite3.connect(self.db_name, timeout=self.timeout, isolation_level=None)
+
+    def put(self, tasks, key_fun, priority_fun=None):
+        """Add tasks; tasks with a key already present are ignored.
+
+        Arguments:
+            tasks (list): dict of keyword arguments for each task.
+            key_fun (object): function returning unique key of task.
+            priority_fun (object): function returning priority of task; tasks
+                with higher priority are claimed first (default: None).
+
+        Returns: (n)
+            n (int): number of newly added tasks.
+        """
+        rows = [(key_fun(t), json.dumps(t), priority_fun(t) if priority_fun else 0.) for t in tasks]
+        con = self._connect()
+        con.execute('BEGIN IMMEDIATE')
+        n0 = con.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+        con.executemany('INSERT OR IGNORE INTO tasks (key, task, priority) VALUES (?, ?, ?)', rows)
+        n1 = con.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+        con.execute('COMMIT')
+        con.close()
+        return n1 - n0
+
+    def claim(self, worker):
+        """Claim the pending (or expired) task of highest priority.
+
+        Arguments:
+            worker (str): worker identifier.
+
+        Returns: (key, task)
+            key (str): key of claimed task, None if no task is available.
+            task (dict): keyword arguments of claimed task.
+        """
+        now = time.time()
+        con = self._connect()
+        # ... WRITE LOCK FROM THE START, SO THAT NO TWO WORKERS CLAIM THE SAME TASK
+        con.execute('BEGIN IMMEDIATE')
+        # -- EXPIRED LEASES WITHOUT ATTEMPTS LEFT
+        con.execute('''UPDATE tasks SET status = 'failed', lease_expires = 0,
+            error = 'lease of ' || worker || ' expired in attempt ' || attempts
+            WHERE status = 'running' AND lease_expires < ? AND attempts >= ?''',
+            (now, self.max_attempts))
+        row = con.execute('''SELECT key, task FROM tasks
+            WHERE status = 'pending' OR (status = 'running' AND lease_expires < ?)
+            ORDER BY priority DESC LIMIT 1''', (now,)).fetchone()
+        if row is not None:
+            con.execute('''UPDATE tasks SET status = 'running', worker = ?,
+                lease_expires = ?, attempts = attempts + 1 WHERE key = ?''',
+                (worker, now + self.lease, row[0]))
+        con.execute('COMMIT')
+        con.close()
+        if row is None:
+            return None, None
+        return row[0], json.loads(row[1])
+
+    def _update(self, sql, args):
+        con = self._connect()
+        con.execute('BEGIN IMMEDIATE')
+        n = con.execute(sql, args).rowcount
+        con.execute('COMMIT')
+        con.close()
+        return n > 0
+
+    def heartbeat(self, key, worker):
+        """Renew lease; returns False if the task was reclaimed meanwhile."""
+        return self._update('''UPDATE tasks SET lease_expires = ?
+            WHERE key = ? AND worker = ? AND status = 'running' ''',
+            (time.time() + self.lease, key, worker))
+
+    def complete(self, key, worker):
+        """Mark task as done; returns False if the task was reclaimed meanwhile."""
+        return self._update('''UPDATE tasks SET status = 'done', error = NULL
+            WHERE key = ? AND worker = ? AND status = 'running' ''', (key, worker))
+
+    def fail(self, key, worker, error=''):
+        """Return task to queue, or mark it as failed after max_attempts."""
+        return self._update('''UPDATE tasks SET
+            status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END,
+            error = ?, lease_expires = 0 WHERE key = ? AND worker = ? AND status = 'running' ''',
+            (self.max_attempts, error, key, worker))
+
+    def counts(self):
+        """Number of tasks per status.
+
+        Returns: (res)
+            res (dict): number of tasks keyed by status.
+        """
+        con = self._connect()
+        res = dict(con.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall())
+        con.close()
+        return res
+
+
+def run_worker(queue, run_fun, worker=None, heartbeat=60., poll=30., log=sys.stderr):
+    r"""Work on queued tasks until the queue is drained.
+
+    Claims tasks one at a time and runs run_fun(**task), renewing the lease
+    from a background thread every heartbeat seconds. If no task can be
+    claimed while tasks of other workers are still running, the worker polls
+    the queue so as to pick up tasks whose lease expired.
+
+    Notes:
+        - A renewal raising an exception, e.g. sqlite3.OperationalError
+          'database is locked', is logged and retried at the next heartbeat.
+        - The lease is lost if a renewal finds the task taken over by another
+          worker, or if renewals keep failing until the lease would expire
+          before the next one. The task is then stopped, by a
+          KeyboardInterrupt in the main thread, and neither completed nor
+          failed by this worker. run_worker thus has to be called from the
+          main thread.
+
+    Args:
+        queue (TASK_QUEUE): task queue.
+        run_fun (object): function performing a single task.
+        worker (str): worker identifier (default: hostname:pid).
+        heartbeat (float): seconds between lease renewals (default: 60).
+        poll (float): seconds between claims while waiting (default: 30).
+        log (file): stream for progress messages (default: sys.stderr).
+
+    Returns: (n_done)
+        n_done (int): number of tasks completed by this worker.
+    """
+    if worker is None:
+        worker = '%s:%d' % (socket.gethostname(), os.getpid())
+    n_done = 0
+    while True:
+        key, task = queue.claim(worker)
+        if key is None:
+            c = queue.counts()
+            if c.get('pending', 0) + c.get('running', 0) == 0:
+                return n_done
+            time.sleep(poll)
+            continue
+
+        stop, lost, guard = threading.Event(), threading.Event(), threading.Lock()
+        def _lose():
+            # ... STOP THE TASK, UNLESS IT HAS FINISHED ALREADY
+            with guard:
+                if not stop.is_set():
+                    lost.set()
+                    _thread.interrupt_main()
+        def _beat():
+            t_ok, n_err = time.time(), 0
+            while not stop.wait(heartbeat):
+                try:
+                    if not queue.heartbeat(key, worker):
+                        _lose()
+                        return
+                    t_ok, n_err = time.time(), 0
+                except Exception as exc:
+                    n_err += 1
+                    print('# %s HEARTBEAT FAILED (%d) %s: %r' % (worker, n_err, key, exc), file=log, flush=True)
+                    # ... GIVE UP BEFORE THE LEASE EXPIRES, AS THE TASK MAY THEN BE CLAIMED BY OTHERS
+                    if time.time() + heartbeat >= t_ok + queue.lease:
+                        _lose()
+                        return
+        th = threading.Thread(target=_beat, daemon=True)
+        th.start()
+        try:
+            try:
+                run_fun(**task)
+                # ... A TASK IS ONLY COMPLETE ONCE ITS OUTPUT IS WRITTEN, SEE MODULE WRITER
+                write_err = flush_writer()
+                err = '\n'.join(tb for _, tb in write_err) if write_err else None
+            except Exception:
+                err = traceback.format_exc()
+            finally:
+                with guard:
+                    stop.set()
+        except KeyboardInterrupt:
+            if not lost.is_set():
+                raise
+        th.join()
+
+        # -- LEASE TAKEN OVER BY ANOTHER WORKER, WHICH NOW OWNS THE TASK
+        if lost.is_set():
+            print('# %s LEASE LOST %s' % (worker, key), file=log, flush=True)
+            continue
+        if err is None:
+            queue.complete(key, worker)
+            n_done += 1
+            print('# %s DONE %s' % (worker, key), file=log, flush=True)
+        else:
+            queue.fail(key, worker, err)
+            print('# %s FAILED %s\n%s' % (worker, key, err), file=log, flush=True)
+
+
+# EOF: task_queue.py
@@ -6,8 +6,8 @@ author: OM
 date: 2022-01-06
 """
 import sys
+import hashlib
 import numpy as np
-import scipy.optimize as so
 
 
 def optical_temperature(N, A, E, e):
@@ -53,6 +53,7 @@ def optical_temperature(N, A, E, e):
 
     # -- RESTRICT ROOT-FINDING TO POSITIVE TEMPERATURE DOMAIN (OK FOR E<0) 
     T_min, T_max = rho[0]/N + 1e-1, 100.
+    import scipy.optimize as so
     Tc = so.bisect(fun, T_min, T_max)
 
     return Tc
@@ -109,3 +110,236 @@ def thermal_equilibrium_properties(N,A,E,e):
     mu = chemical_potential(N,A,E,Tc)
     n_av = average_optical_powers(e,Tc,mu)
     return Tc, mu, n_av
+
+
+def optical_temperature_batch(N, A, E, e, tol=1e-12, max_iter=200):
+    r"""Determine optical temperatures for many (A, E) points at once.
+
+    Vectorized counterpart of function optical_temperature. Solves the
+    Rayleigh-Jeans condition, Eq. (2) of Ref. [P2019], for all points
+    simultaneously, in terms of the inverse temperature beta=1/Tc, i.e.
+
+        g(beta) = sum_i 1/(N - beta*rho_i) - 1 = 0,  rho_i = E - A*e_i.
+
+    Notes:
+        - g is convex on its domain N/min(rho) < beta < N/max(rho) and has a
+          trivial root at beta=0. The physical root is at beta>0 if
+          E < A*mean(e), and at beta<0 (negative temperature) otherwise.
+        - For each point, a bracket between beta=0 and the pole of g on the
+          relevant side is used, which is refined by safeguarded Newton
+          iterations with analytic derivative, falling back to bisection
+          if a Newton step leaves the bracket.
+        - For E = A*mean(e), the temperature is infinite.
+        - Points with E outside the range [A*min(e), A*max(e)] have no
+          Rayleigh-Jeans solution and yield nan.
+
+    References:
+        [P2019] M. Parto, F.O. Wu, P.S. Jung, K. Makris, D.N. Christodouliedes,
+        Thermodynamic conditions governing the optical temperature and chemical
+        potential in nonlinear highly multimoded photonic systems, OL 22 (2019)
+        3936, https://doi.org/10.1364/OL.44.003936
+
+    Args:
+        N (int): number of nodes.
+        A (float or np.ndarray): total optical power.
+        E (float or np.ndarray): energy.
+        e (np.ndarray): eigenfrequencies of linear part, either 1-dim, or
+            with leading dimensions broadcasting with A and E (e.g. one
+            spectrum per disorder realization).
+        tol (float): relative tolerance on beta (default: 1e-12).
+        max_iter (int): maximum number of iterations (default: 200).
+
+    Returns: (Tc)
+        Tc (np.ndarray): optical temperatures, broadcast shape of A and E.
+    """
+    A = np.asarray(A, dtype=float)
+    E = np.asarray(E, dtype=float)
+    e = np.asarray(e, dtype=float)
+    rho = E[..., np.newaxis] - A[..., np.newaxis]*e
+    shape = rho.shape[:-1]
+    rho = rho.reshape(-1, rho.shape[-1])
+
+    # -- SIDE OF THE PHYSICAL ROOT FROM SLOPE OF g AT beta=0
+    s = -np.sign(np.sum(rho, axis=-1))
+    # -- POLE OF g ON THAT SIDE (BRACKET END WITH g>0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_pole = np.where(s > 0, np.max(rho, axis=-1), np.min(rho, axis=-1))
+        b_pole = np.where(s*r_pole > 0, N/r_pole, np.nan)
+    lo = np.zeros_like(b_pole)
+    hi = b_pole.copy()
+    # -- START CLOSE TO THE POLE, WHERE g>0 AND NEWTON CONVERGES MONOTONICALLY
+    beta = 0.99*b_pole
+    active = np.isfinite(b_pole) & (s != 0)
+
+    for _ in range(max_iter):
+        if not np.any(active):
+            break
+        b = beta[active]
+        r = rho[active]
+        d = N - b[:, np.newaxis]*r
+        g = np.sum(1./d, axis=-1) - 1.
+        dg = np.sum(r/d**2, axis=-1)
+        # -- UPDATE BRACKET: g>0 BETWEEN ROOT AND POLE, g<0 BETWEEN 0 AND ROOT
+        l, h = lo[active], hi[active]
+        l = np.where(g < 0, b, l)
+        h = np.where(g > 0, b, h)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            b_new = b - g/dg
+        # -- SAFEGUARD: BISECT IF NEWTON STEP LEAVES THE OPEN BRACKET
+        out = ~((b_new - l)*(b_new - h) < 0)
+        b_new = np.where(out, 0.5*(l + h), b_new)
+        lo[active], hi[active] = l, h
+        done = np.abs(b_new - b) <= tol*np.abs(b_new)
+        beta[active] = b_new
+        idx = np.flatnonzero(active)
+        active[idx[done]] = False
+
+    with np.errstate(divide='ignore'):
+        Tc = np.where(s == 0, np.inf, 1./beta)
+    return Tc.reshape(shape)
+
+
+def thermal_equilibrium_properties_batch(N, A, E, e):
+    r"""Thermal equilibrium properties for many (A, E) points at once.
+
+    Vectorized counterpart of function thermal_equilibrium_properties, see
+    function optical_temperature_batch.
+
+    Args:
+        N (int): number of nodes.
+        A (float or np.ndarray): total optical power.
+        E (float or np.ndarray): energy.
+        e (np.ndarray): eigenfrequencies of linear part.
+
+    Returns: (Tc, mu, n_av)
+        Tc (np.ndarray): optical temperatures.
+        mu (np.ndarray): chemical potentials.
+        n_av (np.ndarray): average modal occupancies, with trailing
+            dimension N.
+    """
+    Tc = optical_temperature_batch(N, A, E, e)
+    mu = chemical_potential(N, np.asarray(A), np.asarray(E), Tc)
+    n_av = average_optical_powers(e, Tc[..., np.newaxis], mu[..., np.newaxis])
+    return Tc, mu, n_av
+
+
+# -- IN-MEMORY CACHE OF LOOKUP TABLES, KEYED BY SPECTRUM AND TABLE PARAMETERS
+_TABLE_CACHE = {}
+
+
+def thermal_table(N, A, e, h_lim=None, tol=1e-6, n_init=65, max_points=2**16, f_name=None):
+    r"""Lookup table of thermal equilibrium properties for a fixed spectrum.
+
+    Tabulates the inverse optical temperature beta(h) = 1/Tc as function of
+    the energy density h = E/N, for fixed total optical power A, on an
+    adaptively refined grid. Chemical potential and modal occupancies follow
+    exactly from beta, see function thermal_table_lookup.
+
+    Notes:
+        - beta, other than Tc, is a smooth function of h, passing through
+          zero at infinite temperature, h = A*mean(e)/N.
+        - Intervals are bisected until linear interpolation at their
+          midpoints deviates from the exact solution by at most
+          tol*max(1, |beta|), or until the table holds max_points nodes.
+          The deviation measured at the midpoint of each interval is kept
+          as err. As beta is smooth, it is close to the largest deviation
+          within the interval, but not a strict bound.
+        - Tables are cached in memory, keyed by a hash of the spectrum and
+          the table parameters. If f_name is given, the table is also stored
+          in (and read from) that npz-file, e.g. next to the saved spectrum.
+
+    Args:
+        N (int): number of nodes.
+        A (float): total optical power.
+        e (np.ndarray, 1-dim): eigenfrequencies of linear part.
+        h_lim (tuple): range of energy densities (default: 99% of the
+            range A*[min(e), max(e)]/N).
+        tol (float): tolerance for linear interpolation of beta (default:
+            1e-6).
+        n_init (int): number of nodes of initial uniform grid (default: 65).
+        max_points (int): maximum number of nodes (default: 2**16).
+        f_name (str): npz-file storing the table (default: None).
+
+    Returns: (table)
+        table (dict): nodes h, inverse temperatures beta, relative errors err
+            of linear interpolation measured at the midpoints of the intervals
+            between nodes, and parameters N, A, e.
+    """
+    e = np.asarray(e, dtype=float)
+    if h_lim is None:
+        h_c, h_w = A*(e.max() + e.min())/2/N, A*(e.max() - e.min())/2/N
+        h_lim = (h_c - 0.99*h_w, h_c + 0.99*h_w)
+    key = '%s_%d_%r_%r_%r_%d_%d' % (hashlib.sha1(e.tobytes()).hexdigest(), N, float(A),
+                                    tuple(map(float, h_lim)), tol, n_init, max_points)
+    if key in _TABLE_CACHE:
+        return _TABLE_CACHE[key]
+    if f_name is not None:
+        try:
+            with np.load(f_name) as dat:
+                if str(dat['key']) == key:
+                    _TABLE_CACHE[key] = {k: dat[k][()] for k in dat.files if k != 'key'}
+                    return _TABLE_CACHE[key]
+        except (IOError, KeyError):
+            pass
+
+    beta_fun = lambda h: 1./optical_temperature_batch(N, A, h*N, e)
+    h = np.linspace(h_lim[0], h_lim[1], n_init)
+    beta = beta_fun(h)
+    # ... inf MARKS INTERVALS WHOSE ERROR IS NOT MEASURED YET
+    err = np.full(h.size-1, np.inf)
+    while True:
+        new = np.flatnonzero(np.isinf(err))
+        if new.size == 0:
+            break
+        # -- COMPARE EXACT AND INTERPOLATED VALUES AT MIDPOINTS
+        h_mid = 0.5*(h[new] + h[new+1])
+        b_mid = beta_fun(h_mid)
+        err[new] = np.abs(b_mid - 0.5*(beta[new] + beta[new+1]))/np.maximum(1., np.abs(b_mid))
+        # -- BISECT INTERVALS EXCEEDING tol, AS LONG AS NODES ARE LEFT, AND MEASURE THEIR HALVES
+        sel = np.flatnonzero(err[new] > tol)[:max_points - h.size]
+        if sel.size == 0:
+            break
+        bad = new[sel]
+        h = np.insert(h, bad+1, h_mid[sel])
+        beta = np.insert(beta, bad+1, b_mid[sel])
+        err[bad] = np.inf
+        err = np.insert(err, bad+1, np.inf)
+
+    table = {'h': h, 'beta': beta, 'err': err, 'N': N, 'A': A, 'e': e}
+    _TABLE_CACHE[key] = table
+    if f_name is not None:
+        np.savez(f_name, key=key, **table)
+    return table
+
+
+def thermal_table_lookup(table, h):
+    r"""Thermal equilibrium properties from lookup table.
+
+    Vectorized linear interpolation of the inverse optical temperature,
+    see function thermal_table, from which chemical potential and average
+    modal occupancies are obtained via functions chemical_potential and
+    average_optical_powers.
+
+    Args:
+        table (dict): lookup table, see function thermal_table.
+        h (float or np.ndarray): energy densities.
+
+    Returns: (Tc, mu, n_av, err)
+        Tc (np.ndarray): optical temperatures.
+        mu (np.ndarray): chemical potentials.
+        n_av (np.ndarray): average modal occupancies, with trailing
+            dimension N.
+        err (np.ndarray): relative interpolation error of beta=1/Tc, as
+            measured at the midpoint of the enclosing interval, see function
+            thermal_table; nan outside of the tabulated range.
+    """
+    h = np.asarray(h, dtype=float)
+    N, A, e = table['N'], table['A'], table['e']
+    beta = np.interp(h, table['h'], table['beta'], left=np.nan, right=np.nan)
+    idx = np.clip(np.searchsorted(table['h'], h) - 1, 0, table['err'].size-1)
+    err = np.where(np.isnan(beta), np.nan, table['err'][idx])
+    with np.errstate(divide='ignore'):
+        Tc = 1./beta
+    mu = chemical_potential(N, A, h*N, Tc)
+    n_av = average_optical_powers(e, Tc[..., np.newaxis], mu[..., np.newaxis])
+    return Tc, mu, n_av, err
@@ -1,6 +1,10 @@
 """
 Functions for analyzing field configurations.
 
+All functions accept either a single configuration (1-dim array of length N)
+or a block of T configurations, e.g. a trajectory (2-dim array of shape
+(T, N)), in which case one value per configuration is returned.
+
 author: OM
 date: 2022-01-04
 """
@@ -8,11 +12,26 @@ import numpy as np
 import numpy.linalg as nlin
 
 
-def energy(J, chi, psi):
+def _dot_double(psi, J, block=1024):
+    # ... psi J^T IN DOUBLE PRECISION FOR SINGLE-PRECISION J, WHICH IS UPCAST
+    # ... IN BLOCKS OF ROWS TO BOUND THE MEMORY OF THE TEMPORARY COPY
+    psi = np.asarray(psi, dtype=complex)
+    out = np.empty(psi.shape[:-1] + (J.shape[0],), dtype=complex)
+    for i0 in range(0, J.shape[0], block):
+        out[..., i0:i0+block] = np.dot(psi, J[i0:i0+block].astype(np.float64).T)
+    return out
+
+
+def energy(J, chi, psi, buf=None):
     r"""Extensive energy of mode configuration.
 
     Evaluates energy functional for a given mode condfiguration according to
-    Eq. (4) of Ref. [RFK2020].
+    Eq. (4) of Ref. [RFK2020]. For a block of configurations, the linear part
+    is obtained by a single matrix-matrix product. For a single-precision
+    coupling matrix, the energy is nevertheless accumulated in double
+    precision, so that it remains a sensitive check of energy conservation.
+    As this upcasts J on every call, callers evaluating many energies for
+    the same J, e.g. OBSERVER, pass a double-precision copy of J instead.
 
     References:
         [RFK2020] A. Ramos, L. Fernandez-Alcazar, T. Kottos, Optical Phase
@@ -22,14 +41,22 @@ def energy(J, chi, psi):
     Args:
         J (np.ndarray, 2-dim): coupling matrix.
         chi (float): nonlinear parameter.
-        psi (np.ndarray, 1-dim): mode configuration.
+        psi (np.ndarray, 1- or 2-dim): mode configuration(s).
+        buf (np.ndarray): complex-valued buffer with the shape of psi, reused
+            for the product of J and psi (default: None).
 
     Returns: (E)
-        E (float): energy of the mode configuration.
+        E (float or np.ndarray): energy of the mode configuration(s).
     """
-    h = np.dot(J,np.conj(psi))
-    E_L = -np.sum(h*psi)
-    E_N = 0.5*chi*np.sum(np.abs(psi)**4)
+    if J.dtype == np.float32:
+        h = _dot_double(np.conj(psi), J)
+        psi = np.asarray(psi, dtype=complex)
+    elif psi.ndim == 1:
+        h = np.dot(J,np.conj(psi))
+    else:
+        h = np.dot(np.conj(psi), J.T, out=buf)
+    E_L = -np.sum(h*psi, axis=-1)
+    E_N = 0.5*chi*np.sum(np.abs(psi)**4, axis=-1)
     return np.real(E_L + E_N)
 
 
@@ -45,15 +72,15 @@ def power(psi):
         X, 10 (2020) 031024, https://doi.org/10.1103/PhysRevX.10.031024.
 
     Args:
-        psi (np.ndarray, 1-dim): mode configuration.
+        psi (np.ndarray, 1- or 2-dim): mode configuration(s).
 
     Returns: (A)
-        A (float): optical power of the mode configuration.
+        A (float or np.ndarray): optical power of the mode configuration(s).
     """
-    return np.sum(np.abs(psi)**2)
+    return np.sum(np.abs(psi)**2, axis=-1)
 
 
-def amplitudes_from_field(psi, sm):
+def amplitudes_from_field(psi, sm, out=None):
     r"""Convert modes to supermode amplitudes.
 
     Note:
@@ -61,13 +88,15 @@ def amplitudes_from_field(psi, sm):
        module coupling_matrix.
 
     Args:
-        psi (np.ndarray, 1-dim): mode field configuration.
+        psi (np.ndarray, 1- or 2-dim): mode field configuration(s).
         sm (np.ndarray, 2-dim): data structure holding the supermodes.
+        out (np.ndarray): complex-valued output buffer with the shape of psi
+            (default: None).
 
     Returns: (C)
-        C (np.ndarray, 1-dim): complex-valued amplitudes of supermodes.
+        C (np.ndarray, 1- or 2-dim): complex-valued amplitudes of supermodes.
     """
-    return np.dot(psi, sm)
+    return np.dot(psi, sm, out=out)
 
 
 def field_from_amplitudes(C, sm):
@@ -78,13 +107,15 @@ def field_from_amplitudes(C, sm):
        module coupling_matrix.
 
     Args:
-        C (np.ndarray, 1-dim):  complex-valued supermode amplitudes.
+        C (np.ndarray, 1- or 2-dim):  complex-valued supermode amplitudes.
         sm (np.ndarray, 2-dim): data structure holding the supermodes.
 
     Returns: (psi)
-        psi (np.ndarray, 1-dim): mode field.
+        psi (np.ndarray, 1- or 2-dim): mode field(s).
     """
-    return np.dot(sm,C)
+    if C.ndim == 1:
+        return np.dot(sm,C)
+    return np.dot(C, sm.T)
 
 
 def magnetization_cplx(psi):
@@ -98,12 +129,12 @@ def magnetization_cplx(psi):
         [N2007] U. Nowak, Classical Spin Models, Micromagnetism, Wiley (2007)
 
     Args:
-        psi (np.ndarray, 1-dim): configuration of photonic soft-spins.
+        psi (np.ndarray, 1- or 2-dim): configuration(s) of photonic soft-spins.
 
     Returns: (m_cplx)
-        m_cplx (complex): complex-valued reduced magnetization.
+        m_cplx (complex or np.ndarray): complex-valued reduced magnetization.
     """
-    return np.sum(psi)/psi.size
+    return np.sum(psi, axis=-1)/psi.shape[-1]
 
 
 def magnetization(psi):
@@ -124,10 +155,10 @@ def magnetization(psi):
         Statistical Physics (Oxford University Press, 1999).
 
     Args:
-        psi (np.ndarray, 1-dim): configuration of photonic soft-spins.
+        psi (np.ndarray, 1- or 2-dim): configuration(s) of photonic soft-spins.
 
     Returns: (m)
-        m (float): real-valued reduced magnetization.
+        m (float or np.ndarray): real-valued reduced magnetization.
     """
-    return np.abs(np.sum(psi))/psi.size
+    return np.abs(np.sum(psi, axis=-1))/psi.shape[-1]
 
@@ -0,0 +1,125 @@
+"""
+Background writer, overlapping the output of a finished run with the next one.
+
+Compression (zlib) and file output release the GIL, so that a single writer
+thread per process suffices to take them off the critical path of a sweep
+worker. Jobs are passed through a bounded queue: once max_pending outputs are
+waiting, submitting blocks, which bounds the memory held by finished runs.
+
+Errors of background jobs are kept, keyed by output file, and collected via
+pop_errors, e.g. by function run_sweep in module sweep, which in addition
+treats any task without output as failed. Pending jobs are completed before
+the process exits.
+
+Example:
+    obs.save(f_name=f_name, path=path, writer=get_writer())
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import queue
+import threading
+import traceback
+
+
+class RESULT_WRITER():
+    """Writer thread with bounded queue of jobs.
+
+    Arguments:
+        max_pending (int): maximum number of queued jobs (default: 1).
+    """
+    def __init__(self, max_pending=1):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self._errors = []
+        self._lock = threading.Lock()
+        self._closed = False
+        # ... NOT A DAEMON, SO THAT PENDING JOBS ARE COMPLETED AT EXIT
+        self._thread = threading.Thread(target=self._loop, name='RESULT_WRITER')
+        self._thread.start()
+
+    def _loop(self):
+        main = threading.main_thread()
+        while True:
+            try:
+                job = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                # ... MAIN THREAD FINISHED AND NOTHING LEFT TO DO
+                if not main.is_alive() or self._closed:
+                    return
+                continue
+            key, fun, args, kwargs = job
+            try:
+                fun(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self._errors.append((key, traceback.format_exc()))
+            finally:
+                self.queue.task_done()
+
+    def submit(self, key, fun, *args, **kwargs):
+        r"""Queue job fun(*args, **kwargs), blocking while the queue is full.
+
+        Args:
+            key (str): identifier of the job, e.g. the output file name.
+            fun (object): function performing the job.
+        """
+        if self._closed:
+            raise RuntimeError('RESULT_WRITER is closed')
+        self.queue.put((key, fun, args, kwargs))
+
+    def flush(self):
+        r"""Wait until all queued jobs are done."""
+        self.queue.join()
+
+    def pop_errors(self):
+        r"""Errors of finished jobs since the last call.
+
+        Returns: (err)
+            err (list): (key, traceback) of each failed job.
+        """
+        with self._lock:
+            err, self._errors = self._errors, []
+        return err
+
+    def close(self):
+        r"""Complete queued jobs and stop the writer thread."""
+        self.flush()
+        self._closed = True
+        self._thread.join()
+
+
+# -- WRITER OF THE CURRENT PROCESS, SEE FUNCTION get_writer
+_WRITER = None
+_WRITER_PID = None
+
+
+def get_writer(max_pending=1):
+    r"""Background writer of the current process, started on first use."""
+    global _WRITER, _WRITER_PID
+    if _WRITER is None or _WRITER_PID != os.getpid():
+        _WRITER = RESULT_WRITER(max_pending=max_pending)
+        _WRITER_PID = os.getpid()
+    return _WRITER
+
+
+def flush_writer():
+    r"""Wait for background jobs of the current process, if any.
+
+    Returns: (err)
+        err (list): (key, traceback) of each failed job, see pop_errors.
+    """
+    if _WRITER is None or _WRITER_PID != os.getpid():
+        return []
+    _WRITER.flush()
+    return _WRITER.pop_errors()
+
+
+def pop_write_errors():
+    r"""Errors of background jobs of the current process, see pop_errors."""
+    if _WRITER is None or _WRITER_PID != os.getpid():
+        return []
+    return _WRITER.pop_errors()
+
+
+# EOF: writer.py
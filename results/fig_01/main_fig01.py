@@ -4,6 +4,7 @@ import numpy.fft as nfft
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 from matplotlib.gridspec import GridSpec, GridSpecFromSubplotSpec
+from ecpn_src.data_analysis import RUN_FILE
 
 
 # -- FFT ABREVIATIONS
@@ -147,11 +148,11 @@ def figure_vid(o_name='fig', o_format='png'):
 
 
     def fetch_cfg(f_name):
-        data = np.load(f_name)
-        N = data['N']
-        h = data['h']
-        m = data['m']
-        cfg = data['cfg_fin']
+        with RUN_FILE(f_name) as data:
+            N = data['N']
+            h = data['h']
+            m = data['m']
+            cfg = data['cfg_fin']
         return N, h, m, cfg
 
     cols = ['k', 'gray', '#3776ab', '#ab7f37', '#ab4537']
@@ -1,14 +1,16 @@
+import sys; sys.path.append("../../")
 import numpy as np
+from ecpn_src.data_analysis import RUN_FILE
 
 
 def main(f_in, f_out):
 
     def fetch_cfg(f_name):
-        data = np.load(f_name)
-        N = data['N']
-        h = data['h']
-        m = data['m']
-        cfg = data['cfg_fin']
+        with RUN_FILE(f_name) as data:
+            N = data['N']
+            h = data['h']
+            m = data['m']
+            cfg = data['cfg_fin']
         return N, h, m, cfg
 
     N, h_, m_, psi = fetch_cfg(f_in)
@@ -1,8 +1,10 @@
 import sys; sys.path.append("../../")
+import os
 import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 from matplotlib.gridspec import GridSpec, GridSpecFromSubplotSpec
+from ecpn_src.results_store import RESULTS_STORE
 
 
 def save_fig(fig_name='test', fig_format='png'):
@@ -71,9 +73,16 @@ def figure_02(o_name='fig', o_format='png'):
             horizontalalignment="left",
         )
 
-    def fetch_data(f_name, col=0):
-        dat = np.loadtxt(f_name)
-        return dat[:,col]
+    def fetch_data(N, t_eq=5e5, store='../pp_data_analysis/results.sqlite', par_J0=1.2, par_chi=1.0,
+                   par_sigma=0.0, seed=None):
+        # ... RESULTS STORE IF AVAILABLE, SEE get_data.sh, ELSE TEXT TABLES; PARAMETERS None ARE NOT SELECTED ON
+        if os.path.exists(store):
+            pars = dict(t_eq=t_eq, par_J0=par_J0, par_chi=par_chi, par_sigma=par_sigma, seed=seed)
+            res = RESULTS_STORE(store).query(columns=('h', 'm_av', 'chi'), N=N,
+                                             **{k: v for k, v in pars.items() if v is not None})
+            return res['h'], res['m_av'], res['chi']
+        dat = np.loadtxt('../pp_data_analysis/res_N%d.dat' % N)
+        return dat[:,0], dat[:,3], dat[:,5]
 
     markers = ['o', 's', '>', '<', 'D']
     n_cols = len(markers)
@@ -82,27 +91,19 @@ def figure_02(o_name='fig', o_format='png'):
 
     # -- DATA CURVES FOR SUBFIGURES (A,B) -------------------------------------
 
-    h = fetch_data('../pp_data_analysis/res_N8.dat',col=0)
-    m = fetch_data('../pp_data_analysis/res_N8.dat',col=3)
-    chi = fetch_data('../pp_data_analysis/res_N8.dat',col=5)
+    h, m, chi = fetch_data(8)
     ax1.plot(h, m, color=cols[0], marker=markers[0], label=r'$N=8$')
     ax2.plot(h, chi, color=cols[0], marker=markers[0], label=r'$N=8$')
 
-    h = fetch_data('../pp_data_analysis/res_N16.dat',col=0)
-    m = fetch_data('../pp_data_analysis/res_N16.dat',col=3)
-    chi = fetch_data('../pp_data_analysis/res_N16.dat',col=5)
+    h, m, chi = fetch_data(16)
     ax1.plot(h, m, color=cols[1], marker=markers[1], label=r'$N=16$')
     ax2.plot(h, chi, color=cols[1], marker=markers[1], label=r'$N=16$')
 
-    h = fetch_data('../pp_data_analysis/res_N32.dat',col=0)
-    m = fetch_data('../pp_data_analysis/res_N32.dat',col=3)
-    chi = fetch_data('../pp_data_analysis/res_N32.dat',col=5)
+    h, m, chi = fetch_data(32)
     ax1.plot(h, m, color=cols[2], marker=markers[2], label=r'$N=32$')
     ax2.plot(h, chi, color=cols[2], marker=markers[2], label=r'$N=32$')
 
-    h = fetch_data('../pp_data_analysis/res_N64.dat',col=0)
-    m = fetch_data('../pp_data_analysis/res_N64.dat',col=3)
-    chi = fetch_data('../pp_data_analysis/res_N64.dat',col=5)
+    h, m, chi = fetch_data(64)
     ax1.plot(h, m, color=cols[3], marker=markers[3], label=r'$N=64$')
     ax2.plot(h, chi, color=cols[3], marker=markers[3], label=r'$N=64$')
 
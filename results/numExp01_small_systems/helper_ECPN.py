@@ -5,47 +5,129 @@ author: OM
 date: 2022-01-08
 """
 import sys; sys.path.append("../../")
-import time
+import os
 from ecpn_src.coupling_matrix import *
 from ecpn_src.thermodynamic_quantities import *
 from ecpn_src.solver import *
+from ecpn_src.microcanonical import sample_microcanonical
 from ecpn_src.initial_state_heuristic import get_initial_state_ecpn
-from ecpn_src.measurement import OBSERVER
+from ecpn_src.measurement import OBSERVER, log_file_name
+from ecpn_src.simulation import simulate_point
+from ecpn_src.rng import new_seed, stage_rng, task_key, seed_record
+from ecpn_src.shared_arrays import SHARED
+from ecpn_src.cli import task_file_name
+from ecpn_src.profiling import run_profile
+from ecpn_src.data_analysis import analyze_run
+from ecpn_src.ensemble import summary_dict
 
 
 def helper_sim(N=12, h0=0.5, J0=1.2, sigma=0., chi=1., dh=0.001,
-t_min=0, t_max=1e6, Nt=10001, log_every_n = 10):
+t_min=0, t_max=1e6, Nt=10001, log_every_n = 10, catalog=None,
+seed=None, key=(), f_name=None, J=None, schedule=None, precision='double', rtol=None, background=False):
 
-    seed= int(time.time())
+    # -- SEED OF THE RUN; DISORDER DEPENDS ON seed ONLY, INITIAL STATE ALSO ON key
+    if seed is None:
+        seed = new_seed()
+    if f_name is None:
+        tag = '' if precision == 'double' else '_' + precision
+        f_name = 'obs_DOP853_ECPN_CONT_N%d_tmax%lf_Nt%d%s_h0%lf'%(N,t_max,Nt-1,tag,h0)
 
-    # -- PREPARE MODE-MODE COUPLING MATRIX
-    J = set_connectivity_matrix(J0=J0, sigma=sigma, N=N, seed=seed)
+    # -- MODE-MODE COUPLING MATRIX (UNLESS PROVIDED, E.G. SHARED)
+    if J is None:
+        J = set_connectivity_matrix(J0=J0, sigma=sigma, N=N, rng=stage_rng(seed, 'disorder'))
 
-    # -- PREPARE INITIAL MODE CONFIGURATION
-    h_fun = lambda x: energy(J,chi,x)/N
-    psi0, _ = get_initial_state_ecpn(N, h_fun, h0, dh=dh, seed=seed)
+    simulate_point(J, N=N, h0=h0, J0=J0, sigma=sigma, chi=chi, dh=dh, t_min=t_min, t_max=t_max,
+                   Nt=Nt, log_every_n=log_every_n, seed=seed, key=key, path='./data_N%d/'%(N),
+                   f_name=f_name, catalog=catalog, schedule=schedule, precision=precision,
+                   rtol=rtol, background=background)
 
-    # -- RUN SIMULATION AND MEAURE QUANTITIES OF INTEREST 
-    obs = OBSERVER(N, J, chi, Nt, h0, every=log_every_n)
-    _, cfg = evolve_DOP853(J, chi, psi0, t_min, t_max, Nt, obs.callback)
 
-    # -- ADDITIONAL QUANTITIES OF INTEREST TO KEEP 
-    res_dict = {
-        'par_J0': J0,
-        'par_chi': chi,
-        'par_sigma': sigma,
-        'par_dh': dh,
-        'par_t_min' : t_min,
-        'par_t_max' : t_max,
-        'par_Nt': Nt,
-        'log_every_n': log_every_n,
-        'seed':seed,
-        'cfg_ini': psi0,
-        'cfg_fin': cfg
-        }
+def helper_mc(N=12, h0=0.5, J0=1.2, sigma=0., chi=1., dh=0.001, n_sweeps=100000,
+log_every_n=10, method='window', catalog=None, seed=None, key=(),
+f_name=None, J=None, schedule=None):
+    """Sample equilibrium configurations by microcanonical Monte Carlo.
 
-    # -- SAVE RESULTS
-    obs.save(path = './data_N%d/'%(N), f_name = 'obs_DOP853_ECPN_CONT_N%d_tmax%lf_Nt%d_h0%lf'%(N,t_max,Nt-1,h0), **res_dict)
+    Same as helper_sim, with the time evolution replaced by function
+    sample_microcanonical in module microcanonical; times in the output file
+    are sweep numbers.
+    """
+    if seed is None:
+        seed = new_seed()
+    if f_name is None:
+        f_name = 'obs_MC_ECPN_N%d_nsweeps%d_h0%lf'%(N,n_sweeps,h0)
+
+    with run_profile(f_name):
+
+        # -- PREPARE MODE-MODE COUPLING MATRIX (UNLESS PROVIDED, E.G. SHARED)
+        if J is None:
+            J = set_connectivity_matrix(J0=J0, sigma=sigma, N=N, rng=stage_rng(seed, 'disorder'))
+
+        # -- PREPARE INITIAL MODE CONFIGURATION
+        h_fun = lambda x: energy(J,chi,x)/N
+        psi0, _ = get_initial_state_ecpn(N, h_fun, h0, dh=dh, rng=stage_rng(seed, 'preparation', key))
+
+        # -- SAMPLE CONFIGURATIONS AND MEAURE QUANTITIES OF INTEREST
+        obs = OBSERVER(N, J, chi, n_sweeps, h0, every=log_every_n, schedule=schedule, f_name=f_name)
+        cfg, acc, E_d = sample_microcanonical(J, chi, psi0, n_sweeps, obs.callback, h0=h0, dh=dh,
+                method=method, rng=stage_rng(seed, 'dynamics', key))
+
+        # -- ADDITIONAL QUANTITIES OF INTEREST TO KEEP
+        res_dict = {
+            'par_J0': J0,
+            'par_chi': chi,
+            'par_sigma': sigma,
+            'par_dh': dh,
+            'par_n_sweeps': n_sweeps,
+            'par_method': method,
+            'log_every_n': log_every_n,
+            'seed':seed,
+            'acc_rate': acc,
+            'E_demon': E_d,
+            'cfg_ini': psi0,
+            'cfg_fin': cfg,
+            **seed_record(seed, key)
+            }
+
+        # -- SAVE RESULTS
+        obs.save(path = './data_N%d/'%(N), f_name = f_name, catalog=catalog, **res_dict)
+
+
+def run_task(**task):
+    """Run sweep task, see function run_sweep in module sweep.
+
+    The options background and catalog (default: None) of a task only affect
+    its output, and are not part of its task key.
+    """
+    f_name = os.path.basename(task_file_name(task))[:-4]
+    background = task.pop('background', False)
+    catalog = task.pop('catalog', None)
+    helper_sim(f_name=f_name, key=task_key(task), background=background, catalog=catalog, **task)
+
+
+def run_task_shared(**task):
+    """Run sweep task using the coupling matrix published in SHARED['J']."""
+    f_name = os.path.basename(task_file_name(task))[:-4]
+    background = task.pop('background', False)
+    catalog = task.pop('catalog', None)
+    helper_sim(f_name=f_name, key=task_key(task), J=SHARED['J'], background=background, catalog=catalog,
+               **task)
+
+
+def run_realization(t_eq=0., keep_files=False, **task):
+    """Run disorder realization, see function run_ensemble in module ensemble.
+
+    Returns the summary statistics of the run; unless keep_files, the output
+    and log files are removed afterwards.
+    """
+    f_name = os.path.basename(task_file_name(task))[:-4]
+    helper_sim(f_name=f_name, key=task_key(task), catalog=None, **task)
+    path = task_file_name(task)
+    try:
+        return summary_dict(analyze_run(path, t_eq=t_eq))
+    finally:
+        if not keep_files:
+            os.remove(path)
+            os.remove(log_file_name(task['N'], task['h0'], f_name))
 
 
 if __name__=='__main__':
@@ -63,5 +145,5 @@ if __name__=='__main__':
 
     N_val = int(sys.argv[1])
     h0_val = float(sys.argv[2])
-    helper(N=N_val, h0=h0_val, **sim_pars)
+    helper_sim(N=N_val, h0=h0_val, catalog='./run_catalog.sqlite', **sim_pars)
 
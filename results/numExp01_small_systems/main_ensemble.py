@@ -0,0 +1,54 @@
+"""
+Disorder average of equilibrium properties at a single point (N, h0, sigma).
+
+Realizations are run in parallel until the disorder-averaged magnetization
+and susceptibility are known to the requested precision, see function
+run_ensemble in module ensemble. Only the running averages are kept, in
+ens_N<N>_sigma<sigma>_h0<h0>.json, which also allows to resume.
+
+Usage:
+    python3 main_ensemble.py N h0 sigma [n_proc] [err_m]
+
+author: OM
+date: 2022-03-XX
+"""
+import sys; sys.path.append("../../")
+import os
+from ecpn_src.ensemble import run_ensemble
+from helper_ECPN import run_realization
+
+
+def main_ensemble(n_proc, N_val, h0, sigma, err_m=1e-3, n_min=8, n_max=1000, t_eq=5e5):
+
+    task = {
+        'N': N_val,
+        'h0': h0,
+        'J0': 1.2,
+        'chi': 1.0,
+        'sigma': sigma,
+        'dh': 0.001,
+        't_min': 0,
+        't_max': 1e6,
+        'Nt': 100001,
+        'log_every_n': 100,
+        't_eq': t_eq,
+    }
+    target_err = {'m_av': err_m, 'chi': 10*err_m}
+    state_file = 'ens_N%d_sigma%lf_h0%lf.json' % (N_val, sigma, h0)
+
+    acc = run_ensemble(run_realization, task, target_err, n_min=n_min, n_max=n_max,
+                       n_proc=n_proc, state_file=state_file)
+
+    print("# N = %d, h0 = %lf, sigma = %lf, REALIZATIONS: %d" % (N_val, h0, sigma, acc.n))
+    print("# (quantity) (mean) (err) (err_thermal) (sd_disorder)")
+    for key, (mu, err, err_th, sd) in acc.summary().items():
+        print(key, mu, err, err_th, sd)
+
+
+if __name__=='__main__':
+    N = int(sys.argv[1])
+    h0 = float(sys.argv[2])
+    sigma = float(sys.argv[3])
+    n_proc = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count()
+    err_m = float(sys.argv[5]) if len(sys.argv) > 5 else 1e-3
+    main_ensemble(n_proc, N, h0, sigma, err_m=err_m)
@@ -1,38 +1,83 @@
-import sys
+import sys; sys.path.append("../../")
 import os
 import numpy as np
 import multiprocessing as mp
-from main_single_run import single_run
+from ecpn_src.sweep import expand_grid, run_sweep
+from ecpn_src.coupling_matrix import set_connectivity_matrix
+from ecpn_src.rng import stage_rng
+from ecpn_src.shared_arrays import publish_arrays, release_arrays, init_worker
+from helper_ECPN import run_task, run_task_shared, task_file_name
 
 
-def main_MP(n_proc, N_val, h0_list):
+def main_MP(n_proc, N_val, h0_list, seeds=(0,), retries=2, background=True, catalog='./run_catalog.sqlite',
+            blas_threads=1):
+    """Sweep over h0 and seeds, one disorder realization per seed.
 
-    def worker(queue):
-        while True:
-            h0_curr = queue.get(block=True)
-            if h0_curr is None:
-               break
-            single_run(N_val, h0_curr)
+    Workers are spawned with environment variables limiting each to
+    blas_threads BLAS threads, so that n_proc workers do not oversubscribe
+    the cores.
+    """
 
-    queue = mp.Queue()
-    pool = mp.Pool(n_proc, worker, (queue,))
+    tasks = expand_grid(
+        N=N_val,
+        h0=h0_list,
+        J0=1.2,
+        chi=1.0,
+        sigma=0.0,
+        seed=seeds,
+        dh=0.001,
+        t_min=0,
+        t_max=1e6,
+        Nt=100001,
+        log_every_n=100,
+        background=background,
+        catalog=catalog
+    )
 
-    for i in range(h0_list.size):
-        queue.put(h0_list[i])
+    return run_sweep(run_task, tasks, task_file_name, n_proc=n_proc, retries=retries,
+                     mp_context=mp.get_context('spawn'), blas_threads=blas_threads)
 
-    for i in range(n_proc):
-        queue.put(None)
 
-    queue.close()
-    queue.join_thread()
+def main_MP_shared(n_proc, N_val, h0_list, seed=0, J0=1.2, sigma=0.0, retries=2, blas_threads=1):
+    """Sweep over h0 for a single disorder realization.
 
-    pool.close()
-    pool.join()
+    The coupling matrix is computed once, published in shared memory and
+    attached read-only by all workers. Workers are spawned with environment
+    variables limiting each to blas_threads BLAS threads.
+
+    Only J is published: its spectrum (function analyze_spectral_properties
+    in module coupling_matrix) is used by neither the integrator nor the
+    observer, and would double the shared memory for nothing.
+    """
+
+    tasks = expand_grid(
+        N=N_val,
+        h0=h0_list,
+        J0=J0,
+        chi=1.0,
+        sigma=sigma,
+        seed=seed,
+        dh=0.001,
+        t_min=0,
+        t_max=1e6,
+        Nt=100001,
+        log_every_n=100
+    )
+
+    J = set_connectivity_matrix(J0=J0, sigma=sigma, N=N_val, rng=stage_rng(seed, 'disorder'))
+    desc, handles = publish_arrays({'J': J})
+    try:
+        return run_sweep(run_task_shared, tasks, task_file_name, n_proc=n_proc, retries=retries,
+                         initializer=init_worker, initargs=(desc,),
+                         mp_context=mp.get_context('spawn'), blas_threads=blas_threads)
+    finally:
+        release_arrays(handles)
 
 
 
 if __name__=='__main__':
-    n_proc = 13
     N = int(sys.argv[1])
+    n_proc = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
     h0_list = np.linspace(0.6,0.9,13,endpoint=True)
-    main_MP(n_proc, N, h0_list)
+    _, failed = main_MP(n_proc, N, h0_list)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,50 @@
+"""
+Run sweep on several nodes via a task queue on the shared filesystem.
+
+Usage:
+    python3 main_queue.py fill queue.sqlite N    # enqueue sweep points
+    python3 main_queue.py work queue.sqlite      # start worker (any node)
+
+author: OM
+date: 2022-03-XX
+"""
+import sys; sys.path.append("../../")
+import os
+import numpy as np
+from ecpn_src.sweep import expand_grid, default_cost
+from ecpn_src.task_queue import TASK_QUEUE, run_worker
+from helper_ECPN import run_task, task_file_name
+
+
+def main_fill(db_name, N_val, h0_list, seeds=(0,), catalog='./run_catalog.sqlite'):
+
+    tasks = expand_grid(
+        N=N_val,
+        h0=h0_list,
+        J0=1.2,
+        chi=1.0,
+        sigma=0.0,
+        seed=seeds,
+        dh=0.001,
+        t_min=0,
+        t_max=1e6,
+        Nt=100001,
+        log_every_n=100,
+        catalog=catalog
+    )
+    tasks = [t for t in tasks if not os.path.exists(task_file_name(t))]
+
+    return TASK_QUEUE(db_name).put(tasks, task_file_name, default_cost)
+
+
+def main_work(db_name):
+    return run_worker(TASK_QUEUE(db_name), run_task)
+
+
+if __name__=='__main__':
+    if sys.argv[1] == 'fill':
+        N = int(sys.argv[3])
+        h0_list = np.linspace(0.6,0.9,13,endpoint=True)
+        print(main_fill(sys.argv[2], N, h0_list))
+    else:
+        main_work(sys.argv[2])
@@ -16,7 +16,7 @@ def single_run(N_val, h0_val):
         'log_every_n': 100
     }
 
-    helper_sim(N=N_val, h0=h0_val, **sim_pars)
+    helper_sim(N=N_val, h0=h0_val, catalog='./run_catalog.sqlite', **sim_pars)
 
 
 if __name__=='__main__':
@@ -1,8 +1,5 @@
 P=../numExp01_small_systems
 T_EQ=5e5
+N_PROC=$(nproc)
 
-for N in 8 16 32 64;
-do 
-  echo $N
-  python3 main_postprocessing.py $P/data_N${N}/ $T_EQ > res_N${N}.dat
-done
+python3 main_parallel.py $N_PROC $T_EQ --store results.sqlite $P/data_N8/ $P/data_N16/ $P/data_N32/ $P/data_N64/
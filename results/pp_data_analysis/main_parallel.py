@@ -0,0 +1,148 @@
+"""
+Parallel postprocessing of run files for several system sizes.
+
+Fans the run files of all supplied data directories out over a pool of
+worker processes, and writes one summary table per system size N and set of
+run parameters (e.g. sigma, precision), with rows in the same format as
+main_postprocessing.py. If runs of the same size differ in their parameters,
+the names of their tables are tagged with the differing ones, e.g.
+res_N8_sigma0.5.dat, else they are named res_N8.dat.
+
+With --store, workers in addition write their rows into a RESULTS_STORE (see
+module results_store), keyed by (N, h0, t_eq) and the parameters of the run
+(e.g. sigma, seed), and the tables are exported from the store, so that they
+include points added by earlier invocations with the same parameters.
+
+Usage:
+    python3 main_parallel.py n_proc t_eq [--store results.sqlite] path_1 [path_2 ...]
+
+author: OM
+date: 2022-03-XX
+"""
+import sys; sys.path.append("../../")
+import os
+import datetime
+import traceback
+import multiprocessing as mp
+from ecpn_src.data_analysis import analyze_run_cached, get_file_dict, SUMMARY_HEADER
+from ecpn_src.results_store import RESULTS_STORE, run_key
+from ecpn_src.shared_arrays import blas_thread_limit
+
+
+def _process_file(args):
+    f_name, h0, t_eq, store = args
+    try:
+        N, _, params = run_key(f_name, t_eq=t_eq)
+        res = analyze_run_cached(f_name, t_eq=t_eq, M=32)
+        if store is not None:
+            RESULTS_STORE(store).put(N, h0, res, params=params, path=f_name)
+        return f_name, N, params, res, None
+    except Exception:
+        return f_name, None, None, None, traceback.format_exc()
+
+
+def write_table(f_out, header, rows):
+    """Write table atomically via temporary file and rename."""
+    tmp = f_out + '.tmp%d' % os.getpid()
+    with open(tmp, 'w') as f:
+        for line in header:
+            print(line, file=f)
+        for row in rows:
+            print(*row, file=f)
+    os.replace(tmp, f_out)
+
+
+def table_name(o_name, N, params, keys):
+    r"""Name of the table of runs of size N with parameters params.
+
+    Args:
+        o_name (str): output file name template, e.g. 'res_N%d.dat'.
+        N (int): number of modes.
+        params (dict): parameters of the runs, see function run_key in
+            module results_store.
+        keys (list): parameters to tag the name with; those missing in
+            params are skipped.
+
+    Returns: (f_out)
+        f_out (str): file name, e.g. 'res_N8_sigma0.5.dat'.
+    """
+    base, ext = os.path.splitext(o_name % N)
+    tag = ''.join('_%s%s' % (k[4:] if k.startswith('par_') else k,
+                             '%g' % params[k] if isinstance(params[k], float) else params[k])
+                  for k in keys if k in params)
+    return base + tag + ext
+
+
+def main_parallel(paths, t_eq=0, n_proc=1, blas_threads=1, o_name='res_N%d.dat', store=None):
+    """Postprocess run files in parallel.
+
+    Notes:
+        - Workers are started with the 'spawn' method and inherit environment
+          variables limiting each worker to blas_threads BLAS threads.
+        - A failing file is reported to stderr, and excluded from the table,
+          without affecting the remaining files.
+        - Runs differing in any parameter of their row key (see function
+          run_key in module results_store) go to separate tables, see
+          function table_name.
+
+    Args:
+        paths (list): directories holding run files.
+        t_eq (float): equilibration time (default: 0).
+        n_proc (int): number of worker processes (default: 1).
+        blas_threads (int): BLAS threads per worker (default: 1).
+        o_name (str): output file name template (default: 'res_N%d.dat').
+        store (str): file name of RESULTS_STORE database (default: None).
+
+    Returns: (failed)
+        failed (list): names of files that could not be processed.
+    """
+    tasks = []
+    for path in paths:
+        tasks += [(f_name, h0, t_eq, store) for h0, f_name in sorted(get_file_dict(path).items())]
+
+    ctx = mp.get_context('spawn')
+    with blas_thread_limit(blas_threads), ctx.Pool(n_proc) as pool:
+        res_dict, failed = {}, []
+        for n, (f_name, N, params, res, err) in enumerate(pool.imap_unordered(_process_file, tasks), 1):
+            if err is None:
+                res_dict.setdefault((N, tuple(sorted(params.items()))), []).append(res)
+                status = 'OK'
+            else:
+                failed.append(f_name)
+                status = 'FAILED\n' + err
+            print('[%d/%d] %s %s' % (n, len(tasks), f_name, status), file=sys.stderr, flush=True)
+
+    # -- PARAMETERS DIFFERING AMONG RUNS OF EQUAL SIZE, TAGGING THE TABLE NAMES
+    tags = {}
+    for N, items in res_dict:
+        tags.setdefault(N, []).append(dict(items))
+    for N, par_list in tags.items():
+        keys = sorted(set().union(*par_list))
+        tags[N] = [k for k in keys if any(p.get(k, None) != par_list[0].get(k, None) for p in par_list)]
+
+    # -- WRITE ONE TABLE PER SYSTEM SIZE AND PARAMETER SET, ROWS SORTED BY h0
+    for (N, items), rows in sorted(res_dict.items(), key=lambda x: (x[0][0], str(x[0][1]))):
+        params = dict(items)
+        header = [
+            "# ANALYSIS SCRIPT: %s" % (sys.argv[0]),
+            "# PATH TO RAW DATA: %s" % (' '.join(paths)),
+            "# EQUILIBRATION TIME: t_eq = %lf" % (t_eq),
+            "# PARAMETERS: %s" % (' '.join('%s=%s' % kv for kv in items if kv[0] != 't_eq')),
+            "# TIMESTAMP: %s" % (datetime.datetime.now()),
+            *SUMMARY_HEADER]
+        f_out = table_name(o_name, N, params, tags[N])
+        if store is None:
+            write_table(f_out, header, sorted(rows, key=lambda r: r[0]))
+        else:
+            RESULTS_STORE(store).export_txt(f_out, header=header[:-1], N=N, **params)
+    return failed
+
+
+if __name__ == "__main__":
+    n_proc = int(sys.argv[1])
+    t_eq = float(sys.argv[2])
+    paths, store = sys.argv[3:], None
+    if paths[:1] == ['--store']:
+        store, paths = paths[1], paths[2:]
+    failed = main_parallel(paths, t_eq=t_eq, n_proc=n_proc, store=store)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,81 @@
+"""
+Sweep specifications and output file names of the command-line interface,
+see module cli.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import json
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ecpn_src.cli as cli
+from ecpn_src.cli import task_file_name, main
+from ecpn_src.sweep import expand_grid
+
+
+def write_spec(f_name, **opts):
+    r"""Sweep specification of two short runs of N=4 modes."""
+    grid = dict(N=4, h0={'linspace': [0.6, 0.7, 2]}, sigma=0.5, seed=3, t_max=20., Nt=5, log_every_n=1)
+    with open(f_name, 'w') as f:
+        json.dump(dict(grid=grid, **opts), f)
+    return f_name
+
+
+def test_file_name_of_partial_task():
+    full = dict(N=12, h0=0.5, J0=1.2, sigma=0., chi=1., dh=0.001, t_min=0, t_max=1e6, Nt=10001,
+                log_every_n=10, seed=0)
+    assert task_file_name({'N': 12}) == task_file_name(full) == (
+        './data_N12/obs_DOP853_ECPN_CONT_N12_J01.200000_chi1.000000_sigma0.000000_seed0'
+        '_tmax1000000.000000_Nt10000_h00.500000.npz')
+    assert task_file_name(dict(N=12, catalog='cat.sqlite', background=True)) == task_file_name(full)
+
+
+def test_file_names_of_varied_parameters():
+    tasks = expand_grid(N=8, h0=0.7, dh=[0.001, 0.002], t_min=[0, 10.], log_every_n=[10, 5],
+                        rtol=[None, 1e-8], precision=['double', 'single'])
+    names = [task_file_name(t) for t in tasks]
+    assert len(set(names)) == len(tasks) == 32
+    assert all(f.endswith('_h00.700000.npz') for f in names)
+    assert names[-1].endswith('_Nt10000_dh0.002000_tmin10.000000_every5_rtol1e-08_single_h00.700000.npz')
+
+
+@pytest.mark.parametrize('key', ['schedule', 'n_sweeps'])
+def test_file_name_rejects_parameters_not_in_name(key):
+    with pytest.raises(ValueError, match=key):
+        task_file_name({'N': 8, key: 1})
+
+
+def test_run_spec(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    spec = write_spec('spec.json', n_proc=1, retries=0, blas_threads=1, spectrum=True)
+    assert main(['run', spec]) == 0
+    assert main(['list', spec]) == 0
+    lines = capsys.readouterr().out.split('\n')[:-1]
+    assert [l.split()[0] for l in lines] == ['done', 'done']
+    for line in lines:
+        with np.load(line.split()[1]) as f:
+            assert np.allclose(f['eig_J'], np.linalg.eigvalsh(f['J']))
+    # -- EACH REALIZATION DIAGONALIZED ONCE PER PROCESS
+    assert len([k for k in cli._E_CACHE if k[0] == 4]) == 1
+
+
+def test_spec_options_reach_sweep(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+    monkeypatch.setattr(cli, 'run_sweep', lambda *args, **kwargs: (calls.append(kwargs), ([], []))[1])
+    assert main(['run', write_spec('spec.json', n_proc=3, retries=5, blas_threads=2, catalog='c.sqlite')]) == 0
+    (kwargs,) = calls
+    assert (kwargs['n_proc'], kwargs['retries'], kwargs['blas_threads']) == (3, 5, 2)
+    assert kwargs['mp_context'].get_start_method() == 'spawn'
+    assert main(['run', 'spec.json', '--n_proc', '2']) == 0
+    assert calls[-1]['n_proc'] == 2
+    with pytest.raises(ValueError, match='max_workers'):
+        main(['run', write_spec('bad.json', max_workers=3)])
+
+
+# EOF: test_cli.py
@@ -0,0 +1,97 @@
+"""
+Statistical estimators of module data_analysis.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecpn_src.data_analysis import (autocorrelation_fft, integrated_autocorrelation_time, blocking_analysis,
+                                    bootstrap_vectorized, analyze_run, analyze_run_cached, SUMMARY_KEYS)
+from ecpn_src.rng import stage_seed_sequence, seed_record
+
+
+def write_run(f_name, T=64, N=8, seed=2, **kwargs):
+    r"""Run file of T random snapshots at times 0, 1, ..., T-1."""
+    rng = np.random.default_rng(seed)
+    cfgs = np.exp(1j*rng.uniform(-np.pi, np.pi, size=(T, N)))
+    J = np.ones((N, N)) - np.eye(N)
+    np.savez_compressed(f_name, N=N, J=J, par_chi=1., t=np.arange(T, dtype=float), h=np.zeros(T),
+                        m_cplx=np.mean(cfgs, axis=-1), cfgs=cfgs, **kwargs)
+    return f_name
+
+
+@pytest.mark.parametrize('m', [np.full(200, 0.3), np.full(200, 0.2 - 0.1j), np.zeros(200)])
+def test_autocorrelation_of_constant_series(m):
+    t = 0.5*np.arange(m.size)
+    _, C = autocorrelation_fft(t, m)
+    assert C[0] == 1. and np.all(C[1:] == 0.)
+    tau_int, tau_int_t, n_eff, _ = integrated_autocorrelation_time(t, m)
+    assert (tau_int, tau_int_t, n_eff) == (0.5, 0.25, m.size)
+
+
+
+@pytest.mark.parametrize('n', [0, 1])
+def test_blocking_analysis_of_fewer_than_two_values(n):
+    b_size, err, err_err, err_plateau = blocking_analysis(np.ones(n))
+    assert b_size.size == err.size == err_err.size == 0
+    assert np.isnan(err_plateau)
+
+
+def test_blocking_analysis_of_uncorrelated_values():
+    x = np.random.default_rng(0).normal(size=2**14)
+    assert blocking_analysis(x)[-1] == pytest.approx(1/np.sqrt(x.size), rel=0.1)
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+@pytest.mark.parametrize('fun', [analyze_run, analyze_run_cached])
+def test_analyze_run_of_short_window(fun, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    f_name = write_run('run.npz', T=64)
+    res = fun(f_name, t_eq=62.)
+    assert np.isnan(res[2]) and np.isnan(res[4])
+    assert np.all(np.isfinite(np.delete(res, [2, 4])))
+    with pytest.raises(ValueError, match='no snapshots'):
+        fun(f_name, t_eq=63.)
+
+
+
+def test_bootstrap_seeded_by_seed_entropy(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    record = seed_record(7, (11,))
+    f_a = write_run('a.npz', **record)
+    f_b = write_run('b.npz', **record)
+    f_c = write_run('c.npz', **seed_record(8, (11,)))
+    res = dict(zip(SUMMARY_KEYS, analyze_run(f_a)))
+    # -- RESAMPLES FROM STAGE 'bootstrap' OF THE RECORDED SEED, FIRST STREAM FOR chi
+    ss = stage_seed_sequence(int(record['seed_entropy']), 'bootstrap', tuple(record['seed_task_key']))
+    with np.load(f_a) as f:
+        m, N = np.abs(f['m_cplx'][f['t'] > 0]), int(f['N'])
+    rng_chi = np.random.default_rng(ss.spawn(2)[0])
+    assert res['chi_err_bs'] == bootstrap_vectorized(m, lambda x: N*np.var(x, axis=-1), M=32, rng=rng_chi)[1]
+    assert analyze_run(f_b) == analyze_run(f_a) == analyze_run_cached(f_a)
+    res_c = dict(zip(SUMMARY_KEYS, analyze_run(f_c)))
+    assert res_c['chi'] == res['chi'] and res_c['chi_err_bs'] != res['chi_err_bs']
+
+
+def test_cache_keeps_reductions_of_snapshots(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    f_name = write_run('run.npz', T=512, N=64)
+    res = analyze_run_cached(f_name, t_eq=100.)
+    assert res == analyze_run(f_name, t_eq=100.)
+    c_name, = [os.path.join('pp_cache', f) for f in os.listdir('pp_cache')]
+    with np.load(c_name) as c:
+        assert 'theta' not in c.files and c['th_1'].shape == c['th_2'].shape == (512,)
+    assert os.path.getsize(c_name) < 0.1*os.path.getsize(f_name)
+    # -- ENTRY IS REUSED FOR OTHER EQUILIBRATION TIMES
+    mtime = os.stat(c_name).st_mtime_ns
+    assert analyze_run_cached(f_name, t_eq=200.) == analyze_run(f_name, t_eq=200.)
+    assert os.stat(c_name).st_mtime_ns == mtime
+
+
+# EOF: test_data_analysis.py
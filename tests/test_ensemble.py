@@ -0,0 +1,47 @@
+"""
+Online disorder averages, see module ensemble.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecpn_src.ensemble import DISORDER_AVERAGE
+
+
+def accumulate(x, dx):
+    r"""Accumulator of realizations with values x and errors dx of observable 'm_av'."""
+    acc = DISORDER_AVERAGE()
+    for x_r, dx_r in zip(x, dx):
+        acc.add({'m_av': (x_r, dx_r)})
+    return acc
+
+
+@pytest.mark.parametrize('split', [(0, 17, 40), (1, 2, 40), (40, 40, 40)])
+def test_merge_agrees_with_direct_mean_and_variance(split):
+    rng = np.random.default_rng(5)
+    x, dx = 1e3 + rng.normal(size=40), rng.uniform(0.1, 0.2, size=40)
+    acc = DISORDER_AVERAGE()
+    for i0, i1 in zip((0,) + split, split):
+        acc.merge(accumulate(x[i0:i1], dx[i0:i1]))
+    acc = DISORDER_AVERAGE.from_dict(acc.to_dict())
+    mean, err, err_th, sd_dis = acc.summary()['m_av']
+    assert acc.n == 40
+    assert mean == pytest.approx(np.mean(x), rel=1e-14)
+    assert err == pytest.approx(np.std(x, ddof=1)/np.sqrt(40), rel=1e-9)
+    assert err_th == pytest.approx(np.sqrt(np.sum(dx**2))/40, rel=1e-12)
+    assert sd_dis == pytest.approx(np.sqrt(np.var(x, ddof=1) - np.mean(dx**2)), rel=1e-9)
+
+
+def test_single_realization_has_thermal_error():
+    acc = accumulate([0.3], [0.02])
+    assert acc.summary()['m_av'] == (0.3, pytest.approx(0.02), pytest.approx(0.02), 0.)
+    assert acc.converged({'m_av': 0.03}) and not acc.converged({'m_av': 0.01, 'chi': 1.})
+
+
+# EOF: test_ensemble.py
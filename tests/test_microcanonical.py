@@ -0,0 +1,66 @@
+"""
+Energy and power conservation of microcanonical sampling, see module
+microcanonical.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecpn_src.microcanonical import sample_microcanonical
+from ecpn_src.thermodynamic_quantities import energy, power
+
+
+N, CHI = 16, 1.
+
+
+@pytest.fixture
+def system():
+    r"""Disordered coupling matrix and random state of unit power per mode."""
+    rng = np.random.default_rng(3)
+    x = np.triu(1.2/N + 0.5/np.sqrt(N)*rng.normal(size=(N, N)), k=1)
+    psi = np.exp(1j*rng.uniform(0., 2*np.pi, size=N))
+    return x + x.T, psi
+
+
+def sample(J, psi, n_sweeps=50, **kwargs):
+    cfgs = []
+    _, acc, E_d = sample_microcanonical(J, CHI, psi, n_sweeps, lambda it, t, y: cfgs.append(y),
+                                        rng=np.random.default_rng(0), **kwargs)
+    return np.array(cfgs), acc, E_d
+
+
+def test_demon_conserves_total_energy(system):
+    J, psi = system
+    cfgs, acc, E_d = sample(J, psi, method='demon', E_d=2.)
+    assert 0. < acc < 1. and np.all(E_d >= 0.)
+    E_tot = energy(J, CHI, cfgs) + E_d
+    assert E_tot == pytest.approx(energy(J, CHI, psi) + 2., rel=1e-12)
+    assert power(cfgs) == pytest.approx(power(psi), rel=1e-12)
+
+
+def test_window_keeps_energy_density(system):
+    J, psi = system
+    h0, dh = energy(J, CHI, psi)/N, 1e-2
+    cfgs, acc, E_d = sample(J, psi, dh=dh)
+    assert acc > 0. and E_d.size == 0
+    h = energy(J, CHI, cfgs)/N
+    assert np.all(np.abs(h - h0) <= dh*(1 + 1e-9)) and np.std(h) > 0.
+    assert power(cfgs) == pytest.approx(power(psi), rel=1e-12)
+
+
+def test_window_approaches_target(system):
+    J, psi = system
+    h0 = energy(J, CHI, psi)/N - 0.1
+    h = energy(J, CHI, sample(J, psi, n_sweeps=200, h0=h0)[0])/N
+    # -- DISTANCE TO THE WINDOW NEVER GROWS, AND THE WINDOW IS REACHED
+    assert np.all(np.diff(np.maximum(np.abs(h - h0) - 1e-3, 0.)) <= 1e-12)
+    assert abs(h[-1] - h0) <= 1e-3
+
+
+# EOF: test_microcanonical.py
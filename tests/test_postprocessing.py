@@ -0,0 +1,104 @@
+"""
+Postprocessing of single-precision runs, see module cli and
+results/pp_data_analysis.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'results', 'pp_data_analysis'))
+
+from ecpn_src.cli import run_point, task_file_name
+from ecpn_src.data_analysis import get_file_dict, analyze_run
+from ecpn_src.run_catalog import RUN_CATALOG
+from ecpn_src.results_store import RESULTS_STORE
+
+PARS = dict(N=8, J0=1.2, sigma=0., chi=1., dh=0.001, t_min=0, t_max=50., Nt=11,
+            log_every_n=5, seed=0)
+
+
+@pytest.fixture
+def single_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run_point(h0=0.7, precision='single', **PARS)
+    return task_file_name(dict(PARS, h0=0.7, precision='single'))
+
+
+def test_file_name_ends_in_h0(single_run):
+    assert os.path.exists(single_run)
+    assert os.path.basename(single_run).endswith('_single_h00.700000.npz')
+
+
+def test_get_file_dict(single_run):
+    f_dict = get_file_dict('./data_N8/')
+    assert list(f_dict) == [0.7]
+    res = analyze_run(f_dict[0.7])
+    assert res[0] == pytest.approx(0.7, abs=PARS['dh'])
+    assert np.all(np.isfinite(res[:8]))
+
+
+def test_catalog_fallback(single_run):
+    cat = RUN_CATALOG('./catalog.sqlite')
+    cat.add_file(single_run)
+    assert cat.query(N=8)[0]['h0'] == pytest.approx(0.7)
+
+
+def test_main_postprocessing(single_run, capsys):
+    from main_postprocessing import main_postprocessing
+    main_postprocessing(single_run)
+    assert float(capsys.readouterr().out.split()[0]) == pytest.approx(0.7, abs=PARS['dh'])
+
+
+def test_main_parallel(single_run):
+    from main_parallel import main_parallel
+    assert main_parallel(['./data_N8/'], n_proc=1) == []
+    res = np.atleast_2d(np.loadtxt('res_N8.dat'))
+    assert res.shape == (1, 10)
+    assert res[0, 0] == pytest.approx(0.7, abs=PARS['dh'])
+
+
+def test_store_keeps_runs_of_different_sigma(tmp_path, monkeypatch):
+    from main_postprocessing import main_postprocessing
+    from main_parallel import main_parallel
+    monkeypatch.chdir(tmp_path)
+    # -- ONE DIRECTORY PER DISORDER STRENGTH, EQUAL N AND h0
+    paths = []
+    for sigma in (0., 0.5):
+        pars = dict(PARS, sigma=sigma)
+        run_point(h0=0.7, **pars)
+        paths.append('./sigma%g/' % sigma)
+        os.renames(task_file_name(dict(pars, h0=0.7)), paths[-1] + 'run_h00.700000.npz')
+    for path in paths:
+        main_postprocessing(path + 'run_h00.700000.npz', store=RESULTS_STORE('./pp.sqlite'))
+    res = RESULTS_STORE('./pp.sqlite').query(N=8)
+    assert sorted(res['par_sigma']) == [0., 0.5]
+    assert np.all(res['h0'] == 0.7)
+    assert main_parallel(paths, store='./par.sqlite') == []
+    assert sorted(RESULTS_STORE('./par.sqlite').query(N=8)['par_sigma']) == [0., 0.5]
+    # -- ONE TABLE PER DISORDER STRENGTH, SEED ONLY KEYS DISORDERED RUNS
+    assert not os.path.exists('res_N8.dat')
+    for f_out in ('res_N8_sigma0.dat', 'res_N8_sigma0.5_seed0.dat'):
+        assert np.atleast_2d(np.loadtxt(f_out)).shape == (1, 10)
+    assert main_parallel(paths, store='./par.sqlite', o_name='txt_N%d.dat') == []
+    assert os.path.exists('txt_N8_sigma0.dat') and os.path.exists('txt_N8_sigma0.5_seed0.dat')
+
+
+@pytest.mark.parametrize('sigma, n_rows', [(0., 1), (0.5, 2)])
+def test_store_rerun_with_other_seed(sigma, n_rows, tmp_path, monkeypatch):
+    from main_postprocessing import main_postprocessing
+    monkeypatch.chdir(tmp_path)
+    store = RESULTS_STORE('./pp.sqlite')
+    for seed in (3, 4):
+        pars = dict(PARS, N=4, sigma=sigma, seed=seed)
+        run_point(h0=0.7, **pars)
+        main_postprocessing(task_file_name(dict(pars, h0=0.7)), store=store)
+    assert len(store.query(N=4)['h0']) == n_rows
+
+
+# EOF: test_postprocessing.py
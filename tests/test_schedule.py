@@ -0,0 +1,53 @@
+"""
+Output times of snapshot schedules, see module schedule.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecpn_src.schedule import reached, UNIFORM_SCHEDULE, LOG_SCHEDULE
+
+
+@pytest.mark.parametrize('t_next, t, res', [
+    (10., 10., True),
+    (10., 10. - 5e-9, True),
+    (10., 10. - 2e-8, False),
+    (10., 11., True),
+    (1e6, 1e6 - 5e-4, True),
+    (1e6, 1e6 - 2e-3, False),
+    # ... ABSOLUTE TOLERANCE NEAR ZERO
+    (0., -5e-10, True),
+    (0., -2e-9, False),
+    (np.inf, 1e300, False),
+])
+def test_reached(t_next, t, res):
+    assert reached(t, t_next) is res
+
+
+def test_uniform_schedule_at_output_times():
+    sched = UNIFORM_SCHEDULE(0.1, t0=1.)
+    assert sched.next_time(-np.inf) == sched.next_time(0.) == 1.
+    t, times = -np.inf, []
+    for _ in range(30):
+        t = sched.next_time(t)
+        times.append(t)
+    # -- ROUND-OFF OF ACCUMULATED TIMES NEITHER SKIPS NOR REPEATS AN OUTPUT TIME
+    assert np.allclose(np.diff(times), 0.1, rtol=1e-9)
+    assert sched.next_time(1.3 - 1e-12) == pytest.approx(1.4)
+
+
+def test_log_schedule_ends_at_t_max():
+    sched = LOG_SCHEDULE(t_first=1., t_max=1e3, n_per_decade=2)
+    assert sched.next_time(-1.) == 0. and sched.next_time(0.) == 1.
+    assert sched.times.size == 8 and sched.times[-1] == pytest.approx(1e3)
+    assert sched.next_time(sched.times[-2]) == sched.times[-1]
+    assert sched.next_time(1e3) == np.inf
+
+
+# EOF: test_schedule.py
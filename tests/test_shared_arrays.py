@@ -0,0 +1,41 @@
+"""
+Read-only arrays shared among processes, see module shared_arrays.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecpn_src.shared_arrays import publish_arrays, attach_arrays, release_arrays, blas_thread_limit, BLAS_VARS
+
+
+@pytest.mark.parametrize('in_memory', [True, False])
+def test_attached_arrays_are_read_only_copies(in_memory, tmp_path):
+    arrays = {'J': np.arange(12.).reshape(3, 4).T, 'e': np.arange(3, dtype=np.float32)}
+    desc, handles = publish_arrays(arrays, path=None if in_memory else str(tmp_path))
+    try:
+        shared = attach_arrays(desc)
+        for key, x in arrays.items():
+            assert shared[key].dtype == x.dtype and np.array_equal(shared[key], x)
+            with pytest.raises(ValueError):
+                shared[key][0] = 1.
+    finally:
+        release_arrays(handles)
+
+
+def test_blas_thread_limit_restores_environment(monkeypatch):
+    monkeypatch.setenv(BLAS_VARS[0], '8')
+    monkeypatch.delenv(BLAS_VARS[1], raising=False)
+    with blas_thread_limit(2):
+        assert all(os.environ[k] == '2' for k in BLAS_VARS)
+    assert os.environ[BLAS_VARS[0]] == '8' and BLAS_VARS[1] not in os.environ
+    with blas_thread_limit(None):
+        assert os.environ[BLAS_VARS[0]] == '8'
+
+
+# EOF: test_shared_arrays.py
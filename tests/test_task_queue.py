@@ -0,0 +1,94 @@
+"""
+Leases and heartbeats of the SQLite task queue, see module task_queue.
+
+author: OM
+date: 2022-03-XX
+"""
+import io
+import os
+import sys
+import time
+import sqlite3
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecpn_src.task_queue import TASK_QUEUE, run_worker
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = TASK_QUEUE(str(tmp_path / 'queue.sqlite'), lease=0.5, max_attempts=2)
+    q.put([{'n': 0}], key_fun=lambda t: 'task%d' % t['n'])
+    return q
+
+
+def locked_heartbeat(queue, n_fail):
+    r"""Heartbeat of queue failing n_fail times, as on a locked database."""
+    beat, calls = queue.heartbeat, []
+    def heartbeat(key, worker):
+        calls.append(key)
+        if len(calls) <= n_fail:
+            raise sqlite3.OperationalError('database is locked')
+        return beat(key, worker)
+    return heartbeat
+
+
+def test_heartbeat_retried_after_error(queue):
+    queue.heartbeat = locked_heartbeat(queue, n_fail=2)
+    log = io.StringIO()
+    n_done = run_worker(queue, lambda n: time.sleep(0.6), heartbeat=0.1, poll=0.05, log=log)
+    assert n_done == 1 and queue.counts() == {'done': 1}
+    assert log.getvalue().count('HEARTBEAT FAILED') == 2
+    assert 'database is locked' in log.getvalue()
+
+
+def test_task_stopped_if_heartbeats_keep_failing(queue):
+    queue.heartbeat = locked_heartbeat(queue, n_fail=10**6)
+    runs = []
+    def run_fun(n):
+        runs.append(time.time())
+        while time.time() < runs[-1] + 10.:
+            time.sleep(0.01)
+        runs[-1] = None
+    log = io.StringIO()
+    # -- BOTH ATTEMPTS STOPPED BEFORE THEIR LEASE EXPIRES, THE TASK THEN FAILS
+    assert run_worker(queue, run_fun, heartbeat=0.1, poll=0.05, log=log) == 0
+    assert len(runs) == 2 and None not in runs
+    assert log.getvalue().count('LEASE LOST') == 2
+    assert queue.counts() == {'failed': 1}
+
+
+def test_expired_lease_is_reclaimed(queue):
+    key, _ = queue.claim('a')
+    assert queue.claim('b') == (None, None)
+    time.sleep(0.6)
+    assert queue.claim('b')[0] == key
+    # -- THE FORMER OWNER CAN NEITHER RENEW NOR COMPLETE THE TASK
+    assert not queue.heartbeat(key, 'a') and not queue.complete(key, 'a')
+    assert queue.complete(key, 'b')
+    assert queue.counts() == {'done': 1}
+
+
+def test_expired_lease_counts_as_attempt(queue):
+    queue.claim('a')
+    time.sleep(0.6)
+    queue.claim('b')
+    time.sleep(0.6)
+    assert queue.claim('c') == (None, None)
+    assert queue.counts() == {'failed': 1}
+
+
+def test_failed_task_retried_until_max_attempts(queue):
+    runs = []
+    def run_fun(n):
+        runs.append(n)
+        raise RuntimeError('attempt %d' % len(runs))
+    log = io.StringIO()
+    assert run_worker(queue, run_fun, poll=0.05, log=log) == 0
+    assert runs == [0, 0]
+    assert queue.counts() == {'failed': 1}
+    assert 'RuntimeError: attempt 1' in log.getvalue() and 'RuntimeError: attempt 2' in log.getvalue()
+
+
+# EOF: test_task_queue.py
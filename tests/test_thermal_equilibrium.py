@@ -0,0 +1,44 @@
+"""
+Lookup tables of thermal equilibrium properties, see module
+thermal_equilibrium.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecpn_src.thermal_equilibrium import optical_temperature_batch, thermal_table, thermal_table_lookup
+
+
+def spectrum(N, seed):
+    r"""Eigenfrequencies of a random symmetric matrix."""
+    x = np.random.default_rng(seed).normal(size=(N, N))
+    return np.linalg.eigvalsh(0.5*(x + x.T))
+
+
+@pytest.mark.parametrize('N, tol', [(8, 1e-6), (32, 1e-6), (32, 1e-4)])
+def test_table_error_at_off_grid_points(N, tol):
+    e = spectrum(N, N)
+    table = thermal_table(N, N, e, tol=tol)
+    assert np.all(table['err'] <= tol)
+    h = np.random.default_rng(1).uniform(table['h'][0], table['h'][-1], size=1001)
+    Tc, _, _, err = thermal_table_lookup(table, h)
+    beta = 1./optical_temperature_batch(N, N, h*N, e)
+    dev = np.abs(1./Tc - beta)/np.maximum(1., np.abs(beta))
+    assert np.all(dev <= tol)
+    assert np.all(dev <= 2*err)
+
+
+def test_table_of_limited_size():
+    e = spectrum(8, 0)
+    table = thermal_table(8, 8, e, tol=1e-12, max_points=200)
+    assert table['h'].size == 200
+    assert np.all(np.isfinite(table['err'])) and np.max(table['err']) > 1e-12
+
+
+# EOF: test_thermal_equilibrium.py
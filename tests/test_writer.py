@@ -0,0 +1,72 @@
+"""
+Background output of runs, see modules writer and measurement.
+
+author: OM
+date: 2022-03-XX
+"""
+import os
+import sys
+import io
+import threading
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecpn_src.writer import RESULT_WRITER, get_writer
+from ecpn_src.measurement import OBSERVER
+from ecpn_src.sweep import run_sweep
+
+
+@pytest.fixture
+def observer(tmp_path, monkeypatch):
+    r"""OBSERVER of three snapshots of N=4 modes."""
+    monkeypatch.chdir(tmp_path)
+    N = 4
+    obs = OBSERVER(N, np.ones((N, N)) - np.eye(N), 1., 3, 0.5, every=1, f_name='run')
+    rng = np.random.default_rng(0)
+    for it in range(3):
+        obs.callback(it, float(it), np.exp(1j*rng.uniform(0., 2*np.pi, size=N)))
+    return obs
+
+
+def test_background_save_is_atomic(observer):
+    writer, gate = RESULT_WRITER(), threading.Event()
+    writer.submit('gate', gate.wait)
+    observer.save(f_name='run', path='./out/', writer=writer)
+    # -- NEITHER OUTPUT NOR TEMPORARY FILE BEFORE THE JOB RUNS
+    assert os.listdir('./out/') == []
+    gate.set()
+    writer.close()
+    assert os.listdir('./out/') == ['run.npz'] and writer.pop_errors() == []
+    with np.load('./out/run.npz') as f:
+        assert f['cfgs'].shape == (3, 4) and np.all(f['t'] == [0., 1., 2.])
+
+
+def test_failed_write_is_reported(observer):
+    # ... A DIRECTORY IN PLACE OF THE OUTPUT FILE, WHICH THE RENAME CANNOT REPLACE
+    os.makedirs('./out/run.npz')
+    writer = RESULT_WRITER()
+    observer.save(f_name='run', path='./out/', writer=writer)
+    writer.close()
+    (key, tb), = writer.pop_errors()
+    assert key == os.path.abspath('./out/run.npz') and 'IsADirectoryError' in tb
+    assert os.listdir('./out/') == ['run.npz'] and writer.pop_errors() == []
+
+
+def _fail_in_background(name):
+    def _write():
+        raise OSError('disk full')
+    get_writer().submit(os.path.abspath(name), _write)
+
+
+def test_sweep_fails_task_of_failed_write(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    log = io.StringIO()
+    done, failed = run_sweep(_fail_in_background, [{'name': 'a.npz'}], lambda t: t['name'], retries=1, log=log)
+    assert done == [] and failed == [{'name': 'a.npz'}]
+    assert log.getvalue().count('# WRITE FAILED %s' % os.path.abspath('a.npz')) == 2
+    assert 'OSError: disk full' in log.getvalue()
+
+
+# EOF: test_writer.py